@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+""" algoMosaic kubeflowMetadata that caches Kubeflow Pipelines lookups.
+
+Resolving a recurring run needs the jobs, experiments and pipelines of
+the Kubeflow instance. Listing them for every pipelineManager makes a
+deploy of a large YAML file cost hundreds of full listing calls.
+
+The snapshot lists each kind once, following next_page_token until the
+listing is exhausted, and indexes it by name:
+    - jobs: job name to the list of jobs with that name.
+    - experiments: experiment name to experiment.
+    - pipelines: pipeline name to pipeline.
+    - versions: pipeline ID to its latest version. Kubeflow makes each
+      uploaded version the pipeline's default version, so versions are
+      taken from the pipelines listing and only fetched on demand for
+      pipelines without one.
+
+Snapshots are shared by every pipelineManager that uses the same client
+(see get_metadata) and are guarded by a lock, so they can be used from
+several threads. Nothing expires on its own. Writes made through
+pipelineManager update the indexes in place, and invalidate drops a
+kind so it is listed again on next use.
+
+"""
+
+import threading
+
+import configs
+from algom.utils.client import CLIENT_POOL
+
+
+KFP_PAGE_SIZE = getattr(configs, 'KFP_PAGE_SIZE', 200)
+METADATA_KINDS = ('jobs', 'experiments', 'pipelines', 'versions')
+
+
+class kubeflowMetadata():
+    """Indexed snapshot of Kubeflow jobs, experiments and pipelines.
+
+    Args:
+        client (kfp.Client): Client used to list metadata.
+        page_size (int): Number of items requested per listing page.
+
+    Examples:
+        metadata = get_metadata()
+        job_ids = [j.id for j in metadata.get_jobs('daily_scores')]
+        pipeline = metadata.get_pipeline('scores_pipeline')
+        version = metadata.get_latest_version(pipeline.id)
+    """
+    def __init__(self, client, page_size=KFP_PAGE_SIZE):
+        self.client = client
+        self.page_size = page_size
+        self._lock = threading.RLock()
+        self._jobs = None
+        self._experiments = None
+        self._pipelines = None
+        self._versions = {}
+
+    def get_jobs(self, job_name):
+        """Return the jobs (recurring runs) named job_name."""
+        with self._lock:
+            return list(self._get_jobs_index().get(job_name, []))
+
+    def get_experiment(self, experiment_name):
+        with self._lock:
+            return self._get_experiments_index().get(experiment_name)
+
+    def get_pipeline(self, pipeline_name):
+        with self._lock:
+            return self._get_pipelines_index().get(pipeline_name)
+
+    def get_latest_version(self, pipeline_id):
+        """Return the latest version of a pipeline, or None."""
+        with self._lock:
+            if pipeline_id not in self._versions:
+                response = self.client.list_pipeline_versions(
+                    pipeline_id=pipeline_id,
+                    page_size=1,
+                    sort_by='created_at desc',
+                )
+                versions = response.versions or []
+                self._versions[pipeline_id] = versions[0] if versions else None
+            return self._versions[pipeline_id]
+
+    def add_job(self, job):
+        with self._lock:
+            if self._jobs is not None:
+                self._jobs.setdefault(job.name, []).append(job)
+
+    def remove_job(self, job_id):
+        with self._lock:
+            if self._jobs is None:
+                return
+            for name, jobs in list(self._jobs.items()):
+                self._jobs[name] = [j for j in jobs if j.id != job_id]
+                if not self._jobs[name]:
+                    del self._jobs[name]
+
+    def set_job_enabled(self, job_id, enabled):
+        with self._lock:
+            for jobs in (self._jobs or {}).values():
+                for job in jobs:
+                    if job.id == job_id:
+                        job.enabled = enabled
+
+    def add_pipeline(self, pipeline):
+        with self._lock:
+            if self._pipelines is not None:
+                self._pipelines[pipeline.name] = pipeline
+            if getattr(pipeline, 'default_version', None) is not None:
+                self._versions[pipeline.id] = pipeline.default_version
+
+    def set_latest_version(self, pipeline_id, version):
+        with self._lock:
+            self._versions[pipeline_id] = version
+
+    def invalidate(self, *kinds):
+        """Drop cached metadata so it is listed again on next use.
+
+        Args:
+            kinds (str): Any of 'jobs', 'experiments', 'pipelines' and
+                'versions'. Invalidates everything when omitted.
+        """
+        for kind in kinds:
+            if kind not in METADATA_KINDS:
+                raise ValueError('kind must be one of {}.'.format(METADATA_KINDS))
+        with self._lock:
+            kinds = kinds or METADATA_KINDS
+            if 'jobs' in kinds:
+                self._jobs = None
+            if 'experiments' in kinds:
+                self._experiments = None
+            if 'pipelines' in kinds:
+                self._pipelines = None
+            if 'versions' in kinds:
+                self._versions = {}
+
+    """ HELPER FUNCTIONS
+        Functions referenced in the code above.
+    """
+    def _get_jobs_index(self):
+        if self._jobs is None:
+            jobs = {}
+            for job in self._list_all(self.client.jobs.list_jobs, 'jobs'):
+                jobs.setdefault(job.name, []).append(job)
+            self._jobs = jobs
+        return self._jobs
+
+    def _get_experiments_index(self):
+        if self._experiments is None:
+            self._experiments = {
+                e.name: e for e in
+                self._list_all(self.client.list_experiments, 'experiments')
+            }
+        return self._experiments
+
+    def _get_pipelines_index(self):
+        if self._pipelines is None:
+            self._pipelines = {}
+            for pipeline in self._list_all(self.client.list_pipelines, 'pipelines'):
+                self._pipelines[pipeline.name] = pipeline
+                if getattr(pipeline, 'default_version', None) is not None:
+                    self._versions.setdefault(pipeline.id, pipeline.default_version)
+        return self._pipelines
+
+    def _list_all(self, list_func, attribute):
+        items = []
+        page_token = ''
+        while True:
+            response = list_func(page_token=page_token, page_size=self.page_size)
+            items.extend(getattr(response, attribute) or [])
+            page_token = response.next_page_token
+            if not page_token:
+                return items
+
+
+_METADATA = {}
+_METADATA_LOCK = threading.Lock()
+
+
+def get_metadata(client=None):
+    """Return the kubeflowMetadata snapshot shared by all users of a client.
+
+    Args:
+        client (kfp.Client): Defaults to the shared client for
+            configs.KFP_CLIENT_HOST.
+    """
+    client = client or CLIENT_POOL.get_kfp_client()
+    with _METADATA_LOCK:
+        metadata = _METADATA.get(id(client))
+        if metadata is None or metadata.client is not client:
+            metadata = kubeflowMetadata(client)
+            _METADATA[id(client)] = metadata
+        return metadata
@@ -1,15 +1,31 @@
 import os
+import re
+import dis
+import json
+import time
+import hashlib
+import inspect
+import pkgutil
+import argparse
+import importlib
 import kfp
 import configs
 from datetime import datetime as dt
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from algom.kubeflow.metadata import get_metadata
+from algom.utils.client import CLIENT_POOL
 
 
-# Load Kubeflow client
 PIPELINE_LOCAL_STORAGE_DIRECTORY = 'pipelines/compiled_pipelines'
+PIPELINE_PACKAGE = getattr(configs, 'PIPELINE_PACKAGE', 'pipelines')
 HOME_DIRECTORY = os.getcwd()
 DEFAULT_PAGE_SIZE = 200
-
-client = kfp.Client(host=configs.KFP_CLIENT_HOST)
+HASH_SUFFIX = '.sha256'
+# Marker of the source hash in pipeline and version descriptions
+HASH_PATTERN = re.compile(r'algom-hash: ([0-9a-f]{64})')
+# Pipeline decorator in a function's source, e.g. @dsl.pipeline()
+PIPELINE_DECORATOR_PATTERN = re.compile(r'^\s*@(\w+\.)*pipeline\b', re.MULTILINE)
+KFP_MAX_WORKERS = getattr(configs, 'KFP_MAX_WORKERS', 8)
 
 
 class pipelineLoader():
@@ -20,6 +36,13 @@ class pipelineLoader():
         pipeline_name='this_is_my_pipeline'
         pipeline_description='This is a dope pipeline.'
     )
+
+    The package is only recompiled, and a new version only uploaded,
+    when the source hash of the pipeline changes. The hash covers the
+    pipeline function source, the specs of the components it uses and
+    the kfp version. It is stored next to the compiled package and in
+    the description of each uploaded version. Pass use_cache=False to
+    always compile and upload.
     """
     def __init__(
         self,
@@ -28,8 +51,13 @@ class pipelineLoader():
         pipeline_description=None,
         local_storage_directory=PIPELINE_LOCAL_STORAGE_DIRECTORY,
         home_directory=HOME_DIRECTORY,
+        client=None,
+        metadata=None,
+        use_cache=True,
     ):
-        self.client = kfp.Client(host=configs.KFP_CLIENT_HOST)
+        self.client = client or CLIENT_POOL.get_kfp_client()
+        self.metadata = metadata or get_metadata(self.client)
+        self.use_cache=use_cache
         self.pipeline_function=pipeline_function
         self.pipeline_name=pipeline_name
         self.pipeline_description=pipeline_description
@@ -41,53 +69,414 @@ class pipelineLoader():
             "{}.zip".format(self.pipeline_name)
         )
 
+    def get_source_hash(self):
+        """Return the sha256 of the pipeline source, component specs and
+        kfp version."""
+        if not hasattr(self, 'source_hash'):
+            self.source_hash = get_source_hash(self.pipeline_function)
+        return self.source_hash
+
+    def is_compiled(self):
+        """Return True if the compiled package matches the source hash."""
+        return os.path.exists(self.pipeline_path) \
+            and _read_file(self.pipeline_path + HASH_SUFFIX) == self.get_source_hash()
+
     def compile_pipeline(self):
-        kfp.compiler.Compiler().compile(
+        if self.use_cache and self.is_compiled():
+            print("SUCCESS: Using compiled pipeline {}".format(self.pipeline_path))
+            return
+        compile_package(
             self.pipeline_function,
-            self.pipeline_path
+            self.pipeline_path,
+            self.get_source_hash()
         )
         print("RUNNING: Compiled pipeline and loaded to {}".format(
             self.pipeline_path
         ))
 
-    def set_pipelines(self):
-        pipeline_list = self.client.list_pipelines(page_size=DEFAULT_PAGE_SIZE)
-        self.pipelines = pipeline_list.pipelines
-        self.pipeline_names = [p.name for p in self.pipelines]
-        self.pipeline_ids = [p.id for p in self.pipelines]
-
     def _check_pipeline_exists(self):
-        return self.pipeline_name in self.pipeline_names
+        return self.metadata.get_pipeline(self.pipeline_name) is not None
+
+    def _check_version_matches(self):
+        """Return True if the latest uploaded version has the current
+        source hash."""
+        pipeline = self.metadata.get_pipeline(self.pipeline_name)
+        version = self.metadata.get_latest_version(pipeline.id)
+        return get_version_hash(pipeline, version) == self.get_source_hash()
+
+    def is_up_to_date(self):
+        return self.use_cache and self._check_pipeline_exists() \
+            and self._check_version_matches()
 
     def load_pipeline(self):
+        if self.is_up_to_date():
+            print("SUCCESS: {} is up to date.".format(self.pipeline_name))
+            self.load_response = None
+            return
         self.compile_pipeline()
-        self.set_pipelines()
 
         try:
-            if self._check_pipeline_exists():
-                # Load new version of the pipeline
-                print("RUNNING: Loading pipeline version: {}.".format(self.pipeline_name))
-                self.pipeline_version_name="{}_version_at_{}".format(
-                    self.pipeline_name, dt.now().strftime('%Y-%m-%dT%H:%M:%S')
-                )
-                self.load_response = self.client.upload_pipeline_version(
-                    pipeline_package_path=self.pipeline_path,
-                    pipeline_version_name=self.pipeline_version_name,
-                    pipeline_name=self.pipeline_name
-                )
-                print("SUCCESS: Load successful.\n{}".format(self.load_response))
+            self.upload_pipeline()
+        except Exception as e:
+            print("ERROR: {}.".format(e))
+
+    def upload_pipeline(self):
+        """Upload the compiled package as a new pipeline, or as a new
+        version of an existing one."""
+        hash_description = 'algom-hash: {}'.format(self.get_source_hash())
+        if self._check_pipeline_exists():
+            # Load new version of the pipeline
+            print("RUNNING: Loading pipeline version: {}.".format(self.pipeline_name))
+            self.pipeline_version_name="{}_version_at_{}".format(
+                self.pipeline_name, dt.now().strftime('%Y-%m-%dT%H:%M:%S')
+            )
+            self.load_response = self.client.upload_pipeline_version(
+                pipeline_package_path=self.pipeline_path,
+                pipeline_version_name=self.pipeline_version_name,
+                pipeline_name=self.pipeline_name,
+                description=hash_description
+            )
+            self.metadata.set_latest_version(
+                self.metadata.get_pipeline(self.pipeline_name).id,
+                self.load_response
+            )
+            print("SUCCESS: Load successful.\n{}".format(self.load_response))
+
+        else:
+            # Load new pipeline
+            print("RUNNING: Loading pipeline: {}.".format(
+                self.pipeline_name
+            ))
+            self.load_response = self.client.upload_pipeline(
+                pipeline_package_path=self.pipeline_path,
+                pipeline_name=self.pipeline_name,
+                description='\n'.join(filter(None, [
+                    self.pipeline_description, hash_description]))
+            )
+            self.metadata.add_pipeline(self.load_response)
+            print("SUCCESS: Load successful.\n{}".format(self.load_response))
+
+
+class pipelineBulkLoader():
+    """Compile and upload every pipeline function in a package.
+
+    Pipeline functions are the functions decorated with kfp.dsl.pipeline
+    in the modules of the package. The pipeline name and description
+    are taken from the decorator.
+
+    Up-to-date pipelines are skipped (see pipelineLoader). The rest are
+    compiled in parallel by a process pool, since compiling is CPU bound,
+    then uploaded concurrently by a thread pool. All uploads share one
+    kfp client and a single pipelines listing.
+
+    Args:
+        package (str): Package with the pipeline modules.
+        max_workers (int): Number of concurrent compiles and uploads.
+        client (kfp.Client): Defaults to the shared client for
+            configs.KFP_CLIENT_HOST.
+        use_cache (bool): Skip up-to-date compiles and uploads.
+        **kwargs: Additional pipelineLoader arguments.
+
+    Examples:
+        loader = pipelineBulkLoader('pipelines')
+        results = loader.load_pipelines()
+    """
+    def __init__(
+        self,
+        package=PIPELINE_PACKAGE,
+        max_workers=KFP_MAX_WORKERS,
+        client=None,
+        use_cache=True,
+        **kwargs
+    ):
+        self.package = package
+        self.max_workers = max_workers
+        self.client = client or CLIENT_POOL.get_kfp_client()
+        self.metadata = get_metadata(self.client)
+        self.loaders = [
+            pipelineLoader(
+                pipeline_function=function,
+                pipeline_name=getattr(function, '_component_human_name', function.__name__),
+                pipeline_description=getattr(function, '_component_description', None),
+                client=self.client,
+                metadata=self.metadata,
+                use_cache=use_cache,
+                **kwargs
+            )
+            for function in find_pipeline_functions(package)
+        ]
+
+    def load_pipelines(self):
+        """Compile and upload all pipelines and print a timing report.
+
+        Returns:
+            list: One dict per pipeline with pipeline_name, action
+                ('created', 'updated', 'unchanged' or 'failed'),
+                compile_seconds, upload_seconds and error.
+        """
+        start = time.perf_counter()
+        results = {
+            loader.pipeline_name: {
+                'pipeline_name': loader.pipeline_name,
+                'action': 'unchanged',
+                'compile_seconds': 0,
+                'upload_seconds': 0,
+                'error': None,
+            }
+            for loader in self.loaders
+        }
+        loaders = []
+        for loader in self.loaders:
+            try:
+                if not loader.is_up_to_date():
+                    loaders.append(loader)
+            except Exception as e:
+                self._fail(results[loader.pipeline_name], e)
+
+        # Compile
+        compiles = [l for l in loaders if not (l.use_cache and l.is_compiled())]
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                (loader, executor.submit(
+                    _compile_by_name,
+                    loader.pipeline_function.__module__,
+                    loader.pipeline_function.__name__,
+                    loader.pipeline_path,
+                    loader.get_source_hash()))
+                for loader in compiles
+            ]
+            for loader, future in futures:
+                try:
+                    results[loader.pipeline_name]['compile_seconds'] = future.result()
+                    print("SUCCESS: Compiled {}.".format(loader.pipeline_name))
+                except Exception as e:
+                    self._fail(results[loader.pipeline_name], e)
+        loaders = [l for l in loaders if results[l.pipeline_name]['action'] != 'failed']
+
+        # Upload
+        def _upload(loader):
+            result = results[loader.pipeline_name]
+            upload_start = time.perf_counter()
+            try:
+                result['action'] = 'updated' if loader._check_pipeline_exists() else 'created'
+                loader.upload_pipeline()
+            except Exception as e:
+                self._fail(result, e)
+            result['upload_seconds'] = time.perf_counter() - upload_start
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(_upload, loaders))
+
+        self.results = list(results.values())
+        print_load_report(self.results, time.perf_counter() - start)
+        return self.results
+
+    def _fail(self, result, error):
+        result['action'] = 'failed'
+        result['error'] = error
+        print("ERROR: Unable to load {}.\n{}".format(result['pipeline_name'], error))
+
+
+""" HELPER FUNCTIONS
+    Functions referenced in the code above.
+"""
+def get_source_hash(pipeline_function):
+    """Return the sha256 of a pipeline function's source, the specs of
+    the components it references and the kfp version.
+
+    Components are found among the globals the function refers to,
+    including attribute chains such as ops.train_op. Task factories
+    contribute their component spec and plain functions their source.
+    Functions from the pipeline's own package are followed in turn, so
+    a change to a helper that builds the pipeline changes the hash.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(kfp.__version__.encode())
+    package = pipeline_function.__module__.split('.')[0]
+    visited = set()
+    functions = [pipeline_function]
+    while functions:
+        function = functions.pop()
+        if id(function) in visited:
+            continue
+        visited.add(id(function))
+        hasher.update(_get_source(function).encode())
+        for value in _get_referenced_values(function):
+            spec = getattr(value, 'component_spec', None)
+            if spec is not None:
+                spec = spec.to_dict() if hasattr(spec, 'to_dict') else spec
+                hasher.update(json.dumps(spec, sort_keys=True, default=str).encode())
+            elif inspect.isfunction(value):
+                if value.__module__.split('.')[0] == package:
+                    functions.append(value)
+                else:
+                    hasher.update(_get_source(value).encode())
+    return hasher.hexdigest()
 
+
+def compile_package(pipeline_function, pipeline_path, source_hash):
+    """Compile a pipeline function and record its source hash.
+
+    Returns:
+        float: Seconds spent compiling.
+    """
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(pipeline_path), exist_ok=True)
+    kfp.compiler.Compiler().compile(pipeline_function, pipeline_path)
+    with open(pipeline_path + HASH_SUFFIX, 'w') as f:
+        f.write(source_hash)
+    return time.perf_counter() - start
+
+
+def find_pipeline_functions(package=PIPELINE_PACKAGE):
+    """Return the kfp.dsl.pipeline functions defined in a package.
+
+    Pipelines are recognised by the attributes the decorator sets when
+    given a name or description, or else by a pipeline decorator in
+    their source. Other functions with 'pipeline' in their name are
+    reported as skipped. Functions imported into a module from
+    elsewhere are not repeated.
+    """
+    package = importlib.import_module(package)
+    modules = [package]
+    for module_info in pkgutil.walk_packages(
+            package.__path__, prefix=package.__name__ + '.'):
+        modules.append(importlib.import_module(module_info.name))
+    functions = []
+    for module in modules:
+        for value in vars(module).values():
+            if not inspect.isfunction(value) or value.__module__ != module.__name__:
+                continue
+            if _is_pipeline_function(value):
+                functions.append(value)
+            elif 'pipeline' in value.__name__.lower():
+                print("RUNNING: Skipping {}.{}, not a kfp.dsl.pipeline function.".format(
+                    module.__name__, value.__name__))
+    return functions
+
+
+def print_load_report(results, seconds):
+    """Print one row per pipeline and the number of pipelines per action."""
+    width = max([len(r['pipeline_name']) for r in results] + [len('PIPELINE')])
+    print("{}  {:<9}  {:>8}  {:>8}".format(
+        'PIPELINE'.ljust(width), 'ACTION', 'COMPILE', 'UPLOAD'))
+    for r in results:
+        print("{}  {:<9}  {:>8.2f}  {:>8.2f}".format(
+            r['pipeline_name'].ljust(width), r['action'],
+            r['compile_seconds'], r['upload_seconds']))
+    counts = [
+        '{} {}'.format(sum(r['action'] == action for r in results), action)
+        for action in ('created', 'updated', 'unchanged', 'failed')
+        if any(r['action'] == action for r in results)
+    ]
+    print("{}: Loaded {} pipelines in {:.2f}s ({}).".format(
+        'ERROR' if any(r['action'] == 'failed' for r in results) else 'SUCCESS',
+        len(results), seconds, ', '.join(counts)))
+
+
+def get_version_hash(pipeline, version):
+    """Return the source hash stored with a pipeline version, or None.
+
+    Uploaded versions keep it in their description. The first version
+    of a pipeline is named after the pipeline and falls back to the
+    pipeline description.
+    """
+    if version is None:
+        return None
+    descriptions = [getattr(version, 'description', None)]
+    if version.name == pipeline.name:
+        descriptions.append(getattr(pipeline, 'description', None))
+    for description in descriptions:
+        match = HASH_PATTERN.search(description or '')
+        if match:
+            return match.group(1)
+    return None
+
+
+def _compile_by_name(module_name, function_name, pipeline_path, source_hash):
+    # Worker processes import the pipeline function rather than unpickle it
+    pipeline_function = getattr(importlib.import_module(module_name), function_name)
+    return compile_package(pipeline_function, pipeline_path, source_hash)
+
+
+def _is_pipeline_function(function):
+    if hasattr(function, '_component_human_name') \
+            or hasattr(function, '_component_description'):
+        return True
+    # The decorator sets no attribute when used without arguments
+    try:
+        source = inspect.getsource(function)
+    except (OSError, TypeError):
+        return False
+    return PIPELINE_DECORATOR_PATTERN.search(source.split('def ', 1)[0]) is not None
+
+
+def _get_referenced_values(function):
+    """Return the globals a function refers to, resolving attribute
+    chains, in the order they appear in its code and nested code."""
+    values = []
+    codes = [function.__code__]
+    while codes:
+        code = codes.pop(0)
+        value = None
+        for instruction in dis.get_instructions(code):
+            if instruction.opname == 'LOAD_GLOBAL':
+                value = function.__globals__.get(instruction.argval)
+            elif instruction.opname in ('LOAD_ATTR', 'LOAD_METHOD') \
+                    and value is not None:
+                value = getattr(value, instruction.argval, None)
             else:
-                # Load new pipeline
-                print("RUNNING: Loading pipeline: {}.".format(
-                    self.pipeline_name
-                ))
-                self.load_response = self.client.upload_pipeline(
-                    pipeline_package_path=self.pipeline_path,
-                    pipeline_name=self.pipeline_name,
-                    description=self.pipeline_description
-                )
-                print("SUCCESS: Load successful.\n{}".format(self.load_response))
+                value = None
+            if value is not None:
+                values.append(value)
+        codes.extend(c for c in code.co_consts if inspect.iscode(c))
+    return values
 
-        except Exception as e:
-            print("ERROR: {}.".format(e))
+
+def _get_source(function):
+    try:
+        return inspect.getsource(function)
+    except (OSError, TypeError):
+        # Source is unavailable, e.g. for functions defined in exec
+        return function.__code__.co_code.hex()
+
+
+def _read_file(filepath):
+    if not os.path.exists(filepath):
+        return None
+    with open(filepath, 'r') as f:
+        return f.read().strip()
+
+
+if __name__ == '__main__':
+
+    # Add and parse bash arguments
+    parser = argparse.ArgumentParser(
+        description="Compile and upload all Kubeflow pipelines in a package."
+    )
+    parser.add_argument(
+        '-package',
+        type=str,
+        default=PIPELINE_PACKAGE,
+        help='Package with the pipeline modules.',
+    )
+    parser.add_argument(
+        '-workers',
+        type=int,
+        default=KFP_MAX_WORKERS,
+        help='Number of concurrent compiles and uploads.',
+    )
+    parser.add_argument(
+        '-force',
+        action='store_true',
+        help='Compile and upload pipelines even if unchanged.',
+    )
+    args = parser.parse_args()
+
+    # Load pipelines
+    loader = pipelineBulkLoader(
+        args.package,
+        max_workers=args.workers,
+        use_cache=not args.force
+    )
+    loader.load_pipelines()
@@ -1,17 +1,45 @@
 import os
+import json
+import time
 import yaml
+import random
+import urllib3
 import argparse
-import kfp
-import kfp.components as comp
 import configs
-from algom.kubeflow import utils
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from algom.kubeflow.metadata import get_metadata
+from algom.utils.client import CLIENT_POOL
 
 
-DEFAULT_PAGE_SIZE = 1000
-
-
-# Load Kubeflow client
-client = kfp.Client(host=configs.KFP_CLIENT_HOST)
+KFP_MAX_WORKERS = getattr(configs, 'KFP_MAX_WORKERS', 8)
+KFP_RETRIES = getattr(configs, 'KFP_RETRIES', 3)
+KFP_RETRY_BACKOFF = getattr(configs, 'KFP_RETRY_BACKOFF', 1.0)
+DEPLOY_ACTIONS = (
+    'created', 'updated', 'enabled', 'disabled', 'deleted', 'unchanged',
+    'failed', 'skipped')
+# Deploy action reported for each planned action
+PLAN_ACTIONS = {
+    'create': 'created',
+    'recreate': 'updated',
+    'enable': 'enabled',
+    'disable': 'disabled',
+    'delete': 'deleted',
+    'none': 'unchanged',
+}
+# Fields of a recurring run compared by pipelineManager.plan
+JOB_FIELDS = (
+    'params', 'cron_expression', 'interval_second', 'start_time', 'end_time',
+    'version_id', 'experiment_id', 'description', 'max_concurrency',
+    'no_catchup', 'enabled')
+# Errors retried by pipelineYaml, along with HTTP 429 and 5xx responses
+TRANSIENT_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    urllib3.exceptions.MaxRetryError,
+    urllib3.exceptions.ProtocolError,
+    urllib3.exceptions.TimeoutError,
+)
 
 
 class pipelineManager():
@@ -38,14 +66,16 @@ class pipelineManager():
         max_concurrency=1,
         no_catchup=True, 
         enabled=True,
-        status='Enabled'
+        status='Enabled',
+        client=None,
+        metadata=None
     ):
-        self.client = kfp.Client(host=configs.KFP_CLIENT_HOST)
+        self.client = client or CLIENT_POOL.get_kfp_client()
         self.jobs_client = self.client.jobs
+        self.metadata = metadata or get_metadata(self.client)
         self.job_name = job_name
         self.job_ids = self._get_job_ids()
         self.pipeline_name = pipeline_name
-        self.experiments_list = self.client.list_experiments().experiments
         self.experiment_id = experiment_id or self._get_experiment_id(experiment_name)
         self.pipeline_id = pipeline_id or self._get_pipeline_id(pipeline_name)
         self.version_id = version_id or self._get_version_id()
@@ -62,48 +92,44 @@ class pipelineManager():
         self.status = status
 
     def _get_experiment_id(self, experiment_name):
-        return [e.id for e in self.experiments_list if e.name == experiment_name][0]
+        experiment = self.metadata.get_experiment(experiment_name)
+        if experiment is None:
+            raise ValueError('Experiment {} not found.'.format(experiment_name))
+        return experiment.id
 
     def _get_pipeline_id(self, pipeline_name):
-        try:
-            return self.client.get_pipeline_id(pipeline_name)
-        except:
-            return None
+        pipeline = self.metadata.get_pipeline(pipeline_name)
+        return pipeline.id if pipeline else None
     
     def _get_version_id(self):
-        try:
-            return utils.get_latest_pipeline_version(
-                self.pipeline_id, self.pipeline_name
-            )
-        except:
+        if not self.pipeline_id:
             return None
+        version = self.metadata.get_latest_version(self.pipeline_id)
+        return version.id if version else None
 
     def _check_job_name_match(self):
-        return any([
-            j.name==self.job_name for j in \
-            self.jobs_client.list_jobs(page_size=DEFAULT_PAGE_SIZE).jobs if j.enabled
-        ])
+        return any([j.enabled for j in self.metadata.get_jobs(self.job_name)])
 
     def _get_job_ids(self):
-        return [
-            j.id for j in self.jobs_client.list_jobs(page_size=DEFAULT_PAGE_SIZE).jobs \
-            if j.name==self.job_name
-        ]
+        return [j.id for j in self.metadata.get_jobs(self.job_name)]
 
     def enable_job(self):
         self.job_ids = self._get_job_ids()
         for job in self.job_ids:
             self.jobs_client.enable_job(id=job)
+            self.metadata.set_job_enabled(job, True)
 
     def disable_job(self):
         self.job_ids = self._get_job_ids()
         for job in self.job_ids:
             self.jobs_client.disable_job(id=job)
+            self.metadata.set_job_enabled(job, False)
 
     def delete_job(self):
         self.job_ids = self._get_job_ids()
         for job in self.job_ids:
             self.jobs_client.delete_job(id=job)
+            self.metadata.remove_job(job)
 
     def create_job(self):
         self.job = self.client.create_recurring_run(
@@ -121,6 +147,7 @@ class pipelineManager():
             version_id=self.version_id,
             enabled=self.enabled
         )
+        self.metadata.add_job(self.job)
         self.job_ids = self._get_job_ids()
 
     def create_run(self):
@@ -134,6 +161,12 @@ class pipelineManager():
         )
 
     def update_job(self):
+        """Apply the status of this entry to Kubeflow.
+
+        Returns:
+            str: Action taken: 'created', 'updated', 'enabled',
+                'disabled' or 'deleted'.
+        """
         job_match = self._check_job_name_match()
         status = str(self.status).lower()
 
@@ -141,16 +174,20 @@ class pipelineManager():
         if job_match and status=='enabled':
             print("RUNNING: Enabling {} in {}.".format(self.job_name, self.experiment_name))
             self.enable_job()
+            return 'enabled'
         elif job_match and status=='disabled':
             print("RUNNING: Disabling {} in {}.".format(self.job_name, self.experiment_name))
             self.disable_job()
+            return 'disabled'
         elif job_match and status=='update':
             print("RUNNING: Updating {} in {}.".format(self.job_name, self.experiment_name))
             self.delete_job()
             self.create_job()
+            return 'updated'
         elif job_match and status=='delete':
             print("RUNNING: Deleting {} in {}.".format(self.job_name, self.experiment_name))
             self.delete_job()
+            return 'deleted'
 
         # If job_name doesn't exist ...
         elif not job_match and status=='disabled':
@@ -158,23 +195,135 @@ class pipelineManager():
             print("RUNNING: Disabling {} in {}.".format(self.job_name, self.experiment_name))
             self.create_job()
             self.disable_job()
+            return 'created'
         else:
             print("RUNNING: Creating {} in {}.".format(self.job_name, self.experiment_name))
             self.create_job()
+            return 'created'
+
+    def plan(self):
+        """Compare this entry to the recurring runs in Kubeflow.
+
+        Recurring runs can't be edited in place, so any change other
+        than enabling or disabling is planned as a recreate.
+
+        Returns:
+            dict: job_name, action ('create', 'recreate', 'enable',
+                'disable', 'delete' or 'none') and changes, a dict of
+                field to (current, desired) values.
+        """
+        jobs = self.metadata.get_jobs(self.job_name)
+        status = str(self.status).lower()
+        plan = {'job_name': self.job_name, 'action': 'none', 'changes': {}}
+        if status == 'delete':
+            plan['action'] = 'delete' if jobs else 'none'
+            return plan
+
+        desired = self.get_desired_state()
+        if not jobs:
+            plan['action'] = 'create'
+            plan['changes'] = {
+                k: (None, v) for k, v in desired.items() if v is not None}
+            return plan
+
+        current = get_job_state(jobs[0])
+        plan['changes'] = {
+            k: (current[k], v) for k, v in desired.items()
+            if v is not None and current[k] != v
+        }
+        if len(jobs) > 1:
+            plan['changes']['jobs'] = (len(jobs), 1)
+        if set(plan['changes']) - {'enabled'}:
+            plan['action'] = 'recreate'
+        elif plan['changes']:
+            plan['action'] = 'enable' if desired['enabled'] else 'disable'
+        return plan
+
+    def apply(self, plan):
+        """Make the API calls of a plan returned by self.plan.
+
+        Returns:
+            str: Action taken, e.g. 'updated' or 'unchanged'.
+        """
+        action = plan['action']
+        if action in ('create', 'recreate'):
+            self.enabled = self.get_desired_state()['enabled']
+        if action in ('recreate', 'delete'):
+            self.delete_job()
+        if action in ('create', 'recreate'):
+            self.create_job()
+        elif action == 'enable':
+            self.enable_job()
+        elif action == 'disable':
+            self.disable_job()
+        return PLAN_ACTIONS[action]
+
+    def get_desired_state(self):
+        """Return the JOB_FIELDS of this entry, formatted as Kubeflow
+        stores them."""
+        status = str(self.status).lower()
+        return {
+            'params': {
+                k: json.dumps(v) if isinstance(v, (list, dict)) else str(v)
+                for k, v in (self.params or {}).items()
+            },
+            'cron_expression': self.cron_expression,
+            'interval_second': _to_str(self.interval_second),
+            'start_time': _to_timestamp(self.start_time),
+            'end_time': _to_timestamp(self.end_time),
+            'version_id': self.version_id,
+            'experiment_id': self.experiment_id,
+            'description': self.description or None,
+            'max_concurrency': _to_str(self.max_concurrency),
+            'no_catchup': None if self.no_catchup is None else bool(self.no_catchup),
+            'enabled': {'enabled': True, 'disabled': False}.get(
+                status, bool(self.enabled)),
+        }
 
 
 class pipelineYaml():
     """Load multiple Kubeflow pipelines from a YAML file.
+
+    Entries are applied concurrently by a pool of threads that share one
+    kfp client and one metadata snapshot. Entries with the same job_name
+    are applied one after another, in file order.
+
+    Args:
+        file (str): YAML file with one entry per recurring run.
+        max_workers (int): Number of entries applied concurrently.
+        retries (int): Retries of an entry that failed with a transient
+            error (see is_transient_error), with exponential backoff.
+        client (kfp.Client): Defaults to the shared client for
+            configs.KFP_CLIENT_HOST.
+        diff (bool): Compare each entry to Kubeflow and only make the
+            calls needed to reconcile them (see pipelineManager.plan).
+        dry_run (bool): Print the plan of each entry without applying it.
+            Implies diff.
     """
     
-    def __init__(self, file):
+    def __init__(
+        self,
+        file,
+        max_workers=KFP_MAX_WORKERS,
+        retries=KFP_RETRIES,
+        client=None,
+        diff=False,
+        dry_run=False
+    ):
         self.file=file
+        self.max_workers=max_workers
+        self.retries=retries
+        self.diff=diff or dry_run
+        self.dry_run=dry_run
+        self.retry_backoff=KFP_RETRY_BACKOFF
+        self.client=client or CLIENT_POOL.get_kfp_client()
+        self.metadata=get_metadata(self.client)
         self.pipeline_entries=self._get_pipeline_entries()
-        self.update_pipelines()
+        self.results=self.update_pipelines()
 
     def _get_pipeline_entries(self):
-        inputs_file = open(self.file, 'r')
-        return yaml.load(inputs_file)
+        with open(self.file, 'r') as inputs_file:
+            return yaml.safe_load(inputs_file)
 
     def _swap_nones(self, entry):
         """Convert none strings to None
@@ -191,26 +340,190 @@ class pipelineYaml():
         return d
 
     def update_pipelines(self):
-        for entry in self.pipeline_entries:
-            print("RUNNING: Loading {} to Kubeflow pipelines.".format(entry.get('job_name')))
-            entry = self._swap_nones(entry)
-            manager = pipelineManager(
-                job_name=entry.get('job_name'),
-                pipeline_name=entry.get('pipeline_name'),
-                params=entry.get('params', {}),
-                experiment_name=entry.get('experiment_name', 'Default'),
-                version_id=entry.get('version_id'),
-                description=entry.get('description'),
-                start_time=entry.get('start_time'), 
-                end_time=entry.get('end_time'),
-                interval_second=entry.get('interval_second'), 
-                cron_expression=entry.get('cron_expression'),
-                max_concurrency=entry.get('max_concurrency', 1),
-                no_catchup=entry.get('no_catchup', True), 
-                enabled=entry.get('enabled', True),
-                status=entry.get('status', 'disabled')
-            )
-            manager.update_job()
+        """Apply every entry and print a summary table.
+
+        A failed entry is retried up to self.retries times. If it still
+        fails, the later entries with the same job_name are skipped.
+
+        Returns:
+            list: One dict per entry with job_name, action, attempts,
+                seconds and error.
+        """
+        start = time.perf_counter()
+        groups = {}
+        for index, entry in enumerate(self.pipeline_entries):
+            groups.setdefault(entry.get('job_name'), []).append((index, entry))
+        results = [None] * len(self.pipeline_entries)
+
+        def _apply_group(entries):
+            failed = False
+            for index, entry in entries:
+                if failed:
+                    results[index] = {
+                        'job_name': entry.get('job_name'),
+                        'action': 'skipped',
+                        'attempts': 0,
+                        'seconds': 0,
+                        'error': None,
+                    }
+                    continue
+                results[index] = self._apply_entry(entry)
+                failed = results[index]['action'] == 'failed'
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(_apply_group, groups.values()))
+
+        print_deploy_summary(results, time.perf_counter() - start, self.dry_run)
+        return results
+
+    def _apply_entry(self, entry):
+        job_name = entry.get('job_name')
+        print("RUNNING: Loading {} to Kubeflow pipelines.".format(job_name))
+        start = time.perf_counter()
+        result = {'job_name': job_name, 'action': 'failed', 'error': None}
+        for attempt in range(self.retries + 1):
+            result['attempts'] = attempt + 1
+            try:
+                manager = self._get_manager(entry)
+                if self.diff:
+                    plan = manager.plan()
+                    print_plan(plan, self.dry_run)
+                    result['action'] = PLAN_ACTIONS[plan['action']] \
+                        if self.dry_run else manager.apply(plan)
+                else:
+                    result['action'] = manager.update_job()
+                result['error'] = None
+                break
+            except Exception as e:
+                result['error'] = e
+                print("ERROR: Attempt {} of {} failed for {}.\n{}".format(
+                    attempt + 1, self.retries + 1, job_name, e))
+                # A failed write may have been partly applied
+                self.metadata.invalidate('jobs')
+                if not is_transient_error(e):
+                    break
+                if attempt < self.retries:
+                    time.sleep(
+                        self.retry_backoff * 2 ** attempt * (1 + random.random()))
+        result['seconds'] = time.perf_counter() - start
+        return result
+
+    def _get_manager(self, entry):
+        entry = self._swap_nones(entry)
+        return pipelineManager(
+            job_name=entry.get('job_name'),
+            pipeline_name=entry.get('pipeline_name'),
+            params=entry.get('params', {}),
+            experiment_name=entry.get('experiment_name', 'Default'),
+            version_id=entry.get('version_id'),
+            description=entry.get('description'),
+            start_time=entry.get('start_time'), 
+            end_time=entry.get('end_time'),
+            interval_second=entry.get('interval_second'), 
+            cron_expression=entry.get('cron_expression'),
+            max_concurrency=entry.get('max_concurrency', 1),
+            no_catchup=entry.get('no_catchup', True), 
+            enabled=entry.get('enabled', True),
+            status=entry.get('status', 'disabled'),
+            client=self.client,
+            metadata=self.metadata
+        )
+
+
+""" HELPER FUNCTIONS
+    Functions referenced in the code above.
+"""
+def get_job_state(job):
+    """Return the JOB_FIELDS of a Kubeflow recurring run (ApiJob)."""
+    trigger = job.trigger
+    cron_schedule = getattr(trigger, 'cron_schedule', None)
+    periodic_schedule = getattr(trigger, 'periodic_schedule', None)
+    schedule = cron_schedule or periodic_schedule
+    references = {
+        r.key.type: r.key.id for r in getattr(job, 'resource_references', None) or []
+    }
+    parameters = getattr(job.pipeline_spec, 'parameters', None) or []
+    return {
+        'params': {p.name: p.value for p in parameters},
+        'cron_expression': getattr(cron_schedule, 'cron', None),
+        'interval_second': _to_str(getattr(periodic_schedule, 'interval_second', None)),
+        'start_time': _to_timestamp(getattr(schedule, 'start_time', None)),
+        'end_time': _to_timestamp(getattr(schedule, 'end_time', None)),
+        'version_id': references.get('PIPELINE_VERSION'),
+        'experiment_id': references.get('EXPERIMENT'),
+        'description': getattr(job, 'description', None) or None,
+        'max_concurrency': _to_str(job.max_concurrency),
+        'no_catchup': bool(getattr(job, 'no_catchup', False)),
+        'enabled': bool(job.enabled),
+    }
+
+
+def is_transient_error(error):
+    """Return True for connection errors, timeouts and HTTP 429 or 5xx
+    responses, which are worth retrying."""
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    # kfp_server_api.ApiException carries the HTTP status
+    status = getattr(error, 'status', None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+def print_plan(plan, dry_run=False):
+    if plan['action'] == 'none':
+        print("{}: {} is unchanged.".format(
+            'DRY RUN' if dry_run else 'SUCCESS', plan['job_name']))
+        return
+    changes = ', '.join(
+        '{}: {} -> {}'.format(k, current, desired)
+        for k, (current, desired) in plan['changes'].items()
+    )
+    print("{}: {} {}{}".format(
+        'DRY RUN' if dry_run else 'RUNNING',
+        plan['action'],
+        plan['job_name'],
+        ' ({})'.format(changes) if changes else ''))
+
+
+def print_deploy_summary(results, seconds, dry_run=False):
+    """Print one row per entry and the number of entries per action."""
+    width = max([len(str(r['job_name'])) for r in results] + [len('JOB NAME')])
+    print("{}  {:<9}  {:>8}  {:>8}".format(
+        'JOB NAME'.ljust(width), 'ACTION', 'ATTEMPTS', 'SECONDS'))
+    for r in results:
+        print("{}  {:<9}  {:>8}  {:>8.2f}".format(
+            str(r['job_name']).ljust(width), r['action'], r['attempts'], r['seconds']))
+    counts = [
+        '{} {}'.format(sum(r['action'] == action for r in results), action)
+        for action in DEPLOY_ACTIONS
+        if any(r['action'] == action for r in results)
+    ]
+    if dry_run:
+        status = 'DRY RUN'
+    elif any(r['action'] == 'failed' for r in results):
+        status = 'ERROR'
+    else:
+        status = 'SUCCESS'
+    print("{}: {} {} entries in {:.2f}s ({}).".format(
+        status, 'Planned' if dry_run else 'Deployed',
+        len(results), seconds, ', '.join(counts)))
+
+
+def _to_str(value):
+    return None if value is None else str(value)
+
+
+def _to_timestamp(value):
+    """Format a datetime or RFC 3339 string as a UTC timestamp string."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
 
 
 if __name__ == '__main__':
@@ -226,7 +539,28 @@ if __name__ == '__main__':
         default=None,
         help='',
     )
+    parser.add_argument(
+        '-workers',
+        type=int,
+        default=KFP_MAX_WORKERS,
+        help='Number of entries applied concurrently.',
+    )
+    parser.add_argument(
+        '-diff',
+        action='store_true',
+        help='Only make the calls needed to apply changed entries.',
+    )
+    parser.add_argument(
+        '-plan',
+        action='store_true',
+        help='Print the changes of each entry without applying them.',
+    )
     args = parser.parse_args()
 
     # Load pipelines
-    loader = pipelineYaml(args.file)
+    loader = pipelineYaml(
+        args.file,
+        max_workers=args.workers,
+        diff=args.diff,
+        dry_run=args.plan
+    )
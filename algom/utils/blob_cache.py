@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+""" algoMosaic blobCache that keeps local copies of GCS blobs.
+
+Blobs are cached on local disk by bucket and path, together with the
+generation they were downloaded at. On each read, the blob is fetched
+with if_generation_not_match. GCS answers 304 Not Modified for unchanged
+blobs, so they are served from disk without being downloaded again.
+
+The cache is safe to share between processes on the same node. Each
+entry is guarded by an fcntl file lock, and files are replaced
+atomically. When the cache grows past its size limit, the least recently
+used entries are evicted first.
+
+"""
+
+import os
+import json
+import fcntl
+import shutil
+import hashlib
+import contextlib
+from google.api_core.exceptions import NotModified
+
+import configs
+
+
+BLOB_CACHE_DIRECTORY = getattr(
+    configs, 'BLOB_CACHE_DIRECTORY',
+    os.path.join(os.path.expanduser('~'), '.algom', 'blob_cache'))
+BLOB_CACHE_MAX_BYTES = getattr(configs, 'BLOB_CACHE_MAX_BYTES', 10 * 1024 ** 3)
+
+
+class blobCache():
+    """Read-through local disk cache of GCS blobs.
+
+    Args:
+        directory (str): Local directory where blobs are stored.
+        max_bytes (int): Maximum size of the cache on disk.
+
+    Examples:
+        cache = blobCache()
+        data = cache.read(bucket, 'lookups/countries.csv')
+        cache.copy(bucket, 'models/model.pkl', 'model.pkl')
+    """
+    def __init__(
+        self,
+        directory=BLOB_CACHE_DIRECTORY,
+        max_bytes=BLOB_CACHE_MAX_BYTES,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def read(self, bucket, storage_path):
+        """Return the contents of a blob as bytes."""
+        with self._fetch(bucket, storage_path) as path:
+            with open(path, 'rb') as f:
+                return f.read()
+
+    def copy(self, bucket, storage_path, filename):
+        """Copy a blob to a local file."""
+        with self._fetch(bucket, storage_path) as path:
+            shutil.copyfile(path, filename)
+        return filename
+
+    def delete(self, bucket_name, storage_path):
+        key = get_cache_key(bucket_name, storage_path)
+        with self._lock(key):
+            self._remove(key)
+
+    def clear(self):
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.json'):
+                key = filename[:-len('.json')]
+                with self._lock(key):
+                    self._remove(key)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in
+        max_bytes. Entries locked by other processes are skipped."""
+        entries = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith(('.json', '.lock', '.tmp')):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Removed by another process since it was listed
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            with self._lock(key, blocking=False) as locked:
+                if locked:
+                    self._remove(key)
+                    total_bytes -= size
+
+    """ HELPER FUNCTIONS
+        Functions referenced in the code above.
+    """
+    @contextlib.contextmanager
+    def _fetch(self, bucket, storage_path):
+        """Yield the local path of an up-to-date copy of a blob, holding
+        the entry's lock."""
+        key = get_cache_key(bucket.name, storage_path)
+        data_path, meta_path = self._get_paths(key)
+        with self._lock(key):
+            metadata = self._read_metadata(meta_path)
+            generation = metadata.get('generation') if os.path.exists(data_path) else None
+            blob = bucket.blob(storage_path)
+            tmp_path = data_path + '.tmp'
+            try:
+                # The client creates the file before a 304 response arrives
+                blob.download_to_filename(
+                    tmp_path, if_generation_not_match=generation)
+                os.replace(tmp_path, data_path)
+                with open(meta_path, 'w') as f:
+                    json.dump({
+                        'bucket': bucket.name,
+                        'path': storage_path,
+                        'generation': blob.generation,
+                        'etag': blob.etag,
+                    }, f)
+                print("SUCCESS: Cached gs://{}/{}.".format(bucket.name, storage_path))
+            except NotModified:
+                # Touch the entry so LRU eviction keeps recently used blobs
+                os.utime(data_path, None)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            yield data_path
+        self.evict()
+
+    @contextlib.contextmanager
+    def _lock(self, key, blocking=True):
+        lock_path = self._get_lock_path(key)
+        while True:
+            f = open(lock_path, 'w')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                f.close()
+                yield False
+                return
+            # Retry if the lock file was removed by _remove while waiting
+            if _is_same_file(f, lock_path):
+                break
+            f.close()
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+
+    def _get_paths(self, key):
+        data_path = os.path.join(self.directory, key)
+        return data_path, data_path + '.json'
+
+    def _read_metadata(self, meta_path):
+        if not os.path.exists(meta_path):
+            return {}
+        with open(meta_path, 'r') as f:
+            return json.load(f)
+
+    def _get_lock_path(self, key):
+        return os.path.join(self.directory, key + '.lock')
+
+    def _remove(self, key):
+        # Called with the entry's lock held, so the lock file goes last
+        for path in self._get_paths(key) + (self._get_lock_path(key),):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+
+
+def get_cache_key(bucket_name, storage_path):
+    return hashlib.sha1('{}/{}'.format(bucket_name, storage_path).encode()).hexdigest()
+
+
+def _is_same_file(f, path):
+    try:
+        return os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+""" algoMosaic blobIndex that caches bucket listings in a local SQLite file.
+
+Listing a bucket with millions of objects takes minutes. The index stores
+the name, size, updated time, generation, checksums and custom metadata of
+each blob under a prefix, so repeated listings are served from local disk.
+storageObject.iter_blobs, list_prefixes and sync use it when passed
+index=True (or a blobIndex).
+
+Each prefix is refreshed incrementally:
+    - A prefix is only re-listed once its last refresh is older than the
+      TTL (or when forced).
+    - Each page of the listing is upserted as it arrives, so memory use is
+      bounded by the page size.
+    - The last listed name is checkpointed. An interrupted refresh resumes
+      from it (via start_offset) instead of starting over.
+    - Blobs that were not seen by a completed refresh are deleted.
+
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import contextlib
+
+import configs
+from algom.utils.storage_object import storageObject, LIST_PAGE_SIZE
+
+
+BLOB_INDEX_FILEPATH = getattr(
+    configs, 'BLOB_INDEX_FILEPATH',
+    os.path.join(os.path.expanduser('~'), '.algom', 'blob_index.sqlite'))
+BLOB_INDEX_TTL = getattr(configs, 'BLOB_INDEX_TTL', 60 * 60)
+INDEX_FIELDS = (
+    'name', 'size', 'updated', 'generation', 'md5_hash', 'crc32c', 'metadata')
+
+
+class blobIndex():
+    """Local index of blob listings, refreshed per prefix.
+
+    Args:
+        filepath (str): SQLite file holding the index.
+        ttl (int): Seconds before a prefix is re-listed. None never
+            re-lists a prefix once it is indexed.
+        storage (storageObject): Used to list blobs.
+
+    Examples:
+        index = blobIndex()
+        for blob in index.iter_blobs('my_bucket', prefix='models/'):
+            print(blob['name'], blob['size'])
+
+        # Or through storageObject, as storage.Blob objects
+        storageObject().sync('models', 'my_bucket', prefix='models/', index=index)
+    """
+    def __init__(
+        self,
+        filepath=BLOB_INDEX_FILEPATH,
+        ttl=BLOB_INDEX_TTL,
+        storage=None,
+    ):
+        self.filepath = filepath
+        self.ttl = ttl
+        self.storage = storage or storageObject()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(blobs)')]
+            if columns and 'metadata' not in columns:
+                # Indexes written before metadata was stored are rebuilt
+                conn.execute('DROP TABLE blobs')
+                conn.execute('DROP TABLE IF EXISTS refreshes')
+            conn.execute("""CREATE TABLE IF NOT EXISTS blobs (
+                bucket TEXT, name TEXT, size INTEGER, updated TEXT,
+                generation INTEGER, md5_hash TEXT, crc32c TEXT, metadata TEXT,
+                refresh_id TEXT, PRIMARY KEY (bucket, name))""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS refreshes (
+                bucket TEXT, prefix TEXT, refresh_id TEXT, last_name TEXT,
+                completed_at REAL, PRIMARY KEY (bucket, prefix))""")
+
+    def iter_blobs(
+        self,
+        bucket_name,
+        prefix='',
+        start_offset=None,
+        end_offset=None,
+        refresh=None,
+    ):
+        """Iterate over indexed blobs under a prefix, ordered by name.
+
+        Args:
+            refresh (bool): True forces a refresh, False never refreshes.
+                By default the prefix is refreshed once its TTL expires.
+
+        Yields:
+            dict: name, size, updated, generation, md5_hash, crc32c and
+                metadata.
+        """
+        if refresh or (refresh is None and self.is_stale(bucket_name, prefix)):
+            self.refresh(bucket_name, prefix)
+        query = 'SELECT {} FROM blobs WHERE bucket = ? AND substr(name, 1, ?) = ?'.format(
+            ', '.join(INDEX_FIELDS))
+        args = [bucket_name, len(prefix), prefix]
+        if start_offset:
+            query += ' AND name >= ?'
+            args.append(start_offset)
+        if end_offset:
+            query += ' AND name < ?'
+            args.append(end_offset)
+        with self._connect() as conn:
+            for row in conn.execute(query + ' ORDER BY name', args):
+                yield _get_blob_dict(row)
+
+    def list_prefixes(self, bucket_name, prefix='', delimiter='/', refresh=None):
+        """Return the indexed sub-directories directly under prefix."""
+        prefixes = set()
+        for blob in self.iter_blobs(bucket_name, prefix, refresh=refresh):
+            name, found, _ = blob['name'][len(prefix):].partition(delimiter)
+            if found:
+                prefixes.add(prefix + name + delimiter)
+        return sorted(prefixes)
+
+    def get(self, bucket_name, name):
+        """Return the indexed properties of a blob, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT {} FROM blobs WHERE bucket = ? AND name = ?'.format(
+                    ', '.join(INDEX_FIELDS)),
+                (bucket_name, name),
+            ).fetchone()
+        return _get_blob_dict(row) if row else None
+
+    def is_stale(self, bucket_name, prefix=''):
+        """Return True if neither the prefix nor a parent prefix was
+        refreshed within the TTL."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT prefix, completed_at FROM refreshes '
+                'WHERE bucket = ? AND completed_at IS NOT NULL',
+                (bucket_name,),
+            ).fetchall()
+        return not any(
+            prefix.startswith(p)
+            and (self.ttl is None or time.time() - completed_at < self.ttl)
+            for p, completed_at in rows
+        )
+
+    def refresh(self, bucket_name, prefix=''):
+        """Re-list a prefix and update the index.
+
+        Returns:
+            int: Number of blobs listed.
+        """
+        refresh_id, last_name = self._start_refresh(bucket_name, prefix)
+        if last_name:
+            print("RUNNING: Resuming index refresh of gs://{}/{} from {}.".format(
+                bucket_name, prefix, last_name))
+        blobs = self.storage.iter_blobs(
+            bucket_name,
+            prefix=prefix or None,
+            start_offset=last_name,
+            fields=INDEX_FIELDS,
+        )
+        count = 0
+        page = []
+        for blob in blobs:
+            if blob.name == last_name:
+                continue
+            page.append(_get_blob_row(bucket_name, blob, refresh_id))
+            if len(page) >= LIST_PAGE_SIZE:
+                count += self._write_page(bucket_name, prefix, page)
+                page = []
+        count += self._write_page(bucket_name, prefix, page)
+        self._complete_refresh(bucket_name, prefix, refresh_id)
+        print("SUCCESS: Indexed {} blobs in gs://{}/{}.".format(
+            count, bucket_name, prefix))
+        return count
+
+    def add(self, bucket_name, blobs):
+        """Add or update blobs written since the last refresh, e.g. by
+        storageObject.sync."""
+        # Rows without a refresh_id are replaced (or pruned) by the next refresh
+        rows = [_get_blob_row(bucket_name, blob, '') for blob in blobs]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows)
+
+    def remove(self, bucket_name, names):
+        """Remove blobs deleted since the last refresh."""
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                'DELETE FROM blobs WHERE bucket = ? AND name = ?',
+                [(bucket_name, name) for name in names])
+
+    def clear(self, bucket_name=None):
+        with self._connect() as conn:
+            if bucket_name:
+                conn.execute('DELETE FROM blobs WHERE bucket = ?', (bucket_name,))
+                conn.execute('DELETE FROM refreshes WHERE bucket = ?', (bucket_name,))
+            else:
+                conn.execute('DELETE FROM blobs')
+                conn.execute('DELETE FROM refreshes')
+
+    """ HELPER FUNCTIONS
+        Functions referenced in the code above.
+    """
+    @contextlib.contextmanager
+    def _connect(self):
+        # Commit on success and always close, so other processes can write
+        conn = sqlite3.connect(self.filepath, timeout=60)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _start_refresh(self, bucket_name, prefix):
+        """Return the ID and checkpoint of an unfinished refresh, or start
+        a new one."""
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                'SELECT refresh_id, last_name, completed_at FROM refreshes '
+                'WHERE bucket = ? AND prefix = ?',
+                (bucket_name, prefix),
+            ).fetchone()
+            if row and row[2] is None:
+                return row[0], row[1]
+            refresh_id = uuid.uuid4().hex
+            conn.execute(
+                'INSERT OR REPLACE INTO refreshes VALUES (?, ?, ?, NULL, NULL)',
+                (bucket_name, prefix, refresh_id),
+            )
+            return refresh_id, None
+
+    def _write_page(self, bucket_name, prefix, page):
+        if not page:
+            return 0
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                page)
+            conn.execute(
+                'UPDATE refreshes SET last_name = ? WHERE bucket = ? AND prefix = ?',
+                (page[-1][1], bucket_name, prefix),
+            )
+        return len(page)
+
+    def _complete_refresh(self, bucket_name, prefix, refresh_id):
+        # Blobs not seen by this refresh were deleted from the bucket
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                'DELETE FROM blobs WHERE bucket = ? AND substr(name, 1, ?) = ? '
+                'AND refresh_id != ?',
+                (bucket_name, len(prefix), prefix, refresh_id),
+            )
+            conn.execute(
+                'UPDATE refreshes SET completed_at = ? WHERE bucket = ? AND prefix = ?',
+                (time.time(), bucket_name, prefix),
+            )
+
+
+""" HELPER FUNCTIONS
+    Functions referenced in the code above.
+"""
+def _get_blob_row(bucket_name, blob, refresh_id):
+    return (
+        bucket_name,
+        blob.name,
+        blob.size,
+        blob.updated.isoformat() if blob.updated else None,
+        blob.generation,
+        blob.md5_hash,
+        blob.crc32c,
+        json.dumps(blob.metadata) if blob.metadata else None,
+        refresh_id,
+    )
+
+
+def _get_blob_dict(row):
+    blob = dict(zip(INDEX_FIELDS, row))
+    blob['metadata'] = json.loads(blob['metadata']) if blob['metadata'] else None
+    return blob
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+""" algoMosaic BigQuery reader that runs queries and downloads results.
+
+Small results are downloaded through the BigQuery REST API. Large results
+are downloaded through the BigQuery Storage Read API as Arrow record
+batches, reading several streams of the result table in parallel.
+
+The Storage Read API is used when the result is larger than either:
+    - BQ_STORAGE_ROW_THRESHOLD rows
+    - BQ_STORAGE_BYTE_THRESHOLD bytes
+The size of the result table is only fetched for results of at least
+BQ_STORAGE_BYTE_CHECK_ROWS rows, so small results cost no extra call.
+
+Results of queries with an ORDER BY are read from a single stream, since
+rows split across parallel streams lose their order.
+
+The google-cloud-bigquery-storage package is optional; when it is not
+installed all results are downloaded through the REST API.
+
+"""
+
+import re
+import pyarrow as pa
+from concurrent.futures import ThreadPoolExecutor
+from google.cloud import bigquery
+
+import configs
+
+try:
+    from google.cloud import bigquery_storage
+except ImportError:
+    bigquery_storage = None
+
+
+BQ_STORAGE_ROW_THRESHOLD = getattr(configs, 'BQ_STORAGE_ROW_THRESHOLD', 1000000)
+BQ_STORAGE_BYTE_THRESHOLD = getattr(
+    configs, 'BQ_STORAGE_BYTE_THRESHOLD', 256 * 1024 ** 2)
+BQ_STORAGE_BYTE_CHECK_ROWS = getattr(configs, 'BQ_STORAGE_BYTE_CHECK_ROWS', 10000)
+BQ_STORAGE_MAX_STREAMS = getattr(configs, 'BQ_STORAGE_MAX_STREAMS', 8)
+# Same check the bigquery library uses to keep ordered results in one stream
+ORDER_BY_PATTERN = re.compile(r'ORDER\s+BY', re.IGNORECASE)
+
+
+def submit_query(bq_client, query, use_cache=True, job_config=None):
+    """Submit a query job to BigQuery without waiting for it to finish.
+
+    Args:
+        bq_client (bigquery.Client): BigQuery client.
+        query (str): Rendered SQL query.
+        use_cache (bool): Whether BigQuery may serve cached results.
+        job_config (bigquery.QueryJobConfig): Optional job configuration.
+
+    Returns:
+        bigquery.QueryJob
+    """
+    job_config = job_config or bigquery.QueryJobConfig()
+    job_config.use_query_cache = use_cache
+    return bq_client.query(query, job_config=job_config)
+
+
+def read_query(
+    bq_client,
+    query,
+    use_cache=True,
+    job_config=None,
+    read_client=None,
+    credentials=None,
+    row_threshold=BQ_STORAGE_ROW_THRESHOLD,
+    byte_threshold=BQ_STORAGE_BYTE_THRESHOLD,
+    max_streams=BQ_STORAGE_MAX_STREAMS,
+):
+    """Run a query and return its result as a DataFrame."""
+    job = submit_query(bq_client, query, use_cache, job_config)
+    return read_query_job(
+        job,
+        bq_client,
+        read_client=read_client,
+        credentials=credentials,
+        row_threshold=row_threshold,
+        byte_threshold=byte_threshold,
+        max_streams=max_streams,
+    )
+
+
+def read_query_job(
+    job,
+    bq_client,
+    read_client=None,
+    credentials=None,
+    row_threshold=BQ_STORAGE_ROW_THRESHOLD,
+    byte_threshold=BQ_STORAGE_BYTE_THRESHOLD,
+    max_streams=BQ_STORAGE_MAX_STREAMS,
+):
+    """Wait for a query job and download its result as a DataFrame.
+
+    Args:
+        job (bigquery.QueryJob): Submitted query job.
+        bq_client (bigquery.Client): BigQuery client.
+        read_client (BigQueryReadClient): Storage Read API client.
+        credentials (google.auth.credentials.Credentials): Used to get a
+            shared Storage Read API client when read_client is not
+            specified. Without either, results are read via REST.
+        row_threshold (int): Minimum number of result rows for which the
+            Storage Read API is used.
+        byte_threshold (int): Minimum size of the result table, in bytes,
+            for which the Storage Read API is used. None disables the check.
+        max_streams (int): Maximum number of parallel read streams.
+
+    Returns:
+        pd.DataFrame
+    """
+    rows = job.result()
+    if job.destination is not None and _use_storage_api(
+        rows, job, bq_client, read_client, credentials,
+        row_threshold, byte_threshold
+    ):
+        read_client = read_client or _get_read_client(credentials)
+        print("RUNNING: Downloading {} rows via BigQuery Storage API.".format(
+            rows.total_rows))
+        if ORDER_BY_PATTERN.search(getattr(job, 'query', None) or ''):
+            max_streams = 1
+        table = read_table(read_client, job.destination, max_streams)
+        return table.to_pandas()
+    return rows.to_dataframe(create_bqstorage_client=False)
+
+
+def read_table(read_client, table_ref, max_streams=BQ_STORAGE_MAX_STREAMS):
+    """Read a BigQuery table as an Arrow table using parallel read streams.
+
+    Args:
+        read_client (BigQueryReadClient): Storage Read API client.
+        table_ref (bigquery.TableReference): Table to read.
+        max_streams (int): Maximum number of parallel read streams.
+
+    Returns:
+        pa.Table
+    """
+    session = read_client.create_read_session(
+        parent='projects/{}'.format(table_ref.project),
+        read_session={
+            'table': 'projects/{}/datasets/{}/tables/{}'.format(
+                table_ref.project, table_ref.dataset_id, table_ref.table_id),
+            'data_format': 'ARROW',
+        },
+        max_stream_count=max_streams,
+    )
+    return read_session(read_client, session, max_streams)
+
+
+def read_session(read_client, session, max_workers=BQ_STORAGE_MAX_STREAMS):
+    """Read all streams of a read session in parallel into one Arrow table.
+
+    Streams are concatenated in session order without copying batches.
+    """
+    stream_names = [stream.name for stream in session.streams]
+    if not stream_names:
+        return pa.ipc.read_schema(
+            pa.py_buffer(session.arrow_schema.serialized_schema)
+        ).empty_table()
+
+    def _read_stream(stream_name):
+        return read_client.read_rows(stream_name).to_arrow(session)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(stream_names))) as pool:
+        tables = list(pool.map(_read_stream, stream_names))
+    return pa.concat_tables(tables)
+
+
+def iter_query(bq_client, query, batch_size, use_cache=True, job_config=None):
+    """Run a query and iterate over its result in DataFrame chunks.
+
+    Results are paged through the REST API with at most batch_size rows per
+    page, so only one chunk is held in memory at a time.
+
+    Yields:
+        pd.DataFrame
+    """
+    job = submit_query(bq_client, query, use_cache, job_config)
+    return iter_query_job(job, batch_size)
+
+
+def iter_query_job(job, batch_size):
+    """Wait for a query job and iterate over its result in DataFrame
+    chunks of at most batch_size rows.
+
+    Yields:
+        pd.DataFrame
+    """
+    rows = job.result(page_size=batch_size)
+    for df in rows.to_dataframe_iterable():
+        yield df
+
+
+def get_query_schema(bq_client, query, job_config=None):
+    """Get the result schema of a query with a dry run, without reading rows.
+
+    Returns:
+        list: bigquery.SchemaField for each result column.
+    """
+    job_config = job_config or bigquery.QueryJobConfig()
+    job_config.dry_run = True
+    job_config.use_query_cache = False
+    job = bq_client.query(query, job_config=job_config)
+    return job.schema or []
+
+
+""" HELPER FUNCTIONS
+    Functions referenced in the code above.
+"""
+def _use_storage_api(
+    rows,
+    job,
+    bq_client,
+    read_client,
+    credentials,
+    row_threshold,
+    byte_threshold,
+):
+    if read_client is None and (bigquery_storage is None or credentials is None):
+        return False
+    total_rows = rows.total_rows or 0
+    if total_rows >= row_threshold:
+        return True
+    if byte_threshold is not None and total_rows >= BQ_STORAGE_BYTE_CHECK_ROWS:
+        table = bq_client.get_table(job.destination)
+        return (table.num_bytes or 0) >= byte_threshold
+    return False
+
+
+def _get_read_client(credentials):
+    from algom.utils.client import CLIENT_POOL
+    return CLIENT_POOL.get_bq_read_client(credentials)
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+""" algoMosaic BigQuery writer that loads DataFrames via load jobs.
+
+DataFrames are written to a local Parquet file in bounded chunks and
+loaded into BigQuery with a single load job, either directly from the
+local file or from a staged copy on Google Cloud Storage. The destination
+schema is passed explicitly instead of being guessed by BigQuery.
+
+Incremental writes (see merge_batches) load the data into a staging table
+and apply it to the destination with a single MERGE statement:
+    - merge: upsert rows on key columns
+    - replace_partitions: overwrite only the partitions present in the data
+
+"""
+
+import os
+import uuid
+import tempfile
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.cloud import bigquery
+from google.api_core.exceptions import NotFound
+
+from algom.utils.schema import infer_arrow_schema, to_arrow_type, to_bq_schema
+
+
+DEFAULT_CHUNK_SIZE = 100000
+STAGING_PREFIX = 'algom/staging'
+WRITE_DISPOSITIONS = {
+    'replace': bigquery.WriteDisposition.WRITE_TRUNCATE,
+    'append': bigquery.WriteDisposition.WRITE_APPEND,
+    'fail': bigquery.WriteDisposition.WRITE_EMPTY,
+}
+MERGE_MODES = ('merge', 'replace_partitions')
+# BigQuery types that chunks are cast to when given in a schema
+CAST_TYPES = ('STRING', 'INT64', 'INTEGER', 'FLOAT64', 'FLOAT', 'BOOL', 'BOOLEAN')
+PARTITION_EXPRESSIONS = {
+    'DATE': '{}',
+    'DATETIME': 'DATETIME_TRUNC({}, DAY)',
+    'TIMESTAMP': 'TIMESTAMP_TRUNC({}, DAY)',
+}
+
+
+def write_parquet(batches, path, schema=None):
+    """Write an iterable of DataFrames to a single Parquet file.
+
+    Each DataFrame is staged as its own Parquet part, so only one chunk
+    is held in memory at a time. The parts are then combined under one
+    Arrow schema unified across all chunks, so a column can change type
+    between chunks:
+        - integer chunks with nulls in later chunks are widened to float64
+        - columns that are entirely null in some chunks take the type of
+          the others, or their type in schema (STRING by default)
+    STRING, INT64, FLOAT64 and BOOL columns in schema are cast to that
+    type. Timestamps are stored in microseconds, the precision supported
+    by BigQuery.
+
+    Args:
+        batches (iterable): DataFrames to write.
+        path (str): Local Parquet file.
+        schema (list): BigQuery schema as a list of dicts.
+
+    Returns:
+        int: Number of rows written.
+    """
+    rows = 0
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(path) or None) as directory:
+        parts = []
+        for i, df in enumerate(batches):
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            parts.append((os.path.join(directory, '{}.parquet'.format(i)), table.schema))
+            pq.write_table(table, parts[-1][0])
+            rows += table.num_rows
+        if not parts:
+            return rows
+        arrow_schema = _unify_schemas([s for _, s in parts], schema)
+        with pq.ParquetWriter(
+            path,
+            arrow_schema,
+            coerce_timestamps='us',
+            allow_truncated_timestamps=True,
+        ) as writer:
+            for part_path, _ in parts:
+                writer.write_table(_align_table(pq.read_table(part_path), arrow_schema))
+                os.remove(part_path)
+    return rows
+
+
+def iter_chunks(df, chunk_size=DEFAULT_CHUNK_SIZE):
+    for i in range(0, len(df), chunk_size):
+        yield df[i:i + chunk_size]
+
+
+def load_parquet(
+    bq_client,
+    path,
+    table_id,
+    schema,
+    if_exists='fail',
+    partitioned=False,
+    partition_field=None,
+    staging_bucket=None,
+):
+    """Load a local Parquet file into BigQuery with a single load job.
+
+    Args:
+        bq_client (bigquery.Client): BigQuery client.
+        path (str): Local Parquet file.
+        table_id (str): Destination table ID (project.dataset.table). Use a
+            partition decorator (table$YYYYMMDD) to write one partition.
+        schema (list): Destination schema as a list of dicts.
+        if_exists (str): 'replace', 'append' or 'fail'.
+        partitioned (bool): Create the destination as a day-partitioned table.
+        partition_field (str): Column used to partition the table. Defaults
+            to ingestion time.
+        staging_bucket (str): GCS bucket used to stage the file. The file is
+            uploaded directly to BigQuery when not specified.
+
+    Returns:
+        bigquery.LoadJob
+    """
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
+        schema=to_bq_schema(schema),
+        write_disposition=WRITE_DISPOSITIONS[if_exists],
+    )
+    # Load Parquet lists as REPEATED fields rather than nested records
+    job_config.parquet_options = bigquery.format_options.ParquetOptions()
+    job_config.parquet_options.enable_list_inference = True
+    if partitioned or partition_field:
+        job_config.time_partitioning = bigquery.TimePartitioning(
+            type_=bigquery.TimePartitioningType.DAY,
+            field=partition_field,
+        )
+
+    if staging_bucket:
+        from algom.utils.storage_object import storageObject
+        storage = storageObject()
+        # Concurrent loads of the same table must not share a staging blob
+        storage_path = '{}/{}_{}'.format(
+            STAGING_PREFIX, uuid.uuid4().hex, os.path.basename(path))
+        storage.upload_file(staging_bucket, storage_path, path)
+        try:
+            job = bq_client.load_table_from_uri(
+                'gs://{}/{}'.format(staging_bucket, storage_path),
+                table_id,
+                job_config=job_config,
+            )
+            job.result()
+        finally:
+            storage.delete_file(staging_bucket, storage_path)
+    else:
+        with open(path, 'rb') as f:
+            job = bq_client.load_table_from_file(
+                f, table_id, job_config=job_config)
+        job.result()
+    return job
+
+
+def load_batches(bq_client, batches, table_id, schema=None, **kwargs):
+    """Stage an iterable of DataFrames as Parquet and load it to BigQuery.
+
+    The schema is inferred from the staged Parquet file, i.e. from the
+    types of all DataFrames, when not specified. See load_parquet for
+    keyword arguments.
+
+    Returns:
+        bigquery.LoadJob
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, '{}.parquet'.format(
+            table_id.replace('$', '_')))
+        rows = write_parquet(batches, path, schema)
+        if not os.path.exists(path):
+            raise ValueError('No data to load to {}.'.format(table_id))
+        schema = schema or infer_arrow_schema(pq.read_schema(path))
+        print("RUNNING: Loading {} rows to {}.".format(rows, table_id))
+        return load_parquet(bq_client, path, table_id, schema, **kwargs)
+
+
+def merge_batches(
+    bq_client,
+    batches,
+    table_id,
+    schema=None,
+    if_exists='merge',
+    key_columns=None,
+    partition_field=None,
+    **kwargs
+):
+    """Load an iterable of DataFrames into a staging table and MERGE it
+    into the destination table. The destination is created from the
+    staging table when it does not exist.
+
+    Args:
+        bq_client (bigquery.Client): BigQuery client.
+        batches (iterable): DataFrames to write.
+        table_id (str): Destination table ID (project.dataset.table).
+        schema (list): Destination schema as a list of dicts.
+        if_exists (str): 'merge' updates rows matching on key_columns and
+            inserts the rest. 'replace_partitions' overwrites the
+            partition_field days present in the data.
+        key_columns (list): Columns identifying a row, for 'merge'.
+        partition_field (str): Day-partitioning column. With 'merge', the
+            destination scan is limited to the partitions in the data.
+
+    Returns:
+        bigquery.QueryJob or bigquery.CopyJob
+    """
+    if if_exists == 'merge' and not key_columns:
+        raise ValueError("if_exists='merge' requires key_columns.")
+    if if_exists == 'replace_partitions' and not partition_field:
+        raise ValueError("if_exists='replace_partitions' requires partition_field.")
+
+    staging_table_id = '{}__staging_{}'.format(table_id, uuid.uuid4().hex[:8])
+    load_batches(
+        bq_client,
+        batches,
+        staging_table_id,
+        schema=schema,
+        if_exists='replace',
+        partition_field=partition_field,
+        **kwargs
+    )
+    try:
+        try:
+            bq_client.get_table(table_id)
+        except NotFound:
+            job = bq_client.copy_table(staging_table_id, table_id)
+            job.result()
+            print("SUCCESS: Created {} from staged rows.".format(table_id))
+            return job
+        staging_table = bq_client.get_table(staging_table_id)
+        query = get_merge_query(
+            staging_table_id,
+            table_id,
+            staging_table.schema,
+            key_columns=key_columns if if_exists == 'merge' else None,
+            partition_field=partition_field,
+        )
+        job = bq_client.query(query)
+        job.result()
+        print("SUCCESS: Merged {} rows into {}.".format(
+            staging_table.num_rows, table_id))
+        return job
+    finally:
+        bq_client.delete_table(staging_table_id, not_found_ok=True)
+
+
+def get_merge_query(
+    source_table_id,
+    table_id,
+    schema,
+    key_columns=None,
+    partition_field=None,
+):
+    """Return a MERGE statement applying a source table to a destination.
+
+    Rows are upserted on key_columns. Without key_columns, the partitions
+    of partition_field present in the source are replaced.
+
+    Args:
+        source_table_id (str): Staging table ID.
+        table_id (str): Destination table ID.
+        schema (list): Source schema as bigquery.SchemaField objects.
+        key_columns (list): Columns identifying a row.
+        partition_field (str): Day-partitioning column.
+
+    Returns:
+        str
+    """
+    columns = [field.name for field in schema]
+    statements = []
+    conditions = [
+        'T.`{0}` = S.`{0}`'.format(column) for column in key_columns or []
+    ] or ['FALSE']
+    if partition_field:
+        field_type = {f.name: f.field_type for f in schema}[partition_field]
+        expression = PARTITION_EXPRESSIONS.get(field_type, '{}')
+        statements.append(
+            'DECLARE partitions DEFAULT (\n'
+            '  SELECT ARRAY_AGG(DISTINCT {} IGNORE NULLS) FROM `{}`\n'
+            ');'.format(
+                expression.format('`{}`'.format(partition_field)),
+                source_table_id))
+        partition_filter = '{} IN UNNEST(partitions)'.format(
+            expression.format('T.`{}`'.format(partition_field)))
+        if key_columns:
+            conditions.append(partition_filter)
+
+    clauses = [
+        'MERGE `{}` T'.format(table_id),
+        'USING `{}` S'.format(source_table_id),
+        'ON {}'.format(' AND '.join(conditions)),
+    ]
+    update_columns = [c for c in columns if c not in (key_columns or [])]
+    if key_columns and update_columns:
+        clauses.append('WHEN MATCHED THEN UPDATE SET {}'.format(', '.join(
+            '`{0}` = S.`{0}`'.format(column) for column in update_columns)))
+    if partition_field and not key_columns:
+        clauses.append(
+            'WHEN NOT MATCHED BY SOURCE AND {} THEN DELETE'.format(
+                partition_filter))
+    clauses.append('WHEN NOT MATCHED THEN INSERT ({}) VALUES ({});'.format(
+        ', '.join('`{}`'.format(column) for column in columns),
+        ', '.join('S.`{}`'.format(column) for column in columns),
+    ))
+    statements.append('\n'.join(clauses))
+    return '\n'.join(statements)
+
+
+""" HELPER FUNCTIONS
+    Functions referenced in the code above.
+"""
+def _unify_schemas(arrow_schemas, schema=None):
+    """Return one Arrow schema for chunks whose column types differ."""
+    bq_fields = {field['name']: field for field in schema or []}
+    types = {}
+    for arrow_schema in arrow_schemas:
+        for field in arrow_schema:
+            types.setdefault(field.name, []).append(field.type)
+    return pa.schema([
+        pa.field(name, _unify_types(name, column_types, bq_fields.get(name)))
+        for name, column_types in types.items()
+    ])
+
+
+def _unify_types(name, arrow_types, bq_field=None):
+    if bq_field and bq_field.get('type') in CAST_TYPES \
+            and bq_field.get('mode') != 'REPEATED':
+        return to_arrow_type(bq_field)
+    arrow_types = list(dict.fromkeys(
+        t for t in arrow_types if not pa.types.is_null(t)))
+    if len(arrow_types) > 1:
+        arrow_types = list(dict.fromkeys(
+            t.value_type if pa.types.is_dictionary(t) else t for t in arrow_types))
+    if not arrow_types:
+        return to_arrow_type(bq_field or {'type': 'STRING'})
+    elif len(arrow_types) == 1:
+        return arrow_types[0]
+    elif all(pa.types.is_integer(t) for t in arrow_types):
+        return pa.int64()
+    elif all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in arrow_types):
+        return pa.float64()
+    raise ValueError('Column {} has incompatible types across chunks: {}.'.format(
+        name, ', '.join(str(t) for t in arrow_types)))
+
+
+def _align_table(table, arrow_schema):
+    """Cast a chunk to the unified schema, adding missing columns as nulls."""
+    return pa.table([
+        table.column(field.name).cast(field.type)
+        if field.name in table.column_names
+        else pa.nulls(table.num_rows, field.type)
+        for field in arrow_schema
+    ], schema=arrow_schema)
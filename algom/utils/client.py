@@ -1,17 +1,170 @@
 #!/usr/bin/env python
 import re
 import os
+import threading
+from google.auth.transport.requests import Request
 from google.cloud import bigquery, storage
 from google.oauth2 import service_account
 import configs
 
+try:
+    from google.cloud import bigquery_storage
+except ImportError:
+    bigquery_storage = None
+
 PROJECT_ID = configs.GOOGLE_PROJECT_ID
 GOOGLE_APPLICATION_CREDENTIALS = configs.GOOGLE_APPLICATION_CREDENTIALS
+BIGQUERY_SCOPES = ("https://www.googleapis.com/auth/cloud-platform",)
+KFP_CLIENT_HOST = getattr(configs, 'KFP_CLIENT_HOST', None)
+
+
+class clientPool():
+    """Process-wide registry of GCP credentials and clients.
+
+    Service Account credentials are read from disk once per
+    (credentials file, scopes) and clients are created once per
+    (client type, project, scopes). All lookups are guarded by a lock,
+    so the pool can be shared between threads.
+
+    Credentials are refreshed lazily: a token is only refreshed when it
+    has already been issued and has since expired. Until then, the
+    google-cloud clients request tokens on their first API call.
+
+    Examples:
+        bq_client = CLIENT_POOL.get_bq_client()
+        storage_client = CLIENT_POOL.get_storage_client()
+        kfp_client = CLIENT_POOL.get_kfp_client()
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._credentials = {}
+        self._clients = {}
+
+    def get_credentials(self, credentials_filepath, scopes=None):
+        """Return cached Service Account credentials for a key file.
+
+        Args:
+            credentials_filepath (str): File location of the GCP
+                credentials file.
+            scopes (tuple): OAuth scopes attached to the credentials.
+                Defaults to the Service Account's default scopes.
+
+        Returns:
+            google.oauth2.service_account.Credentials
+        """
+        key = (credentials_filepath, tuple(scopes) if scopes else None)
+        with self._lock:
+            credentials = self._credentials.get(key)
+            if credentials is None:
+                credentials = \
+                    service_account.Credentials.from_service_account_file(
+                        credentials_filepath,
+                        scopes=list(scopes) if scopes else None)
+                self._credentials[key] = credentials
+            self._refresh_if_expired(credentials)
+            return credentials
+
+    def get_bq_client(
+        self,
+        credentials_filepath,
+        project_id=PROJECT_ID,
+        scopes=BIGQUERY_SCOPES
+    ):
+        """Return the shared BigQuery client for a project and scopes."""
+        return self._get_client(
+            'bigquery', bigquery.Client,
+            credentials_filepath, project_id, scopes)
+
+    def get_storage_client(
+        self,
+        credentials_filepath,
+        project_id=PROJECT_ID,
+        scopes=None
+    ):
+        """Return the shared GCS client for a project and scopes."""
+        return self._get_client(
+            'storage', storage.Client,
+            credentials_filepath, project_id, scopes)
+
+    def get_bq_read_client(self, credentials):
+        """Return the shared BigQuery Storage Read API client for a set of
+        credentials. Requires google-cloud-bigquery-storage.
+        """
+        if bigquery_storage is None:
+            raise ImportError(
+                'google-cloud-bigquery-storage is required to use the '
+                'BigQuery Storage Read API.')
+        key = ('bigquery_storage', id(credentials))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = bigquery_storage.BigQueryReadClient(
+                    credentials=credentials)
+                self._clients[key] = client
+            return client
+
+    def get_kfp_client(self, host=KFP_CLIENT_HOST):
+        """Return the shared Kubeflow Pipelines client for a host.
+        Requires kfp.
+        """
+        key = ('kfp', host)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                # kfp is only needed by the Kubeflow modules, so it is
+                # imported on first use rather than with this module
+                import kfp
+                client = kfp.Client(host=host)
+                self._clients[key] = client
+            return client
+
+    def clear(self):
+        """Drop all cached credentials and clients."""
+        with self._lock:
+            self._credentials = {}
+            self._clients = {}
+
+    def _get_client(
+        self,
+        client_type,
+        client_class,
+        credentials_filepath,
+        project_id,
+        scopes
+    ):
+        key = (
+            client_type,
+            credentials_filepath,
+            project_id,
+            tuple(scopes) if scopes else None
+        )
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = client_class(
+                    project=project_id,
+                    credentials=self.get_credentials(
+                        credentials_filepath, scopes)
+                )
+                self._clients[key] = client
+            else:
+                self.get_credentials(credentials_filepath, scopes)
+            return client
+
+    def _refresh_if_expired(self, credentials):
+        if credentials.token is not None and credentials.expired:
+            credentials.refresh(Request())
+
+
+CLIENT_POOL = clientPool()
 
 
 class googleClient():
     """Set up configurations for google.cloud.bigquery using a GCP Service Account.
 
+    Credentials are loaded through the shared CLIENT_POOL, so the Service
+    Account file is only read once per process.
+
     Args:
         project (int): The first parameter. Defaults to the active GCP Project.
         credentials_file (str): File location of the GCP credentials file.
@@ -34,15 +187,10 @@ class googleClient():
         self.credentials = self._get_credentials()
 
     def _get_credentials(self):
-        if os.path.exists(self.credentials_filepath):
-            self.credentials = \
-                service_account.Credentials.from_service_account_file(
-                    self.credentials_filepath)
-        else:
+        if not os.path.exists(self.credentials_filepath):
             self._update_credentials_file()
-            self.credentials = \
-                service_account.Credentials.from_service_account_file(
-                    self.credentials_filepath)
+        self.credentials = CLIENT_POOL.get_credentials(
+            self.credentials_filepath)
         return self.credentials
 
     def _update_credentials_file(self):
@@ -84,12 +232,10 @@ class storageClient():
         self.storage_client = self._get_storage_client()
 
     def _get_storage_client(self, project_id=PROJECT_ID):
-        credentials = service_account.Credentials.from_service_account_file(
-            self.credentials_filepath
+        self.storage_client = CLIENT_POOL.get_storage_client(
+            self.credentials_filepath,
+            project_id=project_id
         )
-        self.storage_client = storage.Client(
-            project=project_id,
-            credentials=credentials)
         return self.storage_client
 
 
@@ -97,7 +243,8 @@ class bqClient():
     """ Google BigQuery client
 
     Class containing pertinent information for Google BigQuery
-    authentication for a given Service Account.
+    authentication for a given Service Account. The underlying
+    bigquery.Client is shared through CLIENT_POOL.
     """
     def __init__(self):
         gClient = googleClient()
@@ -107,12 +254,8 @@ class bqClient():
         self.bq_client = self._get_bq_client()
 
     def _get_bq_client(self, project_id=PROJECT_ID):
-        credentials = service_account.Credentials.from_service_account_file(
+        self.bq_client = CLIENT_POOL.get_bq_client(
             self.credentials_filepath,
-            scopes=["https://www.googleapis.com/auth/cloud-platform"]
-        )
-        self.bq_client = bigquery.Client(
-            project=project_id,
-            credentials=credentials
+            project_id=project_id
         )
         return self.bq_client
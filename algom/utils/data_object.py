@@ -6,10 +6,17 @@ and converts to dataFrame. Accepts these input data types:
     - CSV file
     - SQL file
     - JSON file
+    - Parquet file
+    - Feather / Arrow IPC file
+
+File inputs and outputs can be local paths or gs:// URIs. GCS files are
+streamed through buffered file objects (see storageObject.open).
 
 And outputs these data types:
     - Pandas DataFrame
     - CSV
+    - Parquet
+    - Feather / Arrow IPC
     - Database (BigQuery load)
 
 TO DO:
@@ -17,12 +24,48 @@ TO DO:
 
 """
 
+import re
+import glob
+import time
+import fnmatch
+import contextlib
 import hashlib
+import functools
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+import pyarrow.json as pa_json
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime
+from google.cloud import bigquery
 
 import configs
+from algom.utils import bq_reader, bq_writer
 from algom.utils.client import bqClient
+from algom.utils.storage_object import storageObject, is_gcs_uri, parse_gcs_uri
+from algom.utils.query_budget import (
+    RUN_BUDGET, BQ_MAXIMUM_BYTES_BILLED, QueryBudgetError, estimate_query,
+    format_estimate)
+from algom.utils.schema import infer_schema
+from algom.utils.query_template import compile_template, parse_params
+from algom.utils.watermark import (
+    add_watermark_filter, get_max_value, get_watermark_store)
+from algom.utils.query_cache import queryCache, QUERY_CACHE_MODE, QUERY_CACHE_MODES
+
+
+DEFAULT_BATCH_SIZE = 100000
+JSON_LINES_EXTENSIONS = ('.jsonl', '.ndjson')
+FEATHER_EXTENSIONS = ('.feather', '.arrow', '.ipc')
+CATEGORY_THRESHOLD = 0.5
+ARROW_CSV_ENGINE = 'arrow'
+FILE_EXTENSIONS = (
+    ('.csv', '.json', '.parquet') + JSON_LINES_EXTENSIONS + FEATHER_EXTENSIONS
+)
+GLOB_CHARACTERS = ('*', '?', '[')
+DEFAULT_MAX_CONCURRENCY = 8
 
 
 def get_hash_id(obj):
@@ -40,39 +83,181 @@ def get_hash_id(obj):
     return gid
 
 
-def _set_query_params(query, params):
-    """ Format a query given a dict of parameters
+def _set_query_params(query, params, native_params=None, partition=None):
+    """ Format a query given a dict of parameters. Parameters listed in
+    native_params are rendered as @name BigQuery query parameters.
+    See algom.utils.query_template.
     """
-    if params:
-        for k, v in params.items():
-            query = query.replace('{' + str(k) + '}', str(v))
-    query = query.replace('YYYYMMDD', datetime.now().strftime('%Y%m%d'))
-    return query
+    return compile_template(query).render(params, native_params, partition)
 
 
 def load_schema(df):
-    """ Create schema template for BigQuery
+    """ Create schema template for BigQuery from the dtypes of the
+    entire DataFrame. See algom.utils.schema.infer_schema.
+    """
+    return infer_schema(df)
+
+
+def read_csv_arrow(csv_file, columns=None, column_types=None, use_threads=True):
+    """Read a CSV file with pyarrow's multi-threaded CSV reader.
+
+    Args:
+        csv_file (str): Path of the CSV file.
+        columns (list): Columns to read. Defaults to all columns.
+        column_types (dict): Arrow types by column name.
+        use_threads (bool): Parse blocks of the file in parallel.
+
+    Returns:
+        pa.Table
+    """
+    return pa_csv.read_csv(
+        csv_file,
+        read_options=pa_csv.ReadOptions(use_threads=use_threads),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=columns,
+            column_types=column_types,
+        ),
+    )
+
+
+def read_file_arrow(path, columns=None, filters=None, column_types=None):
+    """Read a single CSV, JSON, Parquet or Feather file as an Arrow table.
+
+    Args:
+        path (str): Path of the file.
+        columns (list): Columns to read. Defaults to all columns.
+        filters (list): Row filters in pyarrow DNF form.
+        column_types (dict): Arrow types by column name (CSV only).
+
+    Returns:
+        pa.Table
+    """
+    if not path.endswith(FILE_EXTENSIONS):
+        raise ValueError('Unsupported file type: {}.'.format(path))
+    with open_source(path) as source:
+        if path.endswith('.parquet'):
+            return pq.read_table(source, columns=columns, filters=filters)
+        elif path.endswith('.csv'):
+            table = read_csv_arrow(
+                source, columns=columns, column_types=column_types)
+        elif path.endswith(FEATHER_EXTENSIONS):
+            table = feather.read_table(source, columns=columns, memory_map=True)
+        elif path.endswith(JSON_LINES_EXTENSIONS):
+            table = pa_json.read_json(source)
+        else:
+            table = pa.Table.from_pandas(pd.read_json(source), preserve_index=False)
+    if columns:
+        table = table.select(columns)
+    if filters:
+        table = table.filter(pq.filters_to_expression(filters))
+    return table
+
+
+def read_file_columns(path):
+    """Get the column names of a file without reading its rows.
+
+    JSON files that are not line-delimited (.json) hold a single document,
+    so they are parsed in full. Use .jsonl or .ndjson files to read only
+    the first row.
+    """
+    if not path.endswith(
+            ('.csv', '.parquet') + JSON_LINES_EXTENSIONS + FEATHER_EXTENSIONS):
+        return read_file_arrow(path).column_names
+    with open_source(path) as source:
+        if path.endswith('.csv'):
+            return list(pd.read_csv(source, nrows=0))
+        elif path.endswith(JSON_LINES_EXTENSIONS):
+            return list(pd.read_json(source, lines=True, nrows=1))
+        elif path.endswith('.parquet'):
+            return pq.read_schema(source).names
+        return pa.ipc.open_file(source).schema.names
+
+
+def open_source(path, mode='rb'):
+    """Open a gs:// URI as a streaming GCS file object. Local paths are
+    returned unchanged, so readers can memory-map them.
+
+    Examples:
+        with open_source('gs://my_bucket/data.parquet') as source:
+            table = pq.read_table(source)
+    """
+    if not is_gcs_uri(path):
+        return contextlib.nullcontext(path)
+    return storageObject().open(*parse_gcs_uri(path), mode=mode)
+
+
+def glob_paths(pattern):
+    """Return the sorted local paths or gs:// URIs matching a pattern.
+
+    gs:// patterns follow gsutil wildcards: * and ? match within one
+    directory level and ** matches across levels.
     """
-    def _get_type(v):
-        if isinstance(v, str):
-            return 'STRING'
-        elif isinstance(v, int):
-            return 'INT64'
-        elif isinstance(v, float):
-            return 'FLOAT64'
-        elif isinstance(v, pd._libs.tslibs.timestamps.Timestamp):
-            return 'DATETIME'
+    if not is_gcs_uri(pattern):
+        return sorted(glob.glob(pattern))
+    bucket_name, name_pattern = parse_gcs_uri(pattern)
+    prefix = re.split(r'[*?\[]', name_pattern)[0]
+    names = storageObject().get_blob_list(bucket_name, prefix=prefix)
+    name_regex = _translate_gcs_pattern(name_pattern)
+    return sorted(
+        'gs://{}/{}'.format(bucket_name, name)
+        for name in names if name_regex.fullmatch(name)
+    )
+
+
+def _translate_gcs_pattern(pattern):
+    # fnmatch lets * match across '/', which GCS wildcards do not
+    parts = re.split(r'(\*\*|\*|\?|\[[^\]]*\])', pattern)
+    regex = ''
+    for part in parts:
+        if part == '**':
+            regex += '.*'
+        elif part == '*':
+            regex += '[^/]*'
+        elif part == '?':
+            regex += '[^/]'
+        elif part.startswith('[') and part.endswith(']') and len(part) > 2:
+            regex += fnmatch.translate(part)[4:-3]
         else:
-            return type(v)
+            regex += re.escape(part)
+    return re.compile(regex, re.DOTALL)
+
 
-    x = []
-    for i, r in df[0:1].T.iterrows():
-        x.append({
-            'name': i,
-            'type': _get_type(r[0]),
-            'description': '',
-        })
-    return x
+def downcast_df(df, category_threshold=CATEGORY_THRESHOLD):
+    """Convert columns of a DataFrame to their narrowest dtypes.
+
+    Integers and floats are downcast to the smallest type that holds their
+    values without loss. String columns whose share of unique values is at
+    most category_threshold are converted to category.
+
+    Args:
+        df (pd.DataFrame): DataFrame to downcast.
+        category_threshold (float): Maximum ratio of unique values to rows
+            for a string column to be converted to category.
+
+    Returns:
+        pd.DataFrame: Downcast DataFrame.
+    """
+    start_bytes = df.memory_usage(deep=True).sum()
+    df = df.copy()
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_bool_dtype(s):
+            continue
+        elif pd.api.types.is_integer_dtype(s):
+            downcast = 'unsigned' if len(s) and s.min() >= 0 else 'integer'
+            df[col] = pd.to_numeric(s, downcast=downcast)
+        elif pd.api.types.is_float_dtype(s):
+            df[col] = pd.to_numeric(s, downcast='float')
+        elif pd.api.types.infer_dtype(s, skipna=True) == 'string':
+            if len(s) and s.nunique() / len(s) <= category_threshold:
+                df[col] = s.astype('category')
+    end_bytes = df.memory_usage(deep=True).sum()
+    print("SUCCESS: Reduced memory from {:.1f} MB to {:.1f} MB ({:.0%} saved).".format(
+        start_bytes / 1024 ** 2,
+        end_bytes / 1024 ** 2,
+        1 - end_bytes / start_bytes if start_bytes else 0,
+    ))
+    return df
 
 
 class dataObject:
@@ -84,27 +269,200 @@ class dataObject:
         - CSV file
         - SQL file
         - JSON file
+        - Parquet file
+        - Feather / Arrow IPC file
 
     Output data types:
         - Pandas DataFrame
         - CSV
+        - Parquet
+        - Feather / Arrow IPC
         - Database
 
     Attributes
 
+    Args:
+        data (any): Input data. See load_data for accepted formats.
+        params (dict): Parameters used to format SQL inputs. Strings are
+            parsed as dict literals or JSON.
+        native_params (list): Names of params bound as native BigQuery
+            query parameters (@name) instead of formatted into the query
+            text. True binds all params.
+        table_schema (list): BigQuery schema used by to_db.
+        if_exists (str): Behavior when the to_db destination exists.
+        cache (str): Local query result cache mode for SQL inputs. One of
+            'read' (read-through), 'refresh' or 'bypass'. Defaults to
+            configs.QUERY_CACHE_MODE.
+        stream (bool): Do not load the input into memory. Data are read
+            in chunks with iter_batches, to_csv(stream=True) or
+            to_db(stream=True).
+        lazy (bool): Defer loading the input until df is first accessed.
+            feature_list and data_id are derived from the input's metadata
+            (CSV header, Parquet schema, BigQuery dry-run schema) without
+            reading rows.
+        columns (list): Columns to read from CSV, JSON, Parquet and
+            Feather inputs.
+        filters (list): Row filters for Parquet and Feather inputs, in
+            pyarrow DNF form, e.g. [('date', '>=', '2021-01-01')]. Parquet
+            row groups that cannot match are skipped.
+        dtypes (dict): Column dtypes for CSV and JSON inputs.
+        parse_dates (list): Columns to parse as dates in CSV and JSON inputs.
+        categories (list): Columns to convert to category in CSV and JSON
+            inputs.
+        downcast (bool): Downcast CSV and JSON columns to their narrowest
+            dtypes (see downcast_df). Not applied to streamed batches.
+        engine (str): CSV parser. 'arrow' uses pyarrow's multi-threaded
+            reader and only converts to pandas when df is accessed. Other
+            values (e.g. 'c', 'python') are passed to pd.read_csv.
+        max_workers (int): Number of workers used to read multi-file inputs.
+        use_processes (bool): Read multi-file inputs in a process pool
+            instead of a thread pool.
+        source_column (str): For multi-file inputs, name of a column added
+            with the file each row was read from.
+        bq_client (bigquery.Client): BigQuery client used for SQL inputs.
+            Defaults to the shared client from bqClient.
+        maximum_bytes_billed (int): Maximum bytes a SQL input may process.
+            Defaults to configs.BQ_MAXIMUM_BYTES_BILLED.
+        preflight (bool): Estimate SQL inputs with a dry run and print the
+            bytes, cost and referenced tables before running them. Always
+            done when a byte limit or run budget is configured.
+        watermark_column (str): For SQL inputs, column used for
+            incremental loads. Only rows above the stored watermark of the
+            query are read, and the watermark is advanced to the highest
+            value loaded once to_db succeeds (see commit_watermark).
+        watermark_id (str): ID of the watermark in the store. Defaults to
+            a hash of the unrendered SQL and watermark_column.
+        watermark_store (watermarkStore): Store holding watermarks.
+            Defaults to get_watermark_store().
+
     Examples:
         data = dataObject(my_data.csv)
+        data = dataObject('my_query.sql', cache='read')
+        data = dataObject('my_query.sql', lazy=True)
+        data = dataObject('my_data.parquet', columns=['a'], filters=[('a', '>', 0)])
+        data = dataObject('my_data.csv', dtypes={'id': 'int32'}, downcast=True)
+        data = dataObject('my_data.csv', engine='arrow').to_parquet('my_data.parquet')
+        data = dataObject('data/part-*.parquet', source_column='source_file')
+        data = dataObject('my_query.sql', watermark_column='updated_at')
+        data.to_db('dataset.table', if_exists='merge', key_columns=['id'])
+        data = dataObject('my_data.jsonl', stream=True)
+        for batch in data.iter_batches(batch_size=50000):
+            ...
     """
-    def __init__(self, data, params=None, table_schema=None, if_exists='replace'):
+    def __init__(
+        self,
+        data,
+        params=None,
+        table_schema=None,
+        if_exists='replace',
+        cache=None,
+        stream=False,
+        lazy=False,
+        columns=None,
+        filters=None,
+        dtypes=None,
+        parse_dates=None,
+        categories=None,
+        downcast=False,
+        engine=None,
+        max_workers=None,
+        use_processes=False,
+        source_column=None,
+        bq_client=None,
+        maximum_bytes_billed=BQ_MAXIMUM_BYTES_BILLED,
+        preflight=False,
+        native_params=None,
+        watermark_column=None,
+        watermark_id=None,
+        watermark_store=None,
+    ):
         client = bqClient()
         self.credentials = client.credentials
-        self.df = pd.DataFrame()
-        self.params = eval(params) if isinstance(params, str) else params
+        self.project_id = client.project_id
+        self.bq_client = bq_client or client.bq_client
+        # project_id follows the destination table, queries run here
+        self.query_project_id = getattr(self.bq_client, 'project', None) or self.project_id
+        self.query_job = None
+        self._budget_reservation = None
+        self.load_error = None
+        self.maximum_bytes_billed = maximum_bytes_billed
+        self.preflight = preflight
+        self.df = None if lazy and not stream else pd.DataFrame()
+        self.params = parse_params(params)
+        self.native_params = native_params
+        self.query_parameters = []
+        self.watermark_column = watermark_column
+        self.watermark_id = watermark_id
+        self.watermark_store = watermark_store
+        self.watermark = None
+        self._next_watermark = None
         self.table_schema = table_schema
         self.if_exists = if_exists
+        self.columns = columns
+        self.filters = filters
+        self.dtypes = dtypes
+        self.parse_dates = parse_dates
+        self.categories = categories
+        self.downcast = downcast
+        self.engine = engine
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.source_column = source_column
+        self.table = None
+        self._table_shared = False
+        self.cache = self._get_cache_mode(cache)
+        self.stream = stream
+        self.lazy = lazy
+        self.deferred = stream or lazy
+        self.input_type = None
+        self.json_lines = False
+        self.feature_list = None
+        self.data_id = None
         self.data_type = self._get_data_type(data)
+        self.source = data
         self.data = self.load_data(data)
-        self._get_data_metadata()
+        if not self.deferred:
+            self._get_data_metadata()
+
+    @property
+    def df(self):
+        if self._df is None and self.table is None:
+            self._load_deferred()
+        if self._df is None and self.table is not None:
+            # Convert Arrow inputs to pandas on first access. Arrow buffers
+            # are released column by column as they are converted, so the
+            # peak is not a full Arrow copy plus a full pandas copy.
+            table, self.table = self.table, None
+            df = table.to_pandas(
+                split_blocks=True, self_destruct=not self._table_shared)
+            del table
+            self._df = self._convert_dtypes(df)
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
+        self.table = None
+
+    @property
+    def feature_list(self):
+        if self._feature_list is None:
+            self._get_features()
+        return self._feature_list
+
+    @feature_list.setter
+    def feature_list(self, feature_list):
+        self._feature_list = feature_list
+
+    @property
+    def data_id(self):
+        if self._data_id is None and self.feature_list:
+            self._get_data_id()
+        return self._data_id
+
+    @data_id.setter
+    def data_id(self, data_id):
+        self._data_id = data_id
 
     def load_data(self, data):
         """Load input data and convert to dataFrame (all formats):
@@ -118,21 +476,36 @@ class dataObject:
                 - algoMosaic dataObject
                 - CSV reference (str)
                 - JSON reference (str)
+                - JSON lines reference (str, .jsonl or .ndjson)
+                - Parquet reference (str)
+                - Feather / Arrow IPC reference (str, .feather, .arrow, .ipc)
                 - SQL file reference (str)
                 - SQL query
+                - Glob pattern or list of file references (str, list),
+                  e.g. 'data/part-*.csv'
 
         Returns:
             None
         """
         if 'dataObject' in str(type(data)):
             self.load_blob(data)
+        elif self._is_file_list(data):
+            self.load_files(data)
         elif isinstance(data, (list, dict, pd.DataFrame)):
             self.load_df(data)
         elif isinstance(data, str):
-            if data.endswith('.csv'):
+            if any(c in data for c in GLOB_CHARACTERS) and data.endswith(FILE_EXTENSIONS):
+                self.load_files(glob_paths(data))
+            elif data.endswith('.csv'):
                 self.load_csv_file(data)
             elif data.endswith('.json'):
                 self.load_json_file(data)
+            elif data.endswith(JSON_LINES_EXTENSIONS):
+                self.load_json_file(data, lines=True)
+            elif data.endswith('.parquet'):
+                self.load_parquet_file(data)
+            elif data.endswith(FEATHER_EXTENSIONS):
+                self.load_feather_file(data)
             elif data.endswith('.sql'):
                 self.load_sql_file(data)
             elif 'select' in data.lower() and 'from' in data.lower():
@@ -153,9 +526,13 @@ class dataObject:
             self.input_type = 'dataObject'
             self.input_file = None
             self.input_code = None
+            self.input_blob = blob
+            if self.deferred:
+                return
             self.df = blob.df
             print("SUCCESS: Loaded dataObject.")
         except Exception as e:
+            self.load_error = e
             print("ERROR: Unable to import dataObject. {}.".format(e))
 
     def load_df(self, df):
@@ -166,6 +543,7 @@ class dataObject:
             self.df = pd.DataFrame(df)
             print("SUCCESS: Loaded DataFrame.")
         except Exception as e:
+            self.load_error = e
             print("ERROR: Unable to import DataFrame.\n{}".format(e))
 
     def load_csv_file(self, csv_file):
@@ -173,54 +551,417 @@ class dataObject:
             self.input_type = 'csv file'
             self.input_file = csv_file
             self.input_code = None
-            self.df = pd.read_csv(csv_file)
+            if self.deferred:
+                return
+            with open_source(csv_file) as source:
+                if self.engine == ARROW_CSV_ENGINE:
+                    self._df = None
+                    self.table = read_csv_arrow(
+                        source,
+                        columns=self.columns,
+                        column_types=self._get_arrow_column_types(),
+                    )
+                else:
+                    self.df = self._convert_dtypes(
+                        pd.read_csv(source, **self._get_csv_kwargs()))
             print("SUCCESS: Loaded CSV file.")
         except Exception as e:
+            self.load_error = e
             print("ERROR: Unable to import CSV.\n{}".format(e))
 
-    def load_json_file(self, json_file):
+    def load_json_file(self, json_file, lines=False):
         try:
             self.input_type = 'json file'
             self.input_file = json_file
             self.input_code = None
-            self.df = pd.read_json(json_file)
+            self.json_lines = lines
+            if self.deferred:
+                return
+            with open_source(json_file) as source:
+                self.df = self._convert_dtypes(
+                    pd.read_json(source, lines=lines, **self._get_json_kwargs()))
             print("SUCCESS: Loaded JSON file.")
         except Exception as e:
+            self.load_error = e
             print("ERROR: Unable to import JSON file.\n{}".format(e))
 
+    def load_parquet_file(self, parquet_file):
+        try:
+            self.input_type = 'parquet file'
+            self.input_file = parquet_file
+            self.input_code = None
+            if self.deferred:
+                return
+            with open_source(parquet_file) as source:
+                self.df = pq.read_table(
+                    source,
+                    columns=self.columns,
+                    filters=self.filters,
+                ).to_pandas()
+            print("SUCCESS: Loaded Parquet file.")
+        except Exception as e:
+            self.load_error = e
+            print("ERROR: Unable to import Parquet file.\n{}".format(e))
+
+    def load_feather_file(self, feather_file):
+        try:
+            self.input_type = 'feather file'
+            self.input_file = feather_file
+            self.input_code = None
+            if self.deferred:
+                return
+            # Memory-map the file so columns are not copied until needed
+            with open_source(feather_file) as source:
+                table = feather.read_table(
+                    source, columns=self.columns, memory_map=True)
+                self.df = self._filter_table(table).to_pandas()
+            print("SUCCESS: Loaded Feather file.")
+        except Exception as e:
+            self.load_error = e
+            print("ERROR: Unable to import Feather file.\n{}".format(e))
+
+    def load_files(self, paths):
+        """Load several files into a single dataObject.
+
+        Files are read concurrently as Arrow tables and concatenated in the
+        order given, without copying. The combined table is converted to
+        pandas once, when df is first accessed.
+        """
+        try:
+            self.input_type = 'files'
+            self.input_file = list(paths)
+            self.input_code = None
+            if not self.input_file:
+                raise ValueError('No files matched the input.')
+            if self.deferred:
+                return
+            executor = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            with executor(max_workers=self.max_workers) as pool:
+                tables = list(pool.map(self._get_file_reader(), self.input_file))
+            self._df = None
+            self.table = pa.concat_tables([
+                self._add_source_column(table, path)
+                for table, path in zip(tables, self.input_file)
+            ])
+            print("SUCCESS: Loaded {} files.".format(len(self.input_file)))
+        except Exception as e:
+            self.load_error = e
+            print("ERROR: Unable to import files.\n{}".format(e))
+
     def load_sql_file(self, sql_file):
         try:
             with open(sql_file, 'r') as f:
                 sql = f.read()
             self.input_type = 'sql file'
             self.input_file = sql_file
-            self.input_code = _set_query_params(sql, self.params)
+            self._set_input_code(sql)
+            if self.deferred:
+                return
 
             print("RUNNING: Loading SQL file: {}.".format(sql_file))
-            self.df = pd.read_gbq(
-                self.input_code,
-                credentials=self.credentials,
-                )
+            self.df = self._read_query()
             print("SUCCESS: Loaded SQL query.")
+        except QueryBudgetError:
+            # Budget breaches stop the run rather than load empty data
+            raise
         except Exception as e:
+            self.load_error = e
             print("ERROR: Unable to read SQL file.\n{}".format(e))
 
-    def load_sql(self, sql, params=None, use_cache=True):
+    def load_sql(self, sql, params=None, use_cache=True, cache=None):
         try:
             self.input_type = 'sql'
             self.input_file = None
-            self.input_code = _set_query_params(sql, self.params)
+            self._set_input_code(sql)
+            if cache:
+                self.cache = self._get_cache_mode(cache)
+            if self.deferred:
+                return
 
             print("RUNNING: Querying SQL script.")
-            self.df = pd.read_gbq(
-                self.input_code,
-                credentials=self.credentials,
-                configuration={'query': {'useQueryCache': use_cache}},
-                )
+            self.df = self._read_query(use_cache=use_cache)
             print("SUCCESS: Loaded SQL query.")
+        except QueryBudgetError:
+            raise
         except Exception as e:
+            self.load_error = e
             print("ERROR: Unable to run SQL.\n{}".format(e))
 
+    def _read_query(self, use_cache=True):
+        """Run self.input_code on BigQuery, reading through the local
+        query result cache according to self.cache. Large results are
+        downloaded via the BigQuery Storage Read API (see bq_reader).
+        """
+        cache_key = self._get_query_cache_key()
+        if self.cache == 'read':
+            df = queryCache().get(cache_key)
+            if df is not None:
+                print("SUCCESS: Loaded query result from local cache.")
+                return df
+
+        if self.query_job is None:
+            self._submit_query(use_cache=use_cache)
+        # Collect the result, also of a query submitted with submit()
+        try:
+            df = bq_reader.read_query_job(
+                self.query_job, self.bq_client, credentials=self.credentials)
+        finally:
+            self._release_budget(self.query_job)
+            self.query_job = None
+
+        if self.cache in ('read', 'refresh'):
+            queryCache().put(
+                cache_key, df,
+                project_id=self.query_project_id,
+                query=self.input_code,
+            )
+        return df
+
+    def submit(self):
+        """Submit the query of a lazy SQL dataObject without waiting for
+        its result. The result is downloaded when df is first accessed.
+
+        Returns:
+            bigquery.QueryJob, or None if there is nothing to submit.
+        """
+        if self.input_type not in ('sql', 'sql file') or not self.deferred:
+            return None
+        if self.cache == 'read' and queryCache().get(
+            self._get_query_cache_key()
+        ) is not None:
+            return None
+        return self._submit_query()
+
+    def estimate(self):
+        """Estimate the bytes processed and cost of a SQL input with a
+        BigQuery dry run. Estimates are cached per rendered query.
+
+        Returns:
+            dict: total_bytes_processed, estimated_cost and referenced_tables.
+        """
+        if self.input_type not in ('sql', 'sql file'):
+            raise ValueError('Only SQL inputs can be estimated.')
+        return estimate_query(
+            self.bq_client,
+            self.input_code,
+            self._get_query_cache_key(),
+            query_parameters=self.query_parameters,
+        )
+
+    def _set_input_code(self, sql):
+        """Render a SQL input and its native query parameters."""
+        template = compile_template(sql)
+        self.input_code = template.render(self.params, self.native_params)
+        self.query_parameters = template.get_query_parameters(
+            self.params, self.native_params)
+        if self.watermark_column:
+            self._add_watermark_filter(sql)
+
+    def _add_watermark_filter(self, sql):
+        """Filter a SQL input to rows above its stored watermark.
+
+        The default watermark_id covers the query template and its
+        params, so runs with different params keep separate watermarks.
+        Params are used as given, before YYYYMMDD is expanded, so the
+        rolling date does not start a new watermark every day.
+        """
+        key = [self.project_id, sql, self.watermark_column]
+        if self.params:
+            key.append(repr(sorted(
+                (str(k), repr(v)) for k, v in self.params.items())))
+            key.append(repr(sorted(self.native_params or [])))
+        self.watermark_id = self.watermark_id or get_hash_id(key)
+        self.watermark_store = self.watermark_store or get_watermark_store()
+        self.watermark = self.watermark_store.get(self.watermark_id)
+        if self.watermark is None:
+            print("RUNNING: No watermark found. Loading all rows.")
+            return
+        self.input_code, parameter = add_watermark_filter(
+            self.input_code, self.watermark_column, self.watermark)
+        self.query_parameters.append(parameter)
+        print("RUNNING: Loading rows with {} > {}.".format(
+            self.watermark_column, self.watermark['value']))
+
+    def commit_watermark(self):
+        """Advance the stored watermark to the highest watermark_column
+        value loaded, so the next run only reads newer rows. Called by
+        to_db after a successful write.
+        """
+        if not (self.watermark_column and self.watermark_id):
+            return
+        if self._next_watermark is None and not self.stream:
+            self._update_next_watermark(self.df)
+        if self._next_watermark is None:
+            print("SUCCESS: No new rows. Watermark unchanged.")
+            return
+        value, bq_type = self._next_watermark
+        self.watermark_store.set(self.watermark_id, value, bq_type)
+        print("SUCCESS: Set {} watermark to {}.".format(
+            self.watermark_column, value))
+
+    def _update_next_watermark(self, df):
+        value, bq_type = get_max_value(df, self.watermark_column)
+        if value is None:
+            return
+        if self._next_watermark is None or value > self._next_watermark[0]:
+            self._next_watermark = (value, bq_type)
+
+    def _get_query_job_config(self, check_budget=True):
+        """Return the job configuration used to run a SQL input. Queries
+        are pre-flighted against the byte budgets first.
+
+        Raises:
+            QueryBudgetError: If the query would exceed a budget.
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=self.query_parameters)
+        budget_enabled = (
+            self.preflight or RUN_BUDGET.is_enabled(self.maximum_bytes_billed))
+        if not (check_budget and budget_enabled):
+            return job_config
+        estimate = self.estimate()
+        print("RUNNING: Query will process {}.".format(format_estimate(estimate)))
+        self._budget_reservation = RUN_BUDGET.reserve(
+            estimate, self.maximum_bytes_billed)
+        limit = self.maximum_bytes_billed or RUN_BUDGET.maximum_bytes_billed
+        if limit is not None:
+            job_config.maximum_bytes_billed = int(limit)
+        return job_config
+
+    def _submit_query(self, use_cache=True):
+        job_config = self._get_query_job_config()
+        try:
+            self.query_job = bq_reader.submit_query(
+                self.bq_client, self.input_code, use_cache, job_config)
+        except Exception:
+            self._release_budget()
+            raise
+        return self.query_job
+
+    def _release_budget(self, job=None):
+        """Replace the run budget reservation of this query with the
+        bytes it billed."""
+        if self._budget_reservation is None:
+            return
+        RUN_BUDGET.release(
+            self._budget_reservation, getattr(job, 'total_bytes_billed', None))
+        self._budget_reservation = None
+
+    def _load_deferred(self):
+        """Load the input of a lazy dataObject on first access to df."""
+        self._df = pd.DataFrame()
+        self.deferred = False
+        self.load_data(self.source)
+
+    """ STREAM DATA
+        Read data from the input source in chunks, without loading the
+        full input into memory.
+    """
+    def iter_batches(self, batch_size=DEFAULT_BATCH_SIZE, as_arrow=False):
+        """Iterate over the input data in chunks.
+
+        CSV files, JSON lines files and SQL inputs are read from the source
+        in chunks of batch_size rows. Other inputs are sliced from self.df.
+
+        Args:
+            batch_size (int): Maximum number of rows per chunk.
+            as_arrow (bool): Yield pyarrow Tables instead of DataFrames.
+
+        Yields:
+            pd.DataFrame or pa.Table
+        """
+        for batch in self._iter_source_batches(batch_size):
+            if not self.feature_list:
+                self._get_data_metadata(columns=list(batch))
+            if self.watermark_column:
+                self._update_next_watermark(batch)
+            if as_arrow:
+                yield pa.Table.from_pandas(batch, preserve_index=False)
+            else:
+                yield batch
+
+    def _iter_source_batches(self, batch_size):
+        if self.input_type == 'csv file' and self.engine == ARROW_CSV_ENGINE:
+            for batch in self._iter_arrow_csv_batches(batch_size):
+                yield self._convert_dtypes(batch.to_pandas(), downcast=False)
+        elif self.input_type == 'csv file':
+            with open_source(self.input_file) as source, pd.read_csv(
+                source, chunksize=batch_size, **self._get_csv_kwargs()
+            ) as reader:
+                for batch in reader:
+                    yield self._convert_dtypes(batch, downcast=False)
+        elif self.input_type == 'json file':
+            if not self.json_lines:
+                raise ValueError(
+                    'Only line-delimited JSON files can be read in batches.')
+            with open_source(self.input_file) as source, pd.read_json(
+                source,
+                lines=True,
+                chunksize=batch_size,
+                **self._get_json_kwargs()
+            ) as reader:
+                for batch in reader:
+                    yield self._convert_dtypes(batch, downcast=False)
+        elif self.input_type == 'parquet file':
+            with open_source(self.input_file) as source:
+                parquet_file = pq.ParquetFile(source)
+                for batch in parquet_file.iter_batches(
+                    batch_size=batch_size, columns=self.columns
+                ):
+                    table = self._filter_table(pa.Table.from_batches([batch]))
+                    yield table.to_pandas()
+        elif self.input_type == 'feather file':
+            with open_source(self.input_file) as source:
+                table = feather.read_table(
+                    source, columns=self.columns, memory_map=True)
+                for i in range(0, table.num_rows, batch_size):
+                    yield self._filter_table(table.slice(i, batch_size)).to_pandas()
+        elif self.input_type == 'files':
+            # Shards are read one at a time, so memory is bounded by the largest file
+            read_file = self._get_file_reader()
+            for path in self.input_file:
+                table = self._add_source_column(read_file(path), path)
+                for i in range(0, table.num_rows, batch_size):
+                    yield self._convert_dtypes(
+                        table.slice(i, batch_size).to_pandas(), downcast=False)
+        elif self.input_type in ('sql', 'sql file'):
+            job, self.query_job = self.query_job or self._submit_query(), None
+            try:
+                for batch in bq_reader.iter_query_job(job, batch_size):
+                    yield batch
+            finally:
+                self._release_budget(job)
+        elif self.input_type == 'dataObject' and self.stream:
+            for batch in self.input_blob.iter_batches(batch_size=batch_size):
+                yield batch
+        else:
+            for i in range(0, len(self.df), batch_size):
+                yield self.df[i:i + batch_size]
+
+    def _iter_arrow_csv_batches(self, batch_size):
+        """Stream a CSV file with pyarrow, re-chunked to batch_size rows."""
+        with open_source(self.input_file) as source:
+            reader = pa_csv.open_csv(
+                source,
+                convert_options=pa_csv.ConvertOptions(
+                    include_columns=self.columns,
+                    column_types=self._get_arrow_column_types(),
+                ),
+            )
+            buffer = []
+            buffer_rows = 0
+            for record_batch in reader:
+                buffer.append(record_batch)
+                buffer_rows += record_batch.num_rows
+                while buffer_rows >= batch_size:
+                    table = pa.Table.from_batches(buffer)
+                    yield table.slice(0, batch_size)
+                    remainder = table.slice(batch_size)
+                    buffer = remainder.to_batches()
+                    buffer_rows = remainder.num_rows
+            if buffer_rows:
+                yield pa.Table.from_batches(buffer)
+
     """ OUTPUT DATA
         Output one of several data types from the dataObject class.
     """
@@ -231,8 +972,45 @@ class dataObject:
     def to_json(self, **kwargs):
         return self.df.to_json(**kwargs)
 
-    def to_csv(self, path, **kwargs):
-        return self.df.to_csv(path, **kwargs)
+    def to_arrow(self, path=None, **kwargs):
+        """Return data as a pyarrow Table. If path is specified, the
+        table is also written to an Arrow IPC file.
+        """
+        if self._df is None and self.table is not None:
+            # The caller may keep the table, so df must not destroy it
+            self._table_shared = True
+            table = self.table
+        else:
+            table = pa.Table.from_pandas(self.df, preserve_index=False)
+        if path:
+            with open_source(path, 'wb') as target:
+                feather.write_feather(table, target, **kwargs)
+        return table
+
+    def to_parquet(self, path, **kwargs):
+        with open_source(path, 'wb') as target:
+            return pq.write_table(self.to_arrow(), target, **kwargs)
+
+    def to_feather(self, path, **kwargs):
+        with open_source(path, 'wb') as target:
+            return feather.write_feather(self.to_arrow(), target, **kwargs)
+
+    def to_csv(self, path, stream=False, batch_size=DEFAULT_BATCH_SIZE, **kwargs):
+        """Output data to a CSV file. If stream is True, the input is read
+        and written in chunks of batch_size rows. gs:// paths are written
+        with a resumable upload as the rows are produced.
+        """
+        with open_source(path, 'w') as target:
+            if not (stream or self.stream):
+                return self.df.to_csv(target, **kwargs)
+            kwargs.setdefault('index', False)
+            for i, batch in enumerate(self.iter_batches(batch_size=batch_size)):
+                batch.to_csv(
+                    target,
+                    mode='w' if i == 0 else 'a',
+                    header=(i == 0),
+                    **kwargs
+                )
 
     def to_db(
         self,
@@ -242,10 +1020,124 @@ class dataObject:
         params=None,
         table_schema=None,
         if_exists=None,
+        stream=False,
+        batch_size=DEFAULT_BATCH_SIZE,
+        method='gbq',
+        staging_bucket=None,
+        partitioned=False,
+        partition_field=None,
+        key_columns=None,
     ):
         """Output dataframe to a database destination table.
         Currently only supports BigQuery.
+
+        If stream is True, the input is read and loaded in chunks of
+        batch_size rows. The first chunk is written with if_exists and
+        the remaining chunks are appended.
+
+        Once the data are written, the watermark of an incremental
+        dataObject is advanced (see commit_watermark).
+
+        Args:
+            if_exists (str): 'replace', 'append' or 'fail'. Incremental
+                writes always use a load job and a staging table:
+                'merge' upserts rows on key_columns, and
+                'replace_partitions' overwrites only the partition_field
+                days present in the data (see bq_writer.merge_batches).
+            method (str): 'gbq' loads via pandas-gbq. 'load_job' writes the
+                data to Parquet in chunks of batch_size rows and submits a
+                single BigQuery load job with an explicit schema.
+            staging_bucket (str): For 'load_job', GCS bucket used to stage
+                the Parquet file. Uploads directly when not specified.
+            partitioned (bool): For 'load_job', load into the `partition`
+                day of a day-partitioned table (table$YYYYMMDD). With
+                if_exists='replace' only that partition is overwritten.
+            partition_field (str): For 'load_job', column used to partition
+                the table. Defaults to ingestion time.
+            key_columns (list): For if_exists='merge', columns identifying
+                a row.
         """
+        self._set_destination(destination_table, project_id, partition, params)
+        if_exists = if_exists or self.if_exists
+        table_schema = table_schema or self.table_schema
+
+        if method == 'load_job' or if_exists in bq_writer.MERGE_MODES:
+            self._to_load_job(
+                table_schema,
+                if_exists,
+                stream=stream or self.stream,
+                batch_size=batch_size,
+                staging_bucket=staging_bucket,
+                partitioned=partitioned,
+                partition_field=partition_field,
+                key_columns=key_columns,
+            )
+        elif not (stream or self.stream):
+            self._to_gbq(self.df, table_schema, if_exists)
+        else:
+            for i, batch in enumerate(self.iter_batches(batch_size=batch_size)):
+                self._to_gbq(batch, table_schema, if_exists if i == 0 else 'append')
+                print("RUNNING: Loaded batch {} to {}.".format(
+                    i + 1, self.full_destination_table_id))
+        self.commit_watermark()
+
+    def _to_gbq(self, df, table_schema, if_exists):
+        # Load dataframe to BigQuery via gbq()
+        df.to_gbq(
+            destination_table=self.destination_table_id,
+            project_id=self.project_id,
+            credentials=self.credentials,
+            table_schema=table_schema,
+            if_exists=if_exists,
+        )
+
+    def _to_load_job(
+        self,
+        table_schema,
+        if_exists,
+        stream,
+        batch_size,
+        **kwargs
+    ):
+        # Load dataframe to BigQuery via a Parquet load job
+        table_id = self.full_destination_table_id
+        key_columns = kwargs.pop('key_columns', None)
+        if kwargs.get('partitioned') and if_exists not in bq_writer.MERGE_MODES:
+            table_id = '{}${}'.format(table_id, self.partition)
+        if stream:
+            batches = self.iter_batches(batch_size=batch_size)
+        else:
+            batches = bq_writer.iter_chunks(self.df, batch_size)
+            table_schema = table_schema or load_schema(self.df)
+        if if_exists in bq_writer.MERGE_MODES:
+            self.load_job = bq_writer.merge_batches(
+                self.bq_client,
+                batches,
+                table_id,
+                schema=table_schema,
+                if_exists=if_exists,
+                key_columns=key_columns,
+                **kwargs
+            )
+        else:
+            self.load_job = bq_writer.load_batches(
+                self.bq_client,
+                batches,
+                table_id,
+                schema=table_schema,
+                if_exists=if_exists,
+                **kwargs
+            )
+        print("SUCCESS: Loaded data to {}.".format(table_id))
+
+    def _set_destination(
+        self,
+        destination_table,
+        project_id=None,
+        partition=None,
+        params=None,
+    ):
+        """Set the parameterized destination table IDs used by to_db."""
         def _set_destination_table_ids(destination_table):
             destination_list = destination_table.replace(':', '.').split('.')
             if len(destination_list) == 3:
@@ -261,32 +1153,53 @@ class dataObject:
         _set_destination_table_ids(destination_table)
         self.destination_table = self.dataset_id + '.' + self.table_id
         self.partition = partition or datetime.now().strftime('%Y%m%d')
-        self.params = eval(params) if isinstance(params, str) else params
+        self.params = parse_params(params)
         self.destination_table_id = self._replace_string_parameters(
             self.destination_table, self.partition, self.params)
         self.full_destination_table_id = self.project_id + '.' + self.destination_table_id
 
-        # Load dataframe to BigQuery via gbq()
-        self.df.to_gbq(
-            destination_table=self.destination_table_id,
-            project_id=self.project_id,
-            credentials=self.credentials,
-            table_schema=table_schema or self.table_schema,
-            if_exists=if_exists or self.if_exists,
-        )
-
     """ METADATA
         Get metadata from data object.
     """
-    def _get_data_metadata(self):
-        self._get_features()
+    def _get_data_metadata(self, columns=None):
+        self._get_features(columns)
         self._get_data_id()
 
-    def _get_features(self):
-        feature_list = list(self.df)
+    def _get_features(self, columns=None):
+        if columns is None and self.deferred:
+            try:
+                columns = self._get_source_columns()
+            except Exception as e:
+                print("ERROR: Unable to read input metadata.\n{}".format(e))
+                columns = []
+        elif columns is None and self._df is None and self.table is not None:
+            columns = self.table.column_names
+        elif columns is None:
+            columns = list(self.df)
+        feature_list = list(columns)
         feature_list.sort()
         self.feature_list = feature_list
 
+    def _get_source_columns(self):
+        """Get column names of a deferred input without reading its rows."""
+        if self.input_type in ('csv file', 'parquet file', 'feather file') or (
+            self.input_type == 'json file' and self.json_lines
+        ):
+            return self.columns or read_file_columns(self.input_file)
+        elif self.input_type == 'files':
+            columns = self.columns or read_file_columns(self.input_file[0])
+            return columns + ([self.source_column] if self.source_column else [])
+        elif self.input_type == 'dataObject':
+            return self.input_blob.feature_list
+        elif self.input_type in ('sql', 'sql file'):
+            schema = bq_reader.get_query_schema(
+                self.bq_client,
+                self.input_code,
+                job_config=self._get_query_job_config(check_budget=False),
+            )
+            return [field.name for field in schema]
+        return list(self.df)
+
     def _get_data_id(self):
         """Create data_id based on technical_analysis included in data"""
         if len(self.feature_list) > 0:
@@ -303,6 +1216,96 @@ class dataObject:
     def _get_data_type(self, data):
         return type(data)
 
+    def _get_arrow_column_types(self):
+        """Translate dtypes and parse_dates to Arrow column types."""
+        column_types = {}
+        for col, dtype in (self.dtypes or {}).items():
+            if str(dtype) == 'category':
+                column_types[col] = pa.dictionary(pa.int32(), pa.string())
+            elif str(dtype) in ('str', 'object', 'string'):
+                column_types[col] = pa.string()
+            else:
+                # Nullable dtypes (e.g. 'Int64') map to their numpy dtype
+                dtype = pd.api.types.pandas_dtype(dtype)
+                column_types[col] = pa.from_numpy_dtype(
+                    getattr(dtype, 'numpy_dtype', dtype))
+        for col in self.parse_dates or []:
+            column_types[col] = pa.timestamp('ns')
+        return column_types or None
+
+    def _get_csv_kwargs(self):
+        kwargs = {'usecols': self.columns, 'dtype': self.dtypes}
+        if self.engine:
+            kwargs['engine'] = self.engine
+        if self.parse_dates:
+            kwargs['parse_dates'] = self.parse_dates
+        return kwargs
+
+    def _get_json_kwargs(self):
+        kwargs = {}
+        if self.dtypes:
+            kwargs['dtype'] = self.dtypes
+        if self.parse_dates:
+            kwargs['convert_dates'] = self.parse_dates
+        return kwargs
+
+    def _convert_dtypes(self, df, downcast=None):
+        """Apply column projection, categories and downcasting to a
+        DataFrame read from a CSV or JSON input.
+        """
+        if self.columns:
+            source_columns = [c for c in [self.source_column] if c in df]
+            df = df[list(self.columns) + source_columns]
+        if self.categories:
+            df = df.astype({col: 'category' for col in self.categories})
+        if self.downcast if downcast is None else downcast:
+            df = downcast_df(df)
+        return df
+
+    def _is_file_list(self, data):
+        return isinstance(data, (list, tuple)) and len(data) > 0 and all(
+            isinstance(d, str) and d.endswith(FILE_EXTENSIONS) for d in data
+        )
+
+    def _get_file_reader(self):
+        return functools.partial(
+            read_file_arrow,
+            columns=self.columns,
+            filters=self.filters,
+            column_types=self._get_arrow_column_types(),
+        )
+
+    def _add_source_column(self, table, path):
+        if not self.source_column:
+            return table
+        source = pa.DictionaryArray.from_arrays(
+            pa.array(np.zeros(table.num_rows, dtype='int32')),
+            pa.array([path], pa.string()),
+        )
+        return table.append_column(self.source_column, source)
+
+    def _filter_table(self, table):
+        """Apply self.filters to an Arrow table."""
+        if not self.filters:
+            return table
+        return table.filter(pq.filters_to_expression(self.filters))
+
+    def _get_cache_mode(self, cache):
+        cache = cache or QUERY_CACHE_MODE
+        if cache not in QUERY_CACHE_MODES:
+            raise ValueError(
+                'cache must be one of {}.'.format(QUERY_CACHE_MODES))
+        return cache
+
+    def _get_query_cache_key(self):
+        """Hash the rendered query, query parameters and project into a
+        cache key."""
+        return get_hash_id([
+            self.query_project_id,
+            self.input_code,
+            [p.to_api_repr() for p in self.query_parameters],
+        ])
+
     def _replace_string_parameters(self, entry, partition=None, params=None):
         """Update a query or table name with today's date (i.e. YYYYMMDD)
         or custom parameters (e.g. {param_name}).
@@ -315,11 +1318,75 @@ class dataObject:
             p = partition or datetime.now().strftime("%Y%m%d")
             return entry.replace("YYYYMMDD", p).replace("{partition}", p)
 
-        def _replace_params(entry, params):
+        def _replace_params(entry, params, partition=None):
             # Replace all parameters in the destination table name
-            return _set_query_params(entry, params)
+            return _set_query_params(entry, params, partition=partition)
 
         # Run function
         entry = _replace_date_partition(entry, partition)
-        entry = _replace_params(entry, params)
+        entry = _replace_params(entry, params, partition)
         return entry
+
+
+def load_many(
+    inputs,
+    params=None,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    **kwargs
+):
+    """Load many independent inputs into dataObjects concurrently.
+
+    All SQL inputs are submitted to BigQuery up front, so the queries run
+    concurrently on BigQuery. Results are then downloaded by a pool of
+    max_concurrency threads. A failed input does not stop the others; its
+    dataObject has an empty df and the exception in load_error.
+
+    Args:
+        inputs (dict): Inputs by name, e.g. {'sales': 'sales.sql'}. Values
+            are any data accepted by dataObject.
+        params (dict): Parameters used to format every SQL input.
+        max_concurrency (int): Maximum number of concurrent downloads.
+        **kwargs: Additional dataObject arguments.
+
+    Returns:
+        dict: dataObject by name. Each has a load_seconds attribute.
+
+    Examples:
+        data = load_many({'a': 'a.sql', 'b': 'SELECT * FROM t'}, max_concurrency=4)
+        data['a'].df
+    """
+    start = time.perf_counter()
+    data = {
+        name: dataObject(source, params=params, lazy=True, **kwargs)
+        for name, source in inputs.items()
+    }
+
+    # Submit all queries before waiting on any of them
+    for name, obj in data.items():
+        try:
+            obj.submit()
+        except QueryBudgetError:
+            raise
+        except Exception as e:
+            obj.load_error = e
+            print("ERROR: Unable to submit {}.\n{}".format(name, e))
+
+    def _load(obj):
+        load_start = time.perf_counter()
+        if obj.load_error is None:
+            obj.df
+        else:
+            obj.df = pd.DataFrame()
+        obj.load_seconds = time.perf_counter() - load_start
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        list(pool.map(_load, data.values()))
+
+    for name, obj in data.items():
+        print("{}: {} {} rows in {:.2f}s.".format(
+            'ERROR' if obj.load_error else 'SUCCESS',
+            name, len(obj.df), obj.load_seconds))
+    failures = sum(obj.load_error is not None for obj in data.values())
+    print("SUCCESS: Loaded {} of {} inputs in {:.2f}s.".format(
+        len(data) - failures, len(data), time.perf_counter() - start))
+    return data
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+""" algoMosaic query budget that estimates and limits BigQuery bytes.
+
+Queries are estimated with a BigQuery dry run before they are executed.
+Estimates are cached per rendered query hash, so repeated pre-flights of
+the same query do not call BigQuery again.
+
+Two limits can be set in configs.py:
+    - BQ_MAXIMUM_BYTES_BILLED: maximum bytes for a single query. Also
+      passed to BigQuery as maximum_bytes_billed, so BigQuery enforces it.
+    - BQ_RUN_BYTES_BUDGET: maximum bytes for all queries in a pipeline
+      run (i.e. the current process). See RUN_BUDGET.
+
+"""
+
+import threading
+from google.cloud import bigquery
+
+import configs
+
+
+BQ_MAXIMUM_BYTES_BILLED = getattr(configs, 'BQ_MAXIMUM_BYTES_BILLED', None)
+BQ_RUN_BYTES_BUDGET = getattr(configs, 'BQ_RUN_BYTES_BUDGET', None)
+BQ_PRICE_PER_TIB = getattr(configs, 'BQ_PRICE_PER_TIB', 6.25)
+
+_ESTIMATE_CACHE = {}
+
+
+class QueryBudgetError(ValueError):
+    """Raised when a query would exceed a byte budget."""
+
+
+def estimate_query(
+    bq_client,
+    query,
+    key,
+    price_per_tib=BQ_PRICE_PER_TIB,
+    query_parameters=None,
+):
+    """Estimate the bytes processed and cost of a query with a dry run.
+
+    Args:
+        bq_client (bigquery.Client): BigQuery client.
+        query (str): Rendered SQL query.
+        key (str): Hash of the rendered query, used to cache the estimate.
+        price_per_tib (float): On-demand price per TiB processed.
+        query_parameters (list): BigQuery query parameters of the query.
+
+    Returns:
+        dict: total_bytes_processed, estimated_cost and referenced_tables.
+    """
+    if key in _ESTIMATE_CACHE:
+        return _ESTIMATE_CACHE[key]
+    job_config = bigquery.QueryJobConfig(
+        dry_run=True,
+        use_query_cache=False,
+        query_parameters=query_parameters or [],
+    )
+    job = bq_client.query(query, job_config=job_config)
+    total_bytes = job.total_bytes_processed or 0
+    estimate = {
+        'total_bytes_processed': total_bytes,
+        'estimated_cost': total_bytes / 1024 ** 4 * price_per_tib,
+        'referenced_tables': [
+            '{}.{}.{}'.format(t.project, t.dataset_id, t.table_id)
+            for t in job.referenced_tables or []
+        ],
+    }
+    _ESTIMATE_CACHE[key] = estimate
+    return estimate
+
+
+def clear_estimate_cache():
+    _ESTIMATE_CACHE.clear()
+
+
+def format_estimate(estimate):
+    return "{:.2f} GB (est. ${:.4f}) from {}".format(
+        estimate['total_bytes_processed'] / 1024 ** 3,
+        estimate['estimated_cost'],
+        ', '.join(estimate['referenced_tables']) or 'no tables',
+    )
+
+
+class queryBudget():
+    """Track and enforce BigQuery bytes processed across queries.
+
+    Args:
+        maximum_bytes_billed (int): Maximum bytes for a single query.
+        run_bytes_budget (int): Maximum bytes for all queries checked
+            against this budget.
+
+    Queries reserve their estimated bytes before they run. The check and
+    the reservation happen under one lock, so concurrent queries can't
+    all pass against the same remaining budget. Once a query finishes,
+    its reservation is released and replaced by the bytes it billed.
+
+    Examples:
+        budget = queryBudget(run_bytes_budget=10 * 1024 ** 4)
+        reserved = budget.reserve(estimate)
+        budget.release(reserved, job.total_bytes_billed)
+    """
+    def __init__(
+        self,
+        maximum_bytes_billed=BQ_MAXIMUM_BYTES_BILLED,
+        run_bytes_budget=BQ_RUN_BYTES_BUDGET,
+    ):
+        self.maximum_bytes_billed = maximum_bytes_billed
+        self.run_bytes_budget = run_bytes_budget
+        self.bytes_used = 0
+        self._lock = threading.Lock()
+
+    def is_enabled(self, maximum_bytes_billed=None):
+        return any(x is not None for x in (
+            maximum_bytes_billed,
+            self.maximum_bytes_billed,
+            self.run_bytes_budget,
+        ))
+
+    def reserve(self, estimate, maximum_bytes_billed=None):
+        """Reserve a query's estimated bytes against the run budget.
+
+        Raises:
+            QueryBudgetError: If the estimate exceeds the per-query limit
+                or the rest of the run budget.
+
+        Returns:
+            int: Reserved bytes, to be passed to release.
+        """
+        total_bytes = estimate['total_bytes_processed'] or 0
+        limit = maximum_bytes_billed or self.maximum_bytes_billed
+        if limit is not None and total_bytes > limit:
+            raise QueryBudgetError(
+                'Query would process {} bytes, over the per-query limit of '
+                '{} bytes.'.format(total_bytes, limit))
+        with self._lock:
+            if (
+                self.run_bytes_budget is not None
+                and self.bytes_used + total_bytes > self.run_bytes_budget
+            ):
+                raise QueryBudgetError(
+                    'Query would process {} bytes; {} of the {} byte run '
+                    'budget are already used.'.format(
+                        total_bytes, self.bytes_used, self.run_bytes_budget))
+            self.bytes_used += total_bytes
+        return total_bytes
+
+    def release(self, reserved, total_bytes=None):
+        """Replace a reservation with the bytes a query billed. Pass no
+        total_bytes to drop the reservation of a query that did not run."""
+        with self._lock:
+            self.bytes_used += (total_bytes or 0) - reserved
+
+    def reset(self):
+        with self._lock:
+            self.bytes_used = 0
+
+
+# Budget shared by all queries in the current pipeline run
+RUN_BUDGET = queryBudget()
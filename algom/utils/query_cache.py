@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+""" algoMosaic queryCache that stores query results on local disk.
+
+Results are stored as Parquet files keyed by a content hash of the
+rendered query (see dataObject._get_query_cache_key). Each entry has a
+small JSON sidecar with its creation time, so entries expire after a TTL.
+When the cache grows past its size limit, the least recently used
+entries are evicted first.
+
+Cache modes used by dataObject:
+    - read: serve results from the cache, and run/store on a miss
+    - refresh: always run the query and overwrite the cached result
+    - bypass: never read from or write to the cache
+
+"""
+
+import os
+import json
+import time
+import tempfile
+import pandas as pd
+
+import configs
+
+
+QUERY_CACHE_DIRECTORY = getattr(
+    configs, 'QUERY_CACHE_DIRECTORY',
+    os.path.join(os.path.expanduser('~'), '.algom', 'query_cache'))
+QUERY_CACHE_TTL = getattr(configs, 'QUERY_CACHE_TTL', 24 * 60 * 60)
+QUERY_CACHE_MAX_BYTES = getattr(configs, 'QUERY_CACHE_MAX_BYTES', 5 * 1024 ** 3)
+QUERY_CACHE_MODE = getattr(configs, 'QUERY_CACHE_MODE', 'bypass')
+QUERY_CACHE_MODES = ('read', 'refresh', 'bypass')
+
+
+class queryCache():
+    """Content-addressed local cache of query results.
+
+    Args:
+        directory (str): Local directory where results are stored.
+        ttl (int): Seconds before a cached result expires. None disables
+            expiry.
+        max_bytes (int): Maximum size of the cache on disk. Least recently
+            used entries are evicted once the limit is exceeded.
+
+    Examples:
+        cache = queryCache()
+        df = cache.get(key)
+        if df is None:
+            cache.put(key, df, query=sql)
+    """
+    def __init__(
+        self,
+        directory=QUERY_CACHE_DIRECTORY,
+        ttl=QUERY_CACHE_TTL,
+        max_bytes=QUERY_CACHE_MAX_BYTES,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get(self, key):
+        """Return the cached DataFrame for a key, or None on a miss."""
+        data_path, meta_path = self._get_paths(key)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None
+        try:
+            with open(meta_path, 'r') as f:
+                metadata = json.load(f)
+            if self._is_expired(metadata):
+                self.delete(key)
+                return None
+            df = pd.read_parquet(data_path)
+            # Touch the entry so LRU eviction keeps recently used results
+            os.utime(data_path, None)
+            return df
+        except (OSError, ValueError) as e:
+            print("ERROR: Unable to read cached query result.\n{}".format(e))
+            self.delete(key)
+            return None
+
+    def put(self, key, df, **metadata):
+        """Store a DataFrame under a key and evict old entries if needed."""
+        data_path, meta_path = self._get_paths(key)
+        metadata.update({
+            'key': key,
+            'created_at': time.time(),
+            'rows': len(df),
+        })
+        # Write to unique temporary files first so readers never see partial
+        # entries and concurrent writers of the same key do not collide
+        tmp_paths = [self._get_tmp_path(), self._get_tmp_path()]
+        try:
+            df.to_parquet(tmp_paths[0], index=False)
+            with open(tmp_paths[1], 'w') as f:
+                json.dump(metadata, f)
+            os.replace(tmp_paths[0], data_path)
+            os.replace(tmp_paths[1], meta_path)
+        finally:
+            for path in tmp_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+        self.evict()
+
+    def delete(self, key):
+        for path in self._get_paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        for key in self._get_keys():
+            self.delete(key)
+
+    def evict(self):
+        """Remove least recently used entries until under max_bytes."""
+        if self.max_bytes is None:
+            return
+        entries = []
+        for key in self._get_keys():
+            data_path, _ = self._get_paths(key)
+            try:
+                stat = os.stat(data_path)
+            except FileNotFoundError:
+                # Removed by another process since it was listed
+                continue
+            entries.append((stat.st_mtime, stat.st_size, key))
+        total_bytes = sum(e[1] for e in entries)
+        for _, size, key in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            self.delete(key)
+            total_bytes -= size
+
+    """ HELPER FUNCTIONS
+        Functions referenced in the code above.
+    """
+    def _get_paths(self, key):
+        return (
+            os.path.join(self.directory, '{}.parquet'.format(key)),
+            os.path.join(self.directory, '{}.json'.format(key)),
+        )
+
+    def _get_tmp_path(self):
+        fd, path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        os.close(fd)
+        return path
+
+    def _get_keys(self):
+        return [
+            f[:-len('.parquet')] for f in os.listdir(self.directory)
+            if f.endswith('.parquet')
+        ]
+
+    def _is_expired(self, metadata):
+        if self.ttl is None:
+            return False
+        return time.time() - metadata.get('created_at', 0) > self.ttl
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+""" algoMosaic query templates used to format SQL with parameters.
+
+A query is parsed once into a compiled queryTemplate (cached by query
+text) and rendered in a single pass. Templates support:
+    - {param_name}: replaced with the value of params['param_name'].
+      Any key without braces works, e.g. {start-date} or {a.b}.
+    - YYYYMMDD or {YYYYMMDD}: replaced with today's date (or a given
+      partition), also inside parameter values. The bare token must not
+      touch letters or digits, so events_YYYYMMDD is a date shard but
+      ABCYYYYMMDD is left alone.
+
+Parameters can also be bound as native BigQuery query parameters. The
+placeholder is then rendered as @param_name and the value is sent with
+the job, so the query text stays the same when values change and
+BigQuery can serve repeated queries from its result cache.
+
+"""
+
+import re
+import ast
+import json
+import decimal
+import datetime
+import functools
+from google.cloud import bigquery
+
+
+# Date placeholder, braced or bounded by non-alphanumerics ('_' included)
+DATE_PATTERN = re.compile(r'\{YYYYMMDD\}|(?<![A-Za-z0-9])YYYYMMDD(?![A-Za-z0-9])')
+TOKEN_PATTERN = re.compile(r'(?P<date>{})|\{{(?P<param>[^{{}}]+)\}}'.format(
+    DATE_PATTERN.pattern))
+TEMPLATE_CACHE_SIZE = 1024
+
+
+class queryTemplate():
+    """SQL query parsed into literal text and parameter placeholders.
+
+    Args:
+        query (str): SQL query containing {param_name} and YYYYMMDD
+            placeholders.
+
+    Examples:
+        template = compile_template('SELECT * FROM t WHERE id = {id}')
+        template.render({'id': 5})
+        template.render({'id': 5}, native_params=['id'])
+    """
+    def __init__(self, query):
+        self.query = query
+        self.parts = self._parse(query)
+        self.param_names = {
+            name for kind, name in self.parts if kind == 'param'}
+
+    def render(self, params=None, native_params=None, partition=None):
+        """Render the query in a single pass.
+
+        Args:
+            params (dict): Parameter values by name. Keys are matched as
+                strings and placeholders without a value are left
+                unchanged.
+            native_params (list): Names of parameters rendered as @name
+                BigQuery query parameters instead of inline values.
+            partition (str): Value for YYYYMMDD. Defaults to today.
+
+        Returns:
+            str: Rendered query.
+        """
+        params = {str(k): v for k, v in (params or {}).items()}
+        native_params = self._get_native_params(params, native_params)
+        partition = partition or datetime.datetime.now().strftime('%Y%m%d')
+        rendered = []
+        for kind, value in self.parts:
+            if kind == 'text':
+                rendered.append(value)
+            elif kind == 'date':
+                rendered.append(partition)
+            elif value in native_params:
+                rendered.append('@' + value)
+            elif value in params:
+                rendered.append(DATE_PATTERN.sub(partition, str(params[value])))
+            else:
+                rendered.append('{' + value + '}')
+        return ''.join(rendered)
+
+    def get_query_parameters(self, params=None, native_params=None):
+        """Return BigQuery query parameters for the native params."""
+        params = params or {}
+        return [
+            to_query_parameter(name, params[name])
+            for name in sorted(self._get_native_params(params, native_params))
+        ]
+
+    """ HELPER FUNCTIONS
+        Functions referenced in the code above.
+    """
+    def _parse(self, query):
+        parts = []
+        position = 0
+        for match in TOKEN_PATTERN.finditer(query):
+            if match.start() > position:
+                parts.append(('text', query[position:match.start()]))
+            if match.group('date'):
+                parts.append(('date', None))
+            else:
+                parts.append(('param', match.group('param')))
+            position = match.end()
+        if position < len(query):
+            parts.append(('text', query[position:]))
+        return parts
+
+    def _get_native_params(self, params, native_params):
+        if native_params is True:
+            native_params = params.keys()
+        return {
+            name for name in native_params or []
+            if name in params and name in self.param_names
+        }
+
+
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(query):
+    """Return the cached compiled queryTemplate for a query."""
+    return queryTemplate(query)
+
+
+def parse_params(params):
+    """Parse parameters given as a dict or as a dict literal / JSON string.
+
+    Strings are parsed with ast.literal_eval (or JSON), never evaluated as
+    code.
+    """
+    if not isinstance(params, str):
+        return params
+    try:
+        return ast.literal_eval(params)
+    except (ValueError, SyntaxError):
+        return json.loads(params)
+
+
+def to_query_parameter(name, value):
+    """Convert a Python value to a BigQuery query parameter."""
+    if isinstance(value, (list, tuple, set)):
+        values = list(value)
+        bq_type = _get_parameter_type(values[0]) if values else 'STRING'
+        return bigquery.ArrayQueryParameter(name, bq_type, values)
+    return bigquery.ScalarQueryParameter(name, _get_parameter_type(value), value)
+
+
+def _get_parameter_type(value):
+    if isinstance(value, bool):
+        return 'BOOL'
+    elif isinstance(value, int):
+        return 'INT64'
+    elif isinstance(value, float):
+        return 'FLOAT64'
+    elif isinstance(value, decimal.Decimal):
+        return 'NUMERIC'
+    elif isinstance(value, datetime.datetime):
+        return 'TIMESTAMP' if value.tzinfo else 'DATETIME'
+    elif isinstance(value, datetime.date):
+        return 'DATE'
+    elif isinstance(value, bytes):
+        return 'BYTES'
+    return 'STRING'
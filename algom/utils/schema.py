@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+""" algoMosaic schema inference for BigQuery loads.
+
+Schemas are inferred from the dtypes of the entire DataFrame rather than
+from individual values. Columns with a concrete dtype (ints, floats,
+bools, datetimes, categories, the db-dtypes dbdate/dbtime columns
+returned by bigquery's to_dataframe, and pd.ArrowDtype columns) are
+typed in constant time. Object columns are typed with pandas' vectorized
+infer_dtype, which supports:
+    - STRING, BYTES, INT64, FLOAT64, BOOL
+    - NUMERIC (decimal.Decimal values)
+    - DATE, TIME, DATETIME and TIMESTAMP (timezone-aware values)
+    - REPEATED fields (list values) and RECORD fields (dict values)
+
+Schemas are returned in the same format used by pandas-gbq's
+table_schema argument, i.e. a list of dicts:
+    [{'name': 'col', 'type': 'INT64', 'mode': 'NULLABLE', 'description': ''}]
+
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from google.cloud import bigquery
+
+
+OBJECT_TYPES = {
+    'string': 'STRING',
+    'bytes': 'BYTES',
+    'integer': 'INT64',
+    'floating': 'FLOAT64',
+    'mixed-integer-float': 'FLOAT64',
+    'decimal': 'NUMERIC',
+    'boolean': 'BOOL',
+    'date': 'DATE',
+    'time': 'TIME',
+    'datetime': 'DATETIME',
+    'datetime64': 'DATETIME',
+    'empty': 'STRING',
+}
+REPEATED_TYPES = (list, tuple, np.ndarray)
+# Arrow types written to Parquet for each BigQuery type
+ARROW_TYPES = {
+    'STRING': pa.string(),
+    'BYTES': pa.binary(),
+    'INT64': pa.int64(),
+    'INTEGER': pa.int64(),
+    'FLOAT64': pa.float64(),
+    'FLOAT': pa.float64(),
+    'BOOL': pa.bool_(),
+    'BOOLEAN': pa.bool_(),
+    'NUMERIC': pa.decimal128(38, 9),
+    'BIGNUMERIC': pa.decimal256(76, 38),
+    'DATE': pa.date32(),
+    'TIME': pa.time64('us'),
+    'DATETIME': pa.timestamp('us'),
+    'TIMESTAMP': pa.timestamp('us', tz='UTC'),
+}
+# Extension dtypes of the db-dtypes package, by dtype name
+DB_DTYPES = {
+    'dbdate': 'DATE',
+    'dbtime': 'TIME',
+}
+
+def infer_schema(df, infer_required=False):
+    """Infer a BigQuery schema from an entire DataFrame.
+
+    Args:
+        df (pd.DataFrame): DataFrame to describe.
+        infer_required (bool): Mark columns without nulls as REQUIRED.
+            Defaults to NULLABLE for all columns.
+
+    Returns:
+        list: Schema fields as dicts.
+    """
+    return [
+        _infer_field(str(name), df[name], infer_required)
+        for name in df.columns
+    ]
+
+
+def to_bq_schema(schema):
+    """Convert a list of schema dicts to bigquery.SchemaField objects."""
+    return [
+        bigquery.SchemaField(
+            name=field['name'],
+            field_type=field['type'],
+            mode=field.get('mode', 'NULLABLE'),
+            description=field.get('description') or None,
+            fields=to_bq_schema(field.get('fields', [])),
+        )
+        for field in schema
+    ]
+
+
+def infer_arrow_schema(arrow_schema):
+    """Infer a BigQuery schema from a pyarrow schema."""
+    return [
+        dict({'name': field.name, 'mode': 'NULLABLE', 'description': ''},
+             **_infer_arrow_field(field.type))
+        for field in arrow_schema
+    ]
+
+
+def to_arrow_type(field):
+    """Return the pyarrow type of a schema dict."""
+    if field.get('type') in ('RECORD', 'STRUCT'):
+        arrow_type = pa.struct([
+            pa.field(f['name'], to_arrow_type(f)) for f in field.get('fields', [])
+        ])
+    else:
+        arrow_type = ARROW_TYPES.get(field.get('type'), pa.string())
+    if field.get('mode') == 'REPEATED':
+        return pa.list_(arrow_type)
+    return arrow_type
+
+
+""" HELPER FUNCTIONS
+    Functions referenced in the code above.
+"""
+def _infer_field(name, s, infer_required=False):
+    field = {
+        'name': name,
+        'type': 'STRING',
+        'mode': 'NULLABLE',
+        'description': '',
+    }
+    if infer_required and len(s) and not s.isna().any():
+        field['mode'] = 'REQUIRED'
+
+    if isinstance(s.dtype, pd.ArrowDtype):
+        field.update(_infer_arrow_field(s.dtype.pyarrow_dtype))
+    elif s.dtype == object:
+        values = s.dropna()
+        first = values.iloc[0] if len(values) else None
+        if isinstance(first, REPEATED_TYPES):
+            field.update(_infer_field(name, values.explode(), False))
+            field['mode'] = 'REPEATED'
+        elif isinstance(first, dict):
+            field['type'] = 'RECORD'
+            field['fields'] = infer_schema(pd.DataFrame(values.tolist()))
+        else:
+            field['type'] = _get_object_type(values, first)
+    else:
+        field['type'] = _get_dtype_type(s)
+    return field
+
+
+def _get_dtype_type(s):
+    if str(s.dtype) in DB_DTYPES:
+        return DB_DTYPES[str(s.dtype)]
+    elif isinstance(s.dtype, pd.CategoricalDtype):
+        return _infer_field('', pd.Series(s.cat.categories))['type']
+    elif pd.api.types.is_bool_dtype(s):
+        return 'BOOL'
+    elif pd.api.types.is_integer_dtype(s):
+        return 'INT64'
+    elif pd.api.types.is_float_dtype(s):
+        return 'FLOAT64'
+    elif isinstance(s.dtype, pd.DatetimeTZDtype):
+        return 'TIMESTAMP'
+    elif pd.api.types.is_datetime64_dtype(s):
+        return 'DATETIME'
+    return 'STRING'
+
+
+def _infer_arrow_field(arrow_type):
+    """Return the type, and mode or fields, of a pyarrow type."""
+    if pa.types.is_dictionary(arrow_type):
+        return _infer_arrow_field(arrow_type.value_type)
+    elif pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type):
+        field = _infer_arrow_field(arrow_type.value_type)
+        field['mode'] = 'REPEATED'
+        return field
+    elif pa.types.is_struct(arrow_type):
+        return {
+            'type': 'RECORD',
+            'fields': infer_arrow_schema(arrow_type),
+        }
+    elif pa.types.is_boolean(arrow_type):
+        return {'type': 'BOOL'}
+    elif pa.types.is_integer(arrow_type):
+        return {'type': 'INT64'}
+    elif pa.types.is_floating(arrow_type):
+        return {'type': 'FLOAT64'}
+    elif pa.types.is_decimal(arrow_type):
+        return {'type': 'BIGNUMERIC' if arrow_type.precision > 38 else 'NUMERIC'}
+    elif pa.types.is_date(arrow_type):
+        return {'type': 'DATE'}
+    elif pa.types.is_time(arrow_type):
+        return {'type': 'TIME'}
+    elif pa.types.is_timestamp(arrow_type):
+        return {'type': 'TIMESTAMP' if arrow_type.tz else 'DATETIME'}
+    elif pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type):
+        return {'type': 'BYTES'}
+    return {'type': 'STRING'}
+
+
+def _get_object_type(values, first):
+    bq_type = OBJECT_TYPES.get(
+        pd.api.types.infer_dtype(values, skipna=True), 'STRING')
+    if bq_type == 'DATETIME' and getattr(first, 'tzinfo', None) is not None:
+        return 'TIMESTAMP'
+    return bq_type
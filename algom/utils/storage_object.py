@@ -1,33 +1,154 @@
 #!/usr/bin/env python
+import os
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import configs
+
 from algom.utils.client import storageClient
+from algom.utils.blob_cache import blobCache
+from algom.utils.storage_transfer import (
+    download_sliced,
+    upload_composite,
+    get_file_checksum,
+    GCS_CHUNK_SIZE,
+    GCS_MAX_WORKERS,
+    GCS_PARALLEL_THRESHOLD,
+    PART_SUFFIX,
+    STATE_SUFFIX,
+)
+
+
+GCS_URI_PREFIX = 'gs://'
+GCS_STREAM_CHUNK_SIZE = getattr(configs, 'GCS_STREAM_CHUNK_SIZE', 8 * 1024 ** 2)
+
+# Blob metadata key holding the mtime of an uploaded file (as used by gsutil)
+MTIME_METADATA_KEY = 'goog-reserved-file-mtime'
+# Blob properties returned by listings unless fields=None
+DEFAULT_BLOB_FIELDS = ('name', 'size', 'updated')
+BLOB_FIELD_NAMES = {'md5_hash': 'md5Hash', 'content_type': 'contentType'}
+LIST_PAGE_SIZE = 1000
+SYNC_BLOB_FIELDS = (
+    'name', 'size', 'updated', 'generation', 'metadata', 'md5_hash', 'crc32c')
+SYNC_DIRECTIONS = ('upload', 'download')
 
 
 class storageObject():
     """Upload and download files to/from Google Cloud Storage (GCS).
         - get_blob_list
+        - iter_blobs
+        - list_prefixes
         - download_file
         - upload_file
         - read_file
         - write_file
+        - delete_file
+        - open
+        - sync
 
+    Files of at least parallel_threshold bytes are downloaded in parallel
+    byte ranges and uploaded as parallel composite uploads. These
+    transfers resume from the last completed chunk when re-run, and are
+    verified against the blob's checksum (see storage_transfer).
+
+    Args:
+        client (storage.Client): Storage client, e.g. one pointed at a
+            local GCS emulator. Defaults to the shared client from
+            storageClient.
     """
-    def __init__(self):
-        client = storageClient()
-        self.client = client.storage_client
+    def __init__(self, client=None):
+        self.client = client or storageClient().storage_client
+
+    def get_blob_list(self, bucket_name, prefix=None, delimiter=None):
+        """Lists the names of the blobs in a given bucket."""
+        return [
+            blob.name for blob in self.iter_blobs(
+                bucket_name, prefix=prefix, delimiter=delimiter, fields=('name',))
+        ]
+
+    def iter_blobs(
+        self,
+        bucket_name,
+        prefix=None,
+        delimiter=None,
+        start_offset=None,
+        end_offset=None,
+        fields=DEFAULT_BLOB_FIELDS,
+        page_size=LIST_PAGE_SIZE,
+        index=None,
+    ):
+        """Iterate over the blobs in a bucket, one page at a time.
+
+        Only the requested fields are returned by GCS, so listings of
+        large buckets transfer and hold a fraction of the full metadata.
+        With index, blobs are served from a local blobIndex instead, which
+        re-lists the prefix once its TTL expires.
+
+        Args:
+            bucket_name (str): Name of the GCS Bucket.
+            prefix (str): Only list blobs whose names start with prefix.
+            delimiter (str): E.g. '/' to list only the blobs directly under
+                prefix. Sub-directories are returned by list_prefixes.
+            start_offset (str): Only list blob names >= start_offset.
+            end_offset (str): Only list blob names < end_offset.
+            fields (tuple): Blob properties to return, e.g. ('name', 'size',
+                'updated', 'generation', 'md5_hash', 'crc32c'). None returns
+                all properties, including custom metadata.
+            page_size (int): Blobs per list request.
+            index (bool or blobIndex): List blobs from a local index. The
+                blobs hold the index fields (see blob_index.INDEX_FIELDS)
+                and fields is ignored.
 
-    def get_blob_list(self, bucket_name):
-        """Lists all the blobs in a given bucket."""
+        Yields:
+            storage.Blob
+        """
+        if index:
+            bucket = self.client.bucket(bucket_name)
+            prefix = prefix or ''
+            return (
+                _get_indexed_blob(bucket, blob)
+                for blob in _get_blob_index(index, self).iter_blobs(
+                    bucket_name, prefix, start_offset, end_offset)
+                if not delimiter or delimiter not in blob['name'][len(prefix):]
+            )
         # Note: Client.list_blobs requires at least package version 1.17.0.
-        blobs = self.client.list_blobs(bucket_name)
-        blob_list = [blob.name for blob in blobs]
-        return blob_list
+        return iter(self.client.list_blobs(
+            bucket_name,
+            prefix=prefix,
+            delimiter=delimiter,
+            start_offset=start_offset,
+            end_offset=end_offset,
+            fields=_get_list_fields(fields),
+            page_size=page_size,
+        ))
+
+    def list_prefixes(self, bucket_name, prefix=None, delimiter='/', index=None):
+        """Return the sub-directories directly under prefix. With index,
+        they are read from a local blobIndex (see iter_blobs)."""
+        if index:
+            return _get_blob_index(index, self).list_prefixes(
+                bucket_name, prefix or '', delimiter)
+        blobs = self.client.list_blobs(
+            bucket_name,
+            prefix=prefix,
+            delimiter=delimiter,
+            fields='items(name),prefixes,nextPageToken',
+        )
+        for _ in blobs:
+            pass
+        return sorted(blobs.prefixes)
 
     def download_file(
         self,
         bucket_name,
         storage_path,
         destination_filename,
-        local_path=''
+        local_path='',
+        chunk_size=GCS_CHUNK_SIZE,
+        max_workers=GCS_MAX_WORKERS,
+        parallel_threshold=GCS_PARALLEL_THRESHOLD,
+        cache=None,
     ):
         """Download a file from GCS. Returns the same filename as the file in GCP.
 
@@ -36,6 +157,11 @@ class storageObject():
             storage_path (str): GCS blob path and file name. Do not include the bucket name.
             destination_filename (str): Path and name of destination (local) file.
             local_path (str): Local directory path. Defaults to current working directory.
+            chunk_size (int): Bytes per range request for parallel downloads.
+            max_workers (int): Number of concurrent range requests.
+            parallel_threshold (int): Minimum blob size downloaded in parallel.
+            cache (bool or blobCache): Copy the file from a local blob cache,
+                which only downloads the blob again if it changed.
 
         Returns:
             String containing file directory and name
@@ -45,14 +171,32 @@ class storageObject():
         self.storage_path = storage_path
         self.destination_filename = destination_filename
         self.local_path = local_path
-        self.bucket = self.client.get_bucket(bucket_name)
-        self.blob = self.bucket.blob(storage_path)
-        self.blob.download_to_filename(local_path + destination_filename)
+        self.bucket = self.client.bucket(bucket_name)
+        if cache:
+            _get_blob_cache(cache).copy(
+                self.bucket, storage_path, local_path + destination_filename)
+            return local_path + destination_filename
+        self.blob = self.bucket.get_blob(storage_path) or self.bucket.blob(storage_path)
+        _download_blob(
+            self.blob,
+            local_path + destination_filename,
+            chunk_size=chunk_size,
+            max_workers=max_workers,
+            parallel_threshold=parallel_threshold,
+        )
         print("Downloaded file from GCS to: {}".format(
             local_path + destination_filename))
         return local_path + destination_filename
 
-    def upload_file(self, bucket_name, storage_path, source_file_name):
+    def upload_file(
+        self,
+        bucket_name,
+        storage_path,
+        source_file_name,
+        chunk_size=GCS_CHUNK_SIZE,
+        max_workers=GCS_MAX_WORKERS,
+        parallel_threshold=GCS_PARALLEL_THRESHOLD,
+    ):
         """Upload a file to GCS.
 
         Params
@@ -61,17 +205,31 @@ class storageObject():
         storage_path:      str, GCS file/blob path and name. Do not include
                         the bucket name.
         source_file_name: str, Path and name of source (local) file.
+        chunk_size:     int, Bytes per part for parallel composite uploads.
+        max_workers:    int, Number of concurrent part uploads.
+        parallel_threshold: int, Minimum file size uploaded in parallel.
         """
         self.bucket_name = bucket_name
         self.storage_path = storage_path
         self.source_file_name = source_file_name
-        self.bucket = self.client.get_bucket(bucket_name)
-        self.blob = self.bucket.blob(storage_path)
-        self.blob.upload_from_filename(source_file_name)
+        self.bucket = self.client.bucket(bucket_name)
+        self.blob = _upload_blob(
+            self.bucket,
+            storage_path,
+            source_file_name,
+            chunk_size=chunk_size,
+            max_workers=max_workers,
+            parallel_threshold=parallel_threshold,
+        )
         return self.blob.public_url
 
-    def read_file(self, bucket_name, filepath):
+    def read_file(self, bucket_name, filepath, cache=None):
+        """Return the contents of a file in GCS as bytes. With cache, the
+        file is served from a local blob cache when it has not changed."""
         self.bucket_name = bucket_name
+        if cache:
+            self.bucket = self.client.bucket(bucket_name)
+            return _get_blob_cache(cache).read(self.bucket, filepath)
         self.bucket = self.client.get_bucket(bucket_name)
         self.blob = self.bucket.get_blob(filepath)
         return self.blob.download_as_string()
@@ -81,3 +239,315 @@ class storageObject():
         self.blob = self.bucket.blob(filepath)
         self.blob.upload_from_string(text)
         return self.blob.public_url
+
+    def open(
+        self,
+        bucket_name,
+        filepath,
+        mode='rb',
+        chunk_size=GCS_STREAM_CHUNK_SIZE,
+        **kwargs
+    ):
+        """Open a file in GCS as a buffered file-like object.
+
+        Reads are streamed with range requests that read ahead chunk_size
+        bytes, and support seek (e.g. for Parquet footers). Writes are sent
+        as a resumable upload in chunks of chunk_size bytes. Neither holds
+        the whole file in memory.
+
+        Args:
+            bucket_name (str): Name of the GCS Bucket.
+            filepath (str): GCS blob path and file name.
+            mode (str): 'rb', 'r', 'wb' or 'w'.
+            chunk_size (int): Bytes per request. Must be a multiple of
+                256 KB for writes.
+            kwargs: Passed to Blob.open, e.g. encoding or content_type.
+
+        Examples:
+            with storageObject().open('my_bucket', 'data.csv') as f:
+                df = pd.read_csv(f)
+        """
+        blob = self.client.bucket(bucket_name).blob(filepath)
+        return blob.open(mode, chunk_size=chunk_size, **kwargs)
+
+    def delete_file(self, bucket_name, filepath):
+        self.bucket = self.client.bucket(bucket_name)
+        self.bucket.blob(filepath).delete()
+
+    def sync(
+        self,
+        local_dir,
+        bucket_name,
+        prefix='',
+        direction='upload',
+        delete=False,
+        dry_run=False,
+        checksum=False,
+        index=None,
+        max_workers=GCS_MAX_WORKERS,
+        **kwargs
+    ):
+        """Sync a local directory with a GCS prefix, like rsync.
+
+        Both sides are listed once and only new or changed files are
+        transferred, by a pool of max_workers threads. Files of at least
+        parallel_threshold bytes are transferred after the pool, one at a
+        time with max_workers range requests each, so no more than
+        max_workers requests run at once. Files are changed
+        when their size or mtime differ (or their checksum, if checksum is
+        True). Uploads record the file mtime in the blob metadata and
+        downloads set it on the local file, so unchanged files are skipped
+        on the next sync.
+
+        Args:
+            local_dir (str): Local directory.
+            bucket_name (str): Name of the GCS Bucket.
+            prefix (str): GCS directory, e.g. configs.MODEL_STORAGE_DIRECTORY.
+            direction (str): 'upload' (local to GCS) or 'download'.
+            delete (bool): Delete destination files missing from the source.
+            dry_run (bool): Print the planned changes without applying them.
+            checksum (bool): Compare md5 (or crc32c) checksums of files
+                with the same size instead of mtimes.
+            index (bool or blobIndex): List the prefix from a local index
+                (see iter_blobs). Uploads and deletes are written back to
+                the index, so the next sync sees them without re-listing.
+            max_workers (int): Number of concurrent requests.
+            kwargs: chunk_size and parallel_threshold for large files.
+
+        Returns:
+            dict: Lists of transferred, deleted and failed paths, and the
+                number of skipped files, bytes and seconds.
+        """
+        if direction not in SYNC_DIRECTIONS:
+            raise ValueError('direction must be one of {}.'.format(SYNC_DIRECTIONS))
+        start = time.time()
+        prefix = prefix.rstrip('/') + '/' if prefix.strip('/') else ''
+        bucket = self.client.bucket(bucket_name)
+        index = _get_blob_index(index, self) if index else None
+        local_files = _list_local_files(local_dir)
+        remote_files = {
+            blob.name[len(prefix):]: blob
+            for blob in self.iter_blobs(
+                bucket_name, prefix=prefix, fields=SYNC_BLOB_FIELDS, index=index)
+            if not blob.name.endswith('/')
+        }
+        if direction == 'upload':
+            source, destination = local_files, remote_files
+        else:
+            source, destination = remote_files, local_files
+
+        transfers = [
+            path for path in sorted(source)
+            if path not in destination or _is_changed(
+                os.path.join(local_dir, path), remote_files[path], checksum)
+        ]
+        deletes = sorted(set(destination) - set(source)) if delete else []
+        summary = {
+            'transferred': [],
+            'deleted': [],
+            'failed': [],
+            'skipped': len(source) - len(transfers),
+            'bytes': 0,
+            'seconds': 0,
+        }
+        for path in transfers:
+            print("{}: {} {}".format(
+                'DRY RUN' if dry_run else 'RUNNING', direction, path))
+        for path in deletes:
+            print("{}: delete {}".format('DRY RUN' if dry_run else 'RUNNING', path))
+        if dry_run:
+            return summary
+        uploaded = []
+
+        def _transfer(path):
+            filename = os.path.join(local_dir, path)
+            if direction == 'upload':
+                uploaded.append(_upload_blob(
+                    bucket, prefix + path, filename,
+                    max_workers=max_workers, **kwargs))
+            else:
+                os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+                blob = remote_files[path]
+                _download_blob(blob, filename, max_workers=max_workers, **kwargs)
+                mtime = _get_blob_mtime(blob)
+                os.utime(filename, (mtime, mtime))
+            return os.path.getsize(filename)
+
+        def _delete(path):
+            if direction == 'upload':
+                bucket.blob(prefix + path).delete()
+            else:
+                os.remove(os.path.join(local_dir, path))
+            return 0
+
+        def _collect(key, path, get_result):
+            try:
+                summary['bytes'] += get_result()
+                summary[key].append(path)
+            except Exception as e:
+                summary['failed'].append(path)
+                print("ERROR: Unable to sync {}.\n{}".format(path, e))
+
+        # Large files are split into parallel requests of their own
+        threshold = kwargs.get('parallel_threshold', GCS_PARALLEL_THRESHOLD)
+        large_transfers = [
+            path for path in transfers
+            if _get_sync_size(local_dir, remote_files, path, direction) >= threshold
+        ]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                ('transferred', path, executor.submit(_transfer, path))
+                for path in transfers if path not in large_transfers
+            ] + [
+                ('deleted', path, executor.submit(_delete, path))
+                for path in deletes
+            ]
+            for key, path, future in futures:
+                _collect(key, path, future.result)
+        for path in large_transfers:
+            _collect('transferred', path, lambda: _transfer(path))
+        if index and direction == 'upload':
+            index.add(bucket_name, uploaded)
+            index.remove(bucket_name, [prefix + path for path in summary['deleted']])
+
+        summary['seconds'] = time.time() - start
+        print("SUCCESS: Synced {} files ({:.1f} MB) in {:.1f}s ({:.1f} MB/s). "
+              "Deleted {}, skipped {}, failed {}.".format(
+                  len(summary['transferred']),
+                  summary['bytes'] / 1024 ** 2,
+                  summary['seconds'],
+                  summary['bytes'] / 1024 ** 2 / max(summary['seconds'], 1e-6),
+                  len(summary['deleted']),
+                  summary['skipped'],
+                  len(summary['failed']),
+              ))
+        return summary
+
+
+""" HELPER FUNCTIONS
+    Functions referenced in the code above.
+"""
+def _get_sync_size(local_dir, remote_files, path, direction):
+    if direction == 'upload':
+        return os.path.getsize(os.path.join(local_dir, path))
+    return remote_files[path].size or 0
+
+
+def _download_blob(
+    blob,
+    filename,
+    chunk_size=GCS_CHUNK_SIZE,
+    max_workers=GCS_MAX_WORKERS,
+    parallel_threshold=GCS_PARALLEL_THRESHOLD,
+):
+    if blob.size and blob.size >= parallel_threshold:
+        download_sliced(
+            blob, filename, chunk_size=chunk_size, max_workers=max_workers)
+    else:
+        blob.download_to_filename(filename)
+
+
+def _upload_blob(
+    bucket,
+    storage_path,
+    filename,
+    chunk_size=GCS_CHUNK_SIZE,
+    max_workers=GCS_MAX_WORKERS,
+    parallel_threshold=GCS_PARALLEL_THRESHOLD,
+):
+    metadata = {MTIME_METADATA_KEY: str(int(os.path.getmtime(filename)))}
+    if os.path.getsize(filename) >= parallel_threshold:
+        blob = upload_composite(
+            bucket,
+            storage_path,
+            filename,
+            chunk_size=chunk_size,
+            max_workers=max_workers,
+        )
+        blob.metadata = metadata
+        blob.patch()
+    else:
+        blob = bucket.blob(storage_path)
+        blob.metadata = metadata
+        blob.upload_from_filename(filename)
+    return blob
+
+
+def is_gcs_uri(path):
+    return isinstance(path, str) and path.startswith(GCS_URI_PREFIX)
+
+
+def parse_gcs_uri(uri):
+    """Split a gs://bucket/path URI into its bucket name and path."""
+    bucket_name, _, filepath = uri[len(GCS_URI_PREFIX):].partition('/')
+    return bucket_name, filepath
+
+
+def _get_blob_cache(cache):
+    return cache if isinstance(cache, blobCache) else blobCache()
+
+
+def _get_blob_index(index, storage):
+    # Imported here as blob_index lists blobs through storageObject
+    from algom.utils.blob_index import blobIndex
+    return index if isinstance(index, blobIndex) else blobIndex(storage=storage)
+
+
+def _get_indexed_blob(bucket, blob):
+    """Return a storage.Blob holding the properties of an indexed blob,
+    without a request to GCS."""
+    updated = blob['updated']
+    if updated:
+        updated = datetime.fromisoformat(updated).astimezone(timezone.utc)
+        updated = updated.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    indexed_blob = bucket.blob(blob['name'])
+    # Same as Client.list_blobs does for each listed item
+    indexed_blob._set_properties({
+        'name': blob['name'],
+        'size': blob['size'],
+        'updated': updated,
+        'generation': blob['generation'],
+        'md5Hash': blob['md5_hash'],
+        'crc32c': blob['crc32c'],
+        'metadata': blob['metadata'],
+    })
+    return indexed_blob
+
+
+def _get_list_fields(fields):
+    """Return the partial-response fields of a list request."""
+    if fields is None:
+        return None
+    names = ['name'] + [f for f in fields if f != 'name']
+    fields = ','.join(BLOB_FIELD_NAMES.get(f, f) for f in names)
+    return 'items({}),prefixes,nextPageToken'.format(fields)
+
+
+def _list_local_files(local_dir):
+    """Return relative paths of the files in a directory, using / as the
+    separator. Partial files of interrupted downloads are skipped."""
+    paths = set()
+    for root, _, filenames in os.walk(local_dir):
+        for filename in filenames:
+            if filename.endswith((PART_SUFFIX, STATE_SUFFIX)):
+                continue
+            path = os.path.relpath(os.path.join(root, filename), local_dir)
+            paths.add(path.replace(os.sep, '/'))
+    return paths
+
+
+def _get_blob_mtime(blob):
+    mtime = (blob.metadata or {}).get(MTIME_METADATA_KEY)
+    return int(mtime) if mtime else int(blob.updated.timestamp())
+
+
+def _is_changed(filename, blob, checksum=False):
+    """Return True if a local file and a blob differ in size, or in
+    checksum or mtime."""
+    if os.path.getsize(filename) != blob.size:
+        return True
+    if checksum:
+        if blob.md5_hash:
+            return get_file_checksum(filename, 'md5') != blob.md5_hash
+        return get_file_checksum(filename, 'crc32c') != blob.crc32c
+    return int(os.path.getmtime(filename)) != _get_blob_mtime(blob)
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+""" algoMosaic parallel transfers of large files to/from Google Cloud Storage.
+
+Large blobs are moved in chunks by a pool of threads:
+    - download_sliced: byte ranges of the blob are downloaded in parallel
+      and written in place into a local .part file.
+    - upload_composite: chunks of the file are uploaded in parallel as
+      temporary part objects, then composed into the destination blob.
+
+Both are resumable. Completed chunks are recorded in a JSON sidecar next
+to the local file, so a transfer interrupted by a failure or a process
+restart only moves the remaining chunks when it is run again. The whole
+file is verified against the blob's crc32c (or md5) checksum.
+
+"""
+
+import os
+import json
+import uuid
+import base64
+import hashlib
+import threading
+import google_crc32c
+from concurrent.futures import ThreadPoolExecutor
+
+import configs
+
+
+GCS_CHUNK_SIZE = getattr(configs, 'GCS_CHUNK_SIZE', 64 * 1024 ** 2)
+GCS_MAX_WORKERS = getattr(configs, 'GCS_MAX_WORKERS', 8)
+GCS_PARALLEL_THRESHOLD = getattr(configs, 'GCS_PARALLEL_THRESHOLD', 128 * 1024 ** 2)
+MAX_COMPOSE_SOURCES = 32
+PART_SUFFIX = '.part'
+STATE_SUFFIX = '.transfer.json'
+UPLOAD_PARTS_PREFIX = '.algom_parts'
+READ_BLOCK_SIZE = 8 * 1024 ** 2
+
+
+class ChecksumError(ValueError):
+    """Raised when a transferred file does not match the blob checksum."""
+
+
+class transferState():
+    """Completed chunks of a transfer, persisted in a JSON sidecar.
+
+    The state is only resumed when its transfer key (e.g. the blob
+    generation and size) matches the current transfer.
+    """
+    def __init__(self, filepath, key):
+        self.filepath = filepath
+        self.key = key
+        self.completed = {}
+        self._lock = threading.Lock()
+        if os.path.exists(filepath):
+            with open(filepath, 'r') as f:
+                state = json.load(f)
+            if state.get('key') == key:
+                self.completed = state.get('completed', {})
+
+    def is_complete(self, index):
+        return str(index) in self.completed
+
+    def complete(self, index, value=True):
+        with self._lock:
+            self.completed[str(index)] = value
+            tmp_filepath = self.filepath + '.tmp'
+            with open(tmp_filepath, 'w') as f:
+                json.dump({'key': self.key, 'completed': self.completed}, f)
+            os.replace(tmp_filepath, self.filepath)
+
+    def clear(self):
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+
+def download_sliced(
+    blob,
+    filename,
+    chunk_size=GCS_CHUNK_SIZE,
+    max_workers=GCS_MAX_WORKERS,
+    checksum='crc32c',
+):
+    """Download a blob in parallel byte ranges.
+
+    Args:
+        blob (storage.Blob): Blob with its metadata loaded (size,
+            generation and checksums), e.g. from bucket.get_blob.
+        filename (str): Local destination file.
+        chunk_size (int): Bytes per range request.
+        max_workers (int): Number of concurrent range requests.
+        checksum (str): 'crc32c', 'md5' or None to skip verification.
+
+    Returns:
+        str: filename
+    """
+    part_filename = filename + PART_SUFFIX
+    state = transferState(
+        filename + STATE_SUFFIX,
+        key=[blob.bucket.name, blob.name, blob.generation, blob.size, chunk_size],
+    )
+    if not (state.completed and os.path.exists(part_filename)):
+        state.completed = {}
+        with open(part_filename, 'wb') as f:
+            f.truncate(blob.size)
+
+    def _download_chunk(index):
+        start = index * chunk_size
+        end = min(start + chunk_size, blob.size) - 1
+        data = blob.download_as_bytes(
+            start=start,
+            end=end,
+            if_generation_match=blob.generation,
+            checksum=None,
+        )
+        with open(part_filename, 'r+b') as f:
+            f.seek(start)
+            f.write(data)
+        state.complete(index)
+
+    indices = [
+        i for i in range(_count_chunks(blob.size, chunk_size))
+        if not state.is_complete(i)
+    ]
+    if len(state.completed):
+        print("RUNNING: Resuming download of {} ({} chunks left).".format(
+            blob.name, len(indices)))
+    _run_parallel(_download_chunk, indices, max_workers)
+
+    verify_checksum(part_filename, blob, checksum)
+    os.replace(part_filename, filename)
+    state.clear()
+    return filename
+
+
+def upload_composite(
+    bucket,
+    storage_path,
+    filename,
+    chunk_size=GCS_CHUNK_SIZE,
+    max_workers=GCS_MAX_WORKERS,
+):
+    """Upload a file as parallel part objects composed into one blob.
+
+    Part objects are written under .algom_parts/ in the same bucket and
+    deleted once the destination blob is composed and verified.
+
+    Args:
+        bucket (storage.Bucket): Destination bucket.
+        storage_path (str): Destination blob path.
+        filename (str): Local source file.
+        chunk_size (int): Bytes per part object.
+        max_workers (int): Number of concurrent part uploads.
+
+    Returns:
+        storage.Blob
+    """
+    size = os.path.getsize(filename)
+    state = transferState(
+        filename + STATE_SUFFIX,
+        key=[bucket.name, storage_path, size,
+             os.path.getmtime(filename), chunk_size],
+    )
+    upload_id = state.completed.get('upload_id') or uuid.uuid4().hex
+    if not state.completed:
+        state.complete('upload_id', upload_id)
+    part_names = [
+        '{}/{}/{:05d}'.format(UPLOAD_PARTS_PREFIX, upload_id, i)
+        for i in range(_count_chunks(size, chunk_size) or 1)
+    ]
+
+    def _upload_chunk(index):
+        with open(filename, 'rb') as f:
+            f.seek(index * chunk_size)
+            data = f.read(chunk_size)
+        bucket.blob(part_names[index]).upload_from_string(data, checksum='crc32c')
+        state.complete(index)
+
+    indices = [i for i in range(len(part_names)) if not state.is_complete(i)]
+    if len(indices) < len(part_names):
+        print("RUNNING: Resuming upload of {} ({} parts left).".format(
+            filename, len(indices)))
+    _run_parallel(_upload_chunk, indices, max_workers)
+
+    blob = compose_blobs(bucket, part_names, storage_path, upload_id)
+    blob.reload()
+    try:
+        verify_checksum(filename, blob, 'crc32c')
+    finally:
+        _delete_blobs(bucket, part_names)
+        state.clear()
+    return blob
+
+
+def compose_blobs(bucket, source_names, storage_path, upload_id=None):
+    """Compose any number of blobs into one, 32 sources at a time."""
+    upload_id = upload_id or uuid.uuid4().hex
+    intermediate_names = []
+    level = 0
+    while len(source_names) > MAX_COMPOSE_SOURCES:
+        names = []
+        for i in range(0, len(source_names), MAX_COMPOSE_SOURCES):
+            name = '{}/{}/compose-{}-{:05d}'.format(
+                UPLOAD_PARTS_PREFIX, upload_id, level, i)
+            bucket.blob(name).compose([
+                bucket.blob(n) for n in source_names[i:i + MAX_COMPOSE_SOURCES]
+            ])
+            names.append(name)
+        intermediate_names.extend(names)
+        source_names = names
+        level += 1
+    blob = bucket.blob(storage_path)
+    blob.compose([bucket.blob(name) for name in source_names])
+    _delete_blobs(bucket, intermediate_names)
+    return blob
+
+
+def verify_checksum(filename, blob, checksum='crc32c'):
+    """Raise ChecksumError if a local file does not match a blob.
+
+    Composite blobs only have a crc32c checksum, so md5 verification is
+    skipped for them.
+    """
+    expected = getattr(blob, checksum, None) if checksum else None
+    if not expected:
+        return
+    actual = get_file_checksum(filename, checksum)
+    if actual != expected:
+        raise ChecksumError('{} checksum of {} is {}, expected {}.'.format(
+            checksum, filename, actual, expected))
+
+
+def get_file_checksum(filename, checksum='crc32c'):
+    """Return the base64 crc32c or md5 of a file, as reported by GCS."""
+    hasher = google_crc32c.Checksum() if checksum == 'crc32c' else hashlib.md5()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BLOCK_SIZE), b''):
+            hasher.update(block)
+    return base64.b64encode(hasher.digest()).decode('utf-8')
+
+
+""" HELPER FUNCTIONS
+    Functions referenced in the code above.
+"""
+def _count_chunks(size, chunk_size):
+    return -(-size // chunk_size)
+
+
+def _run_parallel(func, indices, max_workers):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Consume results so the first failure is raised
+        list(executor.map(func, indices))
+
+
+def _delete_blobs(bucket, names):
+    for name in names:
+        try:
+            bucket.blob(name).delete()
+        except Exception as e:
+            print("ERROR: Unable to delete part object {}.\n{}".format(name, e))
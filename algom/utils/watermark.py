@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+""" algoMosaic watermarks used for incremental loads.
+
+A watermark is the highest value of a column (e.g. updated_at or an
+auto-incrementing id) that has been loaded from a source. On the next run,
+the source query is filtered to rows above the stored watermark, so each
+run only reads new rows. See dataObject(watermark_column=...).
+
+Watermarks are stored per source in either:
+    - watermarkStore: a local JSON file (configs.WATERMARK_FILEPATH)
+    - tableWatermarkStore: a small BigQuery state table
+      (configs.WATERMARK_TABLE), shared by runs on different machines
+
+Values are stored as strings together with their BigQuery type, and are
+bound to the filtered query as a typed query parameter.
+
+"""
+
+import os
+import json
+import fcntl
+import tempfile
+import contextlib
+from datetime import datetime, timezone
+import pyarrow as pa
+from google.cloud import bigquery
+
+import configs
+from algom.utils.schema import infer_schema
+
+
+WATERMARK_FILEPATH = getattr(
+    configs, 'WATERMARK_FILEPATH',
+    os.path.join(os.path.expanduser('~'), '.algom', 'watermarks.json'))
+WATERMARK_TABLE = getattr(configs, 'WATERMARK_TABLE', None)
+WATERMARK_PARAM = 'algom_watermark'
+
+
+class watermarkStore():
+    """Watermarks stored in a local JSON file.
+
+    Args:
+        filepath (str): JSON file holding watermarks by source ID.
+
+    Examples:
+        store = watermarkStore()
+        store.set('my_source', '2021-01-01 00:00:00+00:00', 'TIMESTAMP')
+        store.get('my_source')
+    """
+    def __init__(self, filepath=WATERMARK_FILEPATH):
+        self.filepath = filepath
+
+    def get(self, source_id):
+        """Return the watermark of a source as a dict with value, type
+        and updated_at, or None if the source has not been loaded."""
+        with self._lock():
+            return self._read().get(source_id)
+
+    def set(self, source_id, value, bq_type):
+        with self._lock():
+            watermarks = self._read()
+            watermarks[source_id] = {
+                'value': str(value),
+                'type': bq_type,
+                'updated_at': datetime.now(timezone.utc).isoformat(),
+            }
+            self._write(watermarks)
+
+    def delete(self, source_id):
+        with self._lock():
+            watermarks = self._read()
+            if watermarks.pop(source_id, None) is not None:
+                self._write(watermarks)
+
+    """ HELPER FUNCTIONS
+        Functions referenced in the code above.
+    """
+    @contextlib.contextmanager
+    def _lock(self):
+        # fcntl locks are shared by every store, thread and process using
+        # the file, so read-modify-writes never interleave
+        self._make_directory()
+        with open(self.filepath + '.lock', 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _make_directory(self):
+        directory = os.path.dirname(self.filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _read(self):
+        if not os.path.exists(self.filepath):
+            return {}
+        with open(self.filepath, 'r') as f:
+            return json.load(f)
+
+    def _write(self, watermarks):
+        # Write to a temp file first so a failed run never corrupts the store
+        fd, tmp_filepath = tempfile.mkstemp(
+            suffix='.tmp', dir=os.path.dirname(self.filepath) or '.')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(watermarks, f, indent=2, sort_keys=True)
+            os.replace(tmp_filepath, self.filepath)
+        finally:
+            if os.path.exists(tmp_filepath):
+                os.remove(tmp_filepath)
+
+
+class tableWatermarkStore():
+    """Watermarks stored in a BigQuery table. The table is created on
+    first use.
+
+    Args:
+        table_id (str): State table ID (project.dataset.table).
+        bq_client (bigquery.Client): BigQuery client. Defaults to the
+            shared client from bqClient.
+    """
+    def __init__(self, table_id=WATERMARK_TABLE, bq_client=None):
+        if bq_client is None:
+            from algom.utils.client import bqClient
+            bq_client = bqClient().bq_client
+        self.table_id = table_id
+        self.bq_client = bq_client
+        self._created = False
+
+    def get(self, source_id):
+        rows = list(self._query(
+            """SELECT value, type, CAST(updated_at AS STRING) AS updated_at
+            FROM `{}`
+            WHERE source_id = @source_id""".format(self.table_id),
+            source_id=source_id,
+        ))
+        return dict(rows[0].items()) if rows else None
+
+    def set(self, source_id, value, bq_type):
+        self._query(
+            """MERGE `{}` T
+            USING (SELECT @source_id AS source_id, @value AS value, @type AS type) S
+            ON T.source_id = S.source_id
+            WHEN MATCHED THEN
+                UPDATE SET value = S.value, type = S.type, updated_at = CURRENT_TIMESTAMP()
+            WHEN NOT MATCHED THEN
+                INSERT (source_id, value, type, updated_at)
+                VALUES (S.source_id, S.value, S.type, CURRENT_TIMESTAMP())
+            """.format(self.table_id),
+            source_id=source_id,
+            value=str(value),
+            type=bq_type,
+        )
+
+    def delete(self, source_id):
+        self._query(
+            'DELETE FROM `{}` WHERE source_id = @source_id'.format(self.table_id),
+            source_id=source_id,
+        )
+
+    """ HELPER FUNCTIONS
+        Functions referenced in the code above.
+    """
+    def _query(self, query, **params):
+        if not self._created:
+            self.bq_client.query(
+                """CREATE TABLE IF NOT EXISTS `{}` (
+                    source_id STRING NOT NULL,
+                    value STRING,
+                    type STRING,
+                    updated_at TIMESTAMP
+                )""".format(self.table_id)
+            ).result()
+            self._created = True
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ScalarQueryParameter(k, 'STRING', v)
+            for k, v in params.items()
+        ])
+        return self.bq_client.query(query, job_config=job_config).result()
+
+
+def get_watermark_store():
+    """Return the configured watermark store."""
+    if WATERMARK_TABLE:
+        return tableWatermarkStore()
+    return watermarkStore()
+
+
+def add_watermark_filter(query, column, watermark):
+    """Filter a query to rows above a watermark.
+
+    Args:
+        query (str): Rendered SQL query.
+        column (str): Watermark column returned by the query.
+        watermark (dict): Stored watermark with value and type.
+
+    Returns:
+        tuple: Filtered query and its watermark query parameter.
+    """
+    query = 'SELECT * FROM (\n{}\n) WHERE `{}` > @{}'.format(
+        query.strip().rstrip(';'), column, WATERMARK_PARAM)
+    parameter = bigquery.ScalarQueryParameter(
+        WATERMARK_PARAM, watermark['type'], watermark['value'])
+    return query, parameter
+
+
+def get_max_value(data, column):
+    """Return the maximum value of a column of a DataFrame or pa.Table,
+    ignoring nulls, and its BigQuery type."""
+    if isinstance(data, pa.Table):
+        data = data.select([column]).to_pandas()
+    values = data[column].dropna()
+    if values.empty:
+        return None, None
+    bq_type = infer_schema(values.to_frame())[0]['type']
+    return values.max(), bq_type
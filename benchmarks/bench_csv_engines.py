@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+""" Benchmark CSV engines used by dataObject.load_csv_file.
+
+Generates CSV files of increasing size and times:
+    - pandas: pd.read_csv with the default C parser
+    - arrow: read_csv_arrow (pyarrow's multi-threaded reader), Arrow only
+    - arrow+pandas: read_csv_arrow followed by conversion to pandas
+
+Run from the project root (configs.py must be importable):
+    python benchmarks/bench_csv_engines.py --max-rows 10000000
+
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+from algom.utils.data_object import read_csv_arrow
+
+
+DEFAULT_ROW_COUNTS = [10 ** 5, 10 ** 6, 10 ** 7, 10 ** 8]
+GENERATE_CHUNK_ROWS = 10 ** 6
+
+
+def generate_csv(path, rows, seed=0):
+    """Write a CSV of mixed int, float, string and date columns in chunks."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, GENERATE_CHUNK_ROWS):
+        n = min(GENERATE_CHUNK_ROWS, rows - start)
+        pd.DataFrame({
+            'id': np.arange(start, start + n),
+            'value': rng.random(n),
+            'count': rng.integers(0, 1000, n),
+            'label': rng.choice(['alpha', 'beta', 'gamma', 'delta'], n),
+            'date': pd.Timestamp('2021-01-01') + pd.to_timedelta(
+                rng.integers(0, 365, n), unit='D'),
+        }).to_csv(path, mode='w' if start == 0 else 'a',
+                  header=(start == 0), index=False)
+
+
+def time_engine(func, path):
+    start = time.perf_counter()
+    func(path)
+    return time.perf_counter() - start
+
+
+def run(row_counts, directory):
+    engines = {
+        'pandas': lambda path: pd.read_csv(path),
+        'arrow': lambda path: read_csv_arrow(path),
+        'arrow+pandas': lambda path: read_csv_arrow(path).to_pandas(),
+    }
+    results = []
+    for rows in row_counts:
+        path = os.path.join(directory, 'bench_{}.csv'.format(rows))
+        print("RUNNING: Generating {:,} rows.".format(rows))
+        generate_csv(path, rows)
+        size_mb = os.path.getsize(path) / 1024 ** 2
+        for engine, func in engines.items():
+            seconds = time_engine(func, path)
+            results.append({
+                'rows': rows,
+                'size_mb': round(size_mb, 1),
+                'engine': engine,
+                'seconds': round(seconds, 3),
+                'mb_per_second': round(size_mb / seconds, 1),
+            })
+            print("SUCCESS: {:>12} {:>12,} rows in {:.3f}s.".format(
+                engine, rows, seconds))
+        os.remove(path)
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+
+    # Add and parse bash arguments
+    parser = argparse.ArgumentParser(
+        description="Benchmark CSV engines used by dataObject."
+    )
+    parser.add_argument(
+        '--max-rows',
+        type=int,
+        default=10 ** 7,
+        help='Largest file to generate. Use 100000000 to include 10^8 rows.',
+    )
+    parser.add_argument(
+        '--directory',
+        type=str,
+        default=None,
+        help='Directory for generated files. Defaults to a temp directory.',
+    )
+    args = parser.parse_args()
+
+    row_counts = [n for n in DEFAULT_ROW_COUNTS if n <= args.max_rows]
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        results = run(row_counts, directory)
+    print(results.pivot(index='rows', columns='engine', values='seconds'))
@@ -18,6 +18,14 @@ GOOGLE_APPLICATION_CREDENTIALS = 'my-project-name-xxxxxxxxxxxx.json'
 # KUBEFLOW
 # Specify your Kubeflow host
 KFP_CLIENT_HOST = 'https://XXXXXXXXXXXXXXXX-dot-us-central1.pipelines.googleusercontent.com'
+# Items requested per page when listing jobs, experiments and pipelines
+KFP_PAGE_SIZE = 200
+# Concurrent entries and retries when deploying a pipelines YAML file
+KFP_MAX_WORKERS = 8
+KFP_RETRIES = 3
+KFP_RETRY_BACKOFF = 1.0  # seconds, doubled on each retry
+# Package scanned for kfp.dsl.pipeline functions by pipelineBulkLoader
+PIPELINE_PACKAGE = 'pipelines'
 
 # MODEL STORAGE
 # The information below specifies where to store models
@@ -29,3 +37,52 @@ MODEL_LOCAL_DIRECTORY = '/home/jovyan/algomosaic/data/models/'
 # SLACK
 # Add a Slack Bot token below to enable messaging between algom and Slack
 SLACK_BOT_TOKEN = 'XXXXXXX'
+
+# QUERY CACHE
+# Local cache of BigQuery query results used by dataObject. Set the
+# default cache mode to 'read' to serve repeated queries from disk.
+QUERY_CACHE_DIRECTORY = '/home/jovyan/algomosaic/data/query_cache/'
+QUERY_CACHE_TTL = 24 * 60 * 60  # seconds
+QUERY_CACHE_MAX_BYTES = 5 * 1024 ** 3
+QUERY_CACHE_MODE = 'bypass'  # 'read', 'refresh' or 'bypass'
+
+# BIGQUERY STORAGE READ API
+# Query results larger than these thresholds are downloaded through the
+# BigQuery Storage Read API using parallel Arrow streams.
+BQ_STORAGE_ROW_THRESHOLD = 1000000
+BQ_STORAGE_BYTE_THRESHOLD = 256 * 1024 ** 2
+BQ_STORAGE_BYTE_CHECK_ROWS = 10000  # smaller results skip the size check
+BQ_STORAGE_MAX_STREAMS = 8
+
+# BIGQUERY BUDGET
+# Limits on bytes processed by dataObject queries. Queries are estimated
+# with a dry run and rejected before they run if they exceed a limit.
+BQ_MAXIMUM_BYTES_BILLED = None  # per query, e.g. 100 * 1024 ** 3
+BQ_RUN_BYTES_BUDGET = None  # per pipeline run, e.g. 1024 ** 4
+BQ_PRICE_PER_TIB = 6.25
+
+# INCREMENTAL LOADS
+# Watermarks of incremental dataObject loads are stored in a local JSON
+# file, or in a BigQuery state table when WATERMARK_TABLE is set.
+WATERMARK_FILEPATH = '/home/jovyan/algomosaic/data/watermarks.json'
+WATERMARK_TABLE = None  # e.g. 'my-project-name.algom.watermarks'
+
+# STORAGE TRANSFERS
+# Files of at least GCS_PARALLEL_THRESHOLD bytes are moved to/from GCS in
+# parallel chunks of GCS_CHUNK_SIZE bytes, and resume after a failure.
+GCS_CHUNK_SIZE = 64 * 1024 ** 2
+GCS_MAX_WORKERS = 8
+GCS_PARALLEL_THRESHOLD = 128 * 1024 ** 2
+# Read-ahead / upload chunk of storageObject.open and gs:// paths in dataObject
+GCS_STREAM_CHUNK_SIZE = 8 * 1024 ** 2
+
+# BLOB INDEX
+# Local index of GCS bucket listings. Prefixes are re-listed after the TTL.
+BLOB_INDEX_FILEPATH = '/home/jovyan/algomosaic/data/blob_index.sqlite'
+BLOB_INDEX_TTL = 60 * 60  # seconds
+
+# BLOB CACHE
+# Local cache of GCS files used by storageObject.read_file(cache=True) and
+# download_file(cache=True). Unchanged files are not downloaded again.
+BLOB_CACHE_DIRECTORY = '/home/jovyan/algomosaic/data/blob_cache/'
+BLOB_CACHE_MAX_BYTES = 10 * 1024 ** 3
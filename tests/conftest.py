@@ -0,0 +1,245 @@
+from google.api_core.exceptions import NotModified
+from types import SimpleNamespace
+from datetime import datetime, timezone
+import threading
+import base64
+import google_crc32c
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def fake_bq_client():
+    """Factory for in-memory bigquery.Client stand-ins."""
+    return fakeBqClient
+
+
+@pytest.fixture
+def fake_bucket():
+    """Factory for in-memory storage.Bucket / storage.Client stand-ins."""
+    return fakeBucket
+
+
+@pytest.fixture
+def fake_kfp_client():
+    """Factory for kfp.Client stand-ins with fixed listings."""
+    return fakeKfpClient
+
+
+@pytest.fixture
+def fake_deploy_client():
+    """Factory for kfp.Client stand-ins that record recurring run writes."""
+    return fakeDeployClient
+
+
+@pytest.fixture
+def kfp_job():
+    """Factory for recurring run listings."""
+    return get_job
+
+
+class fakeBqClient():
+    """Local stand-in for bigquery.Client that serves fixed query results,
+    answers dry runs with total_bytes and records load jobs.
+
+    Query jobs bill a tenth of total_bytes.
+    """
+    def __init__(self, results=None, total_bytes=0):
+        self.results = results or {}
+        self.total_bytes = total_bytes
+        self.submitted = []
+
+    def query(self, query, job_config=None):
+        self.submitted.append(query)
+        if job_config is not None and job_config.dry_run:
+            return SimpleNamespace(
+                total_bytes_processed=self.total_bytes,
+                referenced_tables=[
+                    SimpleNamespace(project='p', dataset_id='d', table_id='t')],
+            )
+        result = self.results[query]
+
+        def _result():
+            if isinstance(result, Exception):
+                raise result
+            return SimpleNamespace(
+                total_rows=len(result),
+                to_dataframe=lambda create_bqstorage_client: result,
+            )
+        return SimpleNamespace(
+            destination=None,
+            total_bytes_billed=self.total_bytes // 10,
+            result=_result,
+        )
+
+    def load_table_from_file(self, f, table_id, job_config):
+        self.rows = pd.read_parquet(f)
+        self.table_id = table_id
+        self.job_config = job_config
+        return SimpleNamespace(result=lambda: None)
+
+
+class fakeBlob():
+    """Local stand-in for storage.Blob backed by a fakeBucket."""
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.metadata = None
+        self.md5_hash = None
+        self.etag = None
+        self.updated = datetime.now(timezone.utc)
+
+    @property
+    def size(self):
+        return len(self.bucket.objects[self.name])
+
+    @property
+    def generation(self):
+        return self.bucket.generations.get(self.name, 1)
+
+    @property
+    def crc32c(self):
+        return get_crc32c(self.bucket.objects[self.name])
+
+    def download_to_filename(self, filename, if_generation_not_match=None):
+        with open(filename, 'wb') as f:
+            if if_generation_not_match == self.generation:
+                raise NotModified('not modified')
+            f.write(self.bucket.objects[self.name])
+        self.bucket.downloads.append(self.name)
+
+    def download_as_bytes(self, start, end, **kwargs):
+        self.bucket.requests.append((start, end))
+        if (start, end) in self.bucket.failures:
+            self.bucket.failures.remove((start, end))
+            raise ConnectionError('connection reset')
+        return self.bucket.objects[self.name][start:end + 1]
+
+    def upload_from_filename(self, filename):
+        with open(filename, 'rb') as f:
+            self.upload_from_string(f.read())
+        self.bucket.uploads.append(self.name)
+
+    def upload_from_string(self, data, **kwargs):
+        self.bucket.objects[self.name] = data
+        self.bucket.metadata[self.name] = self.metadata
+
+    def compose(self, sources):
+        self.upload_from_string(
+            b''.join(self.bucket.objects[s.name] for s in sources))
+
+    def reload(self):
+        pass
+
+    def _set_properties(self, properties):
+        self.metadata = properties['metadata']
+        self.md5_hash = properties['md5Hash']
+
+    def delete(self):
+        del self.bucket.objects[self.name]
+
+
+class fakeBucket():
+    """Local stand-in for storage.Bucket holding objects in memory.
+
+    Also serves as its own storage.Client, so it can be passed to
+    storageObject(client=...).
+    """
+    name = 'bucket'
+
+    def __init__(self, objects=None):
+        self.objects = objects or {}
+        self.metadata = {}
+        self.generations = {}
+        self.uploads = []
+        self.downloads = []
+        self.requests = []
+        self.failures = []
+
+    def bucket(self, bucket_name):
+        return self
+
+    def blob(self, name):
+        return fakeBlob(self, name)
+
+    def list_blobs(self, bucket_name, prefix='', **kwargs):
+        for name in sorted(self.objects):
+            if name.startswith(prefix):
+                blob = fakeBlob(self, name)
+                blob.metadata = self.metadata.get(name)
+                yield blob
+
+
+class fakeKfpClient():
+    """Local stand-in for kfp.Client that pages through fixed listings."""
+    def __init__(self, jobs=(), experiments=(), pipelines=(), versions=None):
+        self.calls = []
+        self.jobs = SimpleNamespace(
+            list_jobs=lambda **kwargs: self._list('jobs', jobs, **kwargs))
+        self.list_experiments = \
+            lambda **kwargs: self._list('experiments', experiments, **kwargs)
+        self.list_pipelines = \
+            lambda **kwargs: self._list('pipelines', pipelines, **kwargs)
+        self.versions = versions or {}
+
+    def list_pipeline_versions(self, pipeline_id, page_size, sort_by):
+        self.calls.append('versions')
+        versions = sorted(
+            self.versions.get(pipeline_id, []),
+            key=lambda v: v.created_at, reverse=True)
+        return SimpleNamespace(versions=versions[:page_size] or None)
+
+    def _list(self, attribute, items, page_token='', page_size=10):
+        self.calls.append(attribute)
+        start = int(page_token or 0)
+        end = start + page_size
+        return SimpleNamespace(**{
+            attribute: list(items[start:end]) or None,
+            'next_page_token': str(end) if end < len(items) else None,
+        })
+
+
+class fakeDeployClient(fakeKfpClient):
+    """fakeKfpClient that records recurring run writes."""
+    def __init__(self, jobs=(), fail_jobs=None):
+        super().__init__(
+            jobs=list(jobs),
+            experiments=[SimpleNamespace(id='e1', name='Default')],
+            pipelines=[SimpleNamespace(id='p1', name='scores')],
+            versions={'p1': [SimpleNamespace(id='v1', created_at=1)]},
+        )
+        self.writes = []
+        self.fail_jobs = dict(fail_jobs or {})
+        self._lock = threading.Lock()
+        self.jobs.enable_job = lambda id: self._write('enable', id)
+        self.jobs.disable_job = lambda id: self._write('disable', id)
+        self.jobs.delete_job = lambda id: self._write('delete', id)
+
+    def create_recurring_run(self, job_name, **kwargs):
+        with self._lock:
+            if self.fail_jobs.get(job_name):
+                self.fail_jobs[job_name] -= 1
+                raise ConnectionError('create failed')
+            if job_name == 'invalid':
+                raise fakeApiException(400)
+        self._write('create', job_name)
+        return get_job('new_' + job_name, job_name)
+
+    def _write(self, action, value):
+        with self._lock:
+            self.writes.append((action, value))
+
+
+class fakeApiException(Exception):
+    """Local stand-in for kfp_server_api.ApiException."""
+    def __init__(self, status):
+        super().__init__('HTTP {}'.format(status))
+        self.status = status
+
+
+def get_job(job_id, name, enabled=True):
+    return SimpleNamespace(id=job_id, name=name, enabled=enabled)
+
+
+def get_crc32c(data):
+    return base64.b64encode(google_crc32c.Checksum(data).digest()).decode('utf-8')
@@ -0,0 +1,52 @@
+from algom.utils.blob_cache import blobCache, get_cache_key
+import os
+
+
+def test_blob_cache(tmp_path, fake_bucket):
+    # Ensure unchanged blobs are served locally and changed blobs refetched
+    bucket = fake_bucket({'model.pkl': b'v1'})
+    cache = blobCache(str(tmp_path / 'cache'))
+    assert cache.read(bucket, 'model.pkl') == b'v1'
+    assert blobCache(str(tmp_path / 'cache')).read(bucket, 'model.pkl') == b'v1'
+    assert len(bucket.downloads) == 1
+
+    bucket.objects['model.pkl'] = b'v2'
+    bucket.generations['model.pkl'] = 2
+    cache.copy(bucket, 'model.pkl', str(tmp_path / 'model.pkl'))
+    with open(str(tmp_path / 'model.pkl'), 'rb') as f:
+        assert f.read() == b'v2'
+    assert len(bucket.downloads) == 2
+    assert not [f for f in os.listdir(cache.directory) if f.endswith('.tmp')]
+
+
+def test_blob_cache_eviction(tmp_path, fake_bucket):
+    # Ensure least recently used blobs are evicted past max_bytes
+    bucket = fake_bucket({'a': b'x' * 10, 'b': b'y' * 10})
+    cache = blobCache(str(tmp_path / 'cache'), max_bytes=15)
+    cache.read(bucket, 'a')
+    os.utime(os.path.join(cache.directory, get_cache_key('bucket', 'a')), (0, 0))
+    cache.read(bucket, 'b')
+    key = get_cache_key('bucket', 'b')
+    assert sorted(os.listdir(cache.directory)) == [key, key + '.json', key + '.lock']
+    cache.read(bucket, 'b')
+    assert len(bucket.downloads) == 2
+
+
+def test_blob_cache_eviction_race(tmp_path, monkeypatch, fake_bucket):
+    # Ensure entries removed by another process during eviction are skipped
+    bucket = fake_bucket({'a': b'x' * 10, 'b': b'y' * 10})
+    cache = blobCache(str(tmp_path / 'cache'), max_bytes=100)
+    cache.read(bucket, 'a')
+    removed = os.path.join(cache.directory, get_cache_key('bucket', 'a'))
+    listdir = os.listdir
+
+    def fake_listdir(path):
+        # Another process evicts 'a' right after the listing
+        filenames = listdir(path)
+        if os.path.exists(removed):
+            os.remove(removed)
+        return filenames
+
+    monkeypatch.setattr(os, 'listdir', fake_listdir)
+    cache.max_bytes = 0
+    assert cache.read(bucket, 'b') == b'y' * 10
@@ -0,0 +1,96 @@
+from algom.utils import bq_reader
+from types import SimpleNamespace
+import pandas as pd
+import pyarrow as pa
+
+
+def get_stream_tables():
+    return {
+        'stream-0': pa.table({'a': [1, 2], 'b': ['x', 'y']}),
+        'stream-1': pa.table({'a': [3], 'b': ['z']}),
+    }
+
+
+class fakeReadClient():
+    """Local stand-in for BigQueryReadClient that serves Arrow streams."""
+    def __init__(self, tables):
+        self.tables = tables
+        self.max_stream_count = None
+
+    def create_read_session(self, parent, read_session, max_stream_count):
+        self.max_stream_count = max_stream_count
+        return SimpleNamespace(
+            streams=[SimpleNamespace(name=n) for n in self.tables])
+
+    def read_rows(self, stream_name):
+        table = self.tables[stream_name]
+        return SimpleNamespace(to_arrow=lambda session: table)
+
+
+class fakeRows():
+    def __init__(self, df):
+        self.df = df
+        self.total_rows = len(df)
+
+    def to_dataframe(self, create_bqstorage_client=True):
+        return self.df
+
+
+class fakeJob():
+    def __init__(self, df, query='SELECT a, b FROM t'):
+        self.rows = fakeRows(df)
+        self.query = query
+        self.destination = SimpleNamespace(
+            project='p', dataset_id='d', table_id='t')
+
+    def result(self):
+        return self.rows
+
+
+def test_read_table_streams():
+    # Ensure all read streams are combined in session order
+    read_client = fakeReadClient(get_stream_tables())
+    table = bq_reader.read_table(
+        read_client, fakeJob(pd.DataFrame()).destination, max_streams=4)
+    assert read_client.max_stream_count == 4
+    assert table.column('a').to_pylist() == [1, 2, 3]
+
+
+def test_large_results_use_storage_api():
+    # Ensure results over the row threshold are read via Arrow streams
+    job = fakeJob(pd.DataFrame({'a': range(3), 'b': ['x', 'y', 'z']}))
+    df = bq_reader.read_query_job(
+        job, None, read_client=fakeReadClient(get_stream_tables()),
+        row_threshold=3, byte_threshold=None)
+    assert list(df['a']) == [1, 2, 3]
+
+
+def test_small_results_use_rest_api():
+    # Ensure results under the row threshold are read via REST
+    rest_df = pd.DataFrame({'a': [9]})
+    df = bq_reader.read_query_job(
+        fakeJob(rest_df), None, read_client=fakeReadClient(get_stream_tables()),
+        row_threshold=10, byte_threshold=None)
+    assert df is rest_df
+
+
+def test_ordered_results_use_one_stream():
+    # Ensure ORDER BY results are read from a single stream
+    read_client = fakeReadClient(get_stream_tables())
+    job = fakeJob(pd.DataFrame({'a': range(3)}), query='SELECT a FROM t\norder  by a')
+    bq_reader.read_query_job(
+        job, None, read_client=read_client, row_threshold=3, byte_threshold=None)
+    assert read_client.max_stream_count == 1
+
+
+def test_small_results_skip_table_metadata():
+    # Ensure the result size is only fetched for larger results
+    class fakeBqClient():
+        def get_table(self, table_ref):
+            raise AssertionError('get_table should not be called')
+
+    rest_df = pd.DataFrame({'a': [9]})
+    df = bq_reader.read_query_job(
+        fakeJob(rest_df), fakeBqClient(),
+        read_client=fakeReadClient(get_stream_tables()), row_threshold=10)
+    assert df is rest_df
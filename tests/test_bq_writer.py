@@ -0,0 +1,64 @@
+from algom.utils import bq_writer
+from google.cloud import bigquery
+import pandas as pd
+
+
+def test_load_batches(fake_bq_client):
+    # Ensure chunks are staged as Parquet and loaded with an explicit schema
+    df = pd.DataFrame({'a': range(5), 't': pd.Timestamp('2021-01-01')})
+    client = fake_bq_client()
+    bq_writer.load_batches(
+        client,
+        bq_writer.iter_chunks(df, chunk_size=2),
+        'project.dataset.table$20210101',
+        if_exists='replace',
+        partitioned=True,
+    )
+    assert len(client.rows) == 5
+    assert client.job_config.write_disposition == 'WRITE_TRUNCATE'
+    assert client.job_config.time_partitioning.type_ == 'DAY'
+    assert [f.field_type for f in client.job_config.schema] == ['INT64', 'DATETIME']
+
+
+def test_load_batches_null_first_chunk(fake_bq_client):
+    # Ensure columns that are all null in the first chunk take later values
+    df = pd.DataFrame({'a': range(4), 'b': pd.Series([None, None, 1, 2], dtype=object)})
+    client = fake_bq_client()
+    bq_writer.load_batches(
+        client,
+        bq_writer.iter_chunks(df, chunk_size=2),
+        'project.dataset.table',
+        schema=[{'name': 'a', 'type': 'INT64'}, {'name': 'b', 'type': 'INT64'}],
+    )
+    assert client.rows['b'].tolist()[2:] == [1, 2]
+
+
+def test_load_batches_chunk_types(fake_bq_client):
+    # Ensure the schema covers every chunk when later chunks change type
+    batches = [
+        pd.DataFrame({'a': [1, 2], 'b': [None, None], 'c': ['x', 'y']}),
+        pd.DataFrame({'a': [3, None], 'b': [4, 5], 'c': pd.Categorical(['z', 'z'])}),
+    ]
+    client = fake_bq_client()
+    bq_writer.load_batches(client, iter(batches), 'project.dataset.table')
+    assert [f.field_type for f in client.job_config.schema] == [
+        'FLOAT64', 'INT64', 'STRING']
+    assert client.rows['a'].tolist()[:3] == [1, 2, 3]
+    assert client.rows['b'].tolist()[2:] == [4, 5]
+    assert client.rows['c'].tolist() == ['x', 'y', 'z', 'z']
+
+
+def test_get_merge_query():
+    # Ensure upserts match on keys and partition replacement deletes by day
+    schema = [
+        bigquery.SchemaField('id', 'INT64'),
+        bigquery.SchemaField('d', 'DATE'),
+    ]
+    merge = bq_writer.get_merge_query('p.d.s', 'p.d.t', schema, ['id'])
+    assert 'ON T.`id` = S.`id`' in merge
+    assert 'UPDATE SET `d` = S.`d`' in merge
+    assert 'DECLARE' not in merge
+    replace = bq_writer.get_merge_query(
+        'p.d.s', 'p.d.t', schema, partition_field='d')
+    assert 'ON FALSE' in replace
+    assert 'NOT MATCHED BY SOURCE AND T.`d` IN UNNEST(partitions)' in replace
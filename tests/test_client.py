@@ -0,0 +1,24 @@
+from algom.utils.client import bqClient, storageClient, CLIENT_POOL
+
+
+def test_bq_client_reuse():
+    # Ensure BigQuery clients are shared across bqClient instances
+    client_a = bqClient()
+    client_b = bqClient()
+    assert client_a.bq_client is client_b.bq_client
+    assert client_a.credentials is client_b.credentials
+
+
+def test_storage_client_reuse():
+    # Ensure GCS clients are shared across storageClient instances
+    client_a = storageClient()
+    client_b = storageClient()
+    assert client_a.storage_client is client_b.storage_client
+
+
+def test_client_pool_clear():
+    # Ensure clearing the pool creates new clients
+    client_a = bqClient()
+    CLIENT_POOL.clear()
+    client_b = bqClient()
+    assert client_a.bq_client is not client_b.bq_client
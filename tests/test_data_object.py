@@ -1,6 +1,11 @@
-from algom.utils.data_object import dataObject
+from algom.utils.data_object import dataObject, load_many, glob_paths
+from algom.utils.watermark import watermarkStore
+from algom.utils.storage_object import storageObject
+import pandas as pd
+import pyarrow as pa
+import datetime
 from pathlib import Path
-import os
+import io
 
 
 def get_inputs():
@@ -31,38 +36,32 @@ def test_sql_load():
     assert len(data.data_id) > 1
 
 
-def test_sql_file_load():
+def test_sql_file_load(tmp_path):
     # Load publicly available table from BigQuery
     # Ensure SQL file loads properly
-    def _write_sql():
-        inputs = get_inputs()
-        f = open("test_file.sql", "a")
-        f.write(inputs.get('sql'))
-        f.close()
-
-    _write_sql()
-    data = dataObject('test_file.sql')
-    os.remove('test_file.sql')
+    path = tmp_path / 'test_file.sql'
+    path.write_text(get_inputs().get('sql'))
+    data = dataObject(str(path))
     assert len(data.df) == 10
     assert len(data.feature_list) == 2
     assert len(data.data_id) > 1
 
 
-def test_csv_load():
+def test_csv_load(tmp_path):
     # Ensure CSV loads properly
+    path = str(tmp_path / 'test_file.csv')
     data = get_data()
-    data.df.to_csv('test_file.csv')
-    data = dataObject('test_file.csv')
-    os.remove('test_file.csv')
+    data.df.to_csv(path)
+    data = dataObject(path)
     assert len(data.df) == 10
 
 
-def test_json_load():
+def test_json_load(tmp_path):
     # Ensure JSON loads properly
+    path = str(tmp_path / 'test_data.json')
     data = get_data()
-    data.df.to_json('test_data.json')
-    data = dataObject('test_data.json')
-    os.remove('test_data.json')
+    data.df.to_json(path)
+    data = dataObject(path)
     assert len(data.df) == 10
 
 
@@ -78,3 +77,275 @@ def test_data_load():
     data_obj = get_data()
     data = dataObject(data_obj)
     assert len(data.df) > 1
+
+
+def test_csv_iter_batches(tmp_path):
+    # Ensure streamed CSV files are read in bounded chunks
+    path = str(tmp_path / 'test_file.csv')
+    out_path = str(tmp_path / 'test_file_out.csv')
+    pd.DataFrame({'a': range(25), 'b': 'x'}).to_csv(path, index=False)
+    data = dataObject(path, stream=True)
+    batches = list(data.iter_batches(batch_size=10))
+    data.to_csv(out_path, batch_size=10)
+    out = pd.read_csv(out_path)
+    assert data.df.empty
+    assert data.feature_list == ['a', 'b']
+    assert [len(b) for b in batches] == [10, 10, 5]
+    assert len(out) == 25
+
+
+def test_json_lines_iter_batches(tmp_path):
+    # Ensure line-delimited JSON files are read in chunks
+    path = str(tmp_path / 'test_data.jsonl')
+    pd.DataFrame({'a': range(5)}).to_json(path, orient='records', lines=True)
+    data = dataObject(path, stream=True)
+    batches = list(data.iter_batches(batch_size=2, as_arrow=True))
+    assert [b.num_rows for b in batches] == [2, 2, 1]
+
+
+def test_lazy_load(tmp_path):
+    # Ensure lazy dataObjects only read rows when df is accessed
+    path = str(tmp_path / 'test_file.csv')
+    pd.DataFrame({'b': range(5), 'a': 'x'}).to_csv(path, index=False)
+    data = dataObject(path, lazy=True)
+    assert data._df is None
+    assert data.feature_list == ['a', 'b']
+    assert len(data.data_id) > 1
+    assert len(data.df) == 5
+
+
+def test_lazy_sql_metadata():
+    # Ensure lazy SQL inputs get features from a dry run
+    inputs = get_inputs()
+    data = dataObject(inputs.get('sql'), lazy=True)
+    assert data._df is None
+    assert len(data.feature_list) == 2
+    assert len(data.df) == 10
+
+
+def test_parquet_load(tmp_path):
+    # Ensure Parquet files load with column projection and filters
+    path = str(tmp_path / 'test_file.parquet')
+    data = dataObject(pd.DataFrame({'a': range(10), 'b': 'x'}))
+    data.to_parquet(path)
+    data = dataObject(path, columns=['a'], filters=[('a', '>=', 5)])
+    assert list(data.df['a']) == [5, 6, 7, 8, 9]
+    assert data.feature_list == ['a']
+
+
+def test_feather_load(tmp_path):
+    # Ensure Feather / Arrow IPC files load and stream in batches
+    feather_path = str(tmp_path / 'test_file.feather')
+    arrow_path = str(tmp_path / 'test_file.arrow')
+    data = dataObject(pd.DataFrame({'a': range(10), 'b': 'x'}))
+    data.to_feather(feather_path)
+    data.to_arrow(arrow_path)
+    feather_data = dataObject(feather_path, filters=[('a', '<', 3)])
+    arrow_data = dataObject(arrow_path, stream=True)
+    batches = list(arrow_data.iter_batches(batch_size=4))
+    assert len(feather_data.df) == 3
+    assert [len(b) for b in batches] == [4, 4, 2]
+
+
+def test_csv_dtypes(tmp_path):
+    # Ensure CSV loads apply columns, dtypes, categories and downcasting
+    path = str(tmp_path / 'test_file.csv')
+    pd.DataFrame({
+        'a': range(100),
+        'b': ['x', 'y'] * 50,
+        'c': 1.5,
+        'd': '2021-01-01',
+    }).to_csv(path, index=False)
+    data = dataObject(
+        path,
+        columns=['a', 'b', 'd'],
+        parse_dates=['d'],
+        categories=['b'],
+    )
+    small_data = dataObject(path, downcast=True)
+    assert data.feature_list == ['a', 'b', 'd']
+    assert str(data.df['b'].dtype) == 'category'
+    assert str(data.df['d'].dtype).startswith('datetime64')
+    assert str(small_data.df['a'].dtype) == 'uint8'
+    assert str(small_data.df['c'].dtype) == 'float32'
+    assert str(small_data.df['b'].dtype) == 'category'
+
+
+def test_csv_arrow_engine(tmp_path):
+    # Ensure the Arrow CSV engine matches the pandas engine
+    path = str(tmp_path / 'test_file.csv')
+    pd.DataFrame({'a': range(25), 'b': 'x'}).to_csv(path, index=False)
+    data = dataObject(path, engine='arrow', dtypes={'a': 'int32'})
+    stream_data = dataObject(path, engine='arrow', stream=True)
+    batches = list(stream_data.iter_batches(batch_size=10))
+    assert data.feature_list == ['a', 'b']
+    assert data.to_arrow().num_rows == 25
+    assert data.df.equals(pd.DataFrame({'a': range(25), 'b': 'x'}).astype({'a': 'int32'}))
+    assert [len(b) for b in batches] == [10, 10, 5]
+
+
+def test_multi_file_load(tmp_path):
+    # Ensure sharded files load in order with a source-file column
+    paths = []
+    for i in range(3):
+        path = str(tmp_path / 'test_part-{}.csv'.format(i))
+        pd.DataFrame({'a': range(i * 5, i * 5 + 5)}).to_csv(path, index=False)
+        paths.append(path)
+    data = dataObject(
+        str(tmp_path / 'test_part-*.csv'), source_column='source_file')
+    list_data = dataObject(paths, max_workers=2)
+    batches = list(dataObject(paths, stream=True).iter_batches(batch_size=4))
+    assert list(data.df['a']) == list(range(15))
+    assert list(data.df['source_file'].unique()) == paths
+    assert data.feature_list == ['a', 'source_file']
+    assert len(list_data.df) == 15
+    assert [len(b) for b in batches] == [4, 1, 4, 1, 4, 1]
+
+
+def test_file_dtypes_and_columns(tmp_path):
+    # Ensure tuple columns and nullable dtypes work for Arrow file reads
+    paths = [str(tmp_path / 'test_part-{}.csv'.format(i)) for i in range(2)]
+    for path in paths:
+        pd.DataFrame({'a': pd.array([1, None], dtype='Int64'), 'b': 'x'}).to_csv(
+            path, index=False)
+    data = dataObject(paths, columns=('a',), dtypes={'a': 'Int64'})
+    table = data.to_arrow()
+    df = data.df
+    assert table.num_rows == 4
+    assert table.column('a').null_count == 2
+    assert list(df) == ['a']
+    assert df['a'].isna().sum() == 2
+
+
+def test_load_many(fake_bq_client):
+    # Ensure queries are submitted up front and failures are isolated
+    client = fake_bq_client({
+        'SELECT a FROM t': pd.DataFrame({'a': [1, 2]}),
+        'SELECT b FROM t': pd.DataFrame({'b': [3]}),
+        'SELECT c FROM t': ValueError('query failed'),
+    })
+    data = load_many({
+        'a': 'SELECT a FROM t',
+        'b': 'SELECT b FROM t',
+        'c': 'SELECT c FROM t',
+    }, max_concurrency=2, bq_client=client)
+    assert len(client.submitted) == 3
+    assert len(data['a'].df) == 2
+    assert data['b'].feature_list == ['b']
+    assert data['c'].df.empty
+    assert isinstance(data['c'].load_error, ValueError)
+    assert data['a'].load_seconds >= 0
+
+
+def test_incremental_load(tmp_path, fake_bq_client):
+    # Ensure only rows above the stored watermark are queried
+    store = watermarkStore(str(tmp_path / 'watermarks.json'))
+    sql = 'SELECT id FROM t'
+    client = fake_bq_client({sql: pd.DataFrame({'id': [1, 2]})})
+    data = dataObject(
+        sql, bq_client=client, watermark_column='id', watermark_store=store)
+    data.commit_watermark()
+    assert store.get(data.watermark_id)['value'] == '2'
+
+    filtered = 'SELECT * FROM (\n{}\n) WHERE `id` > @algom_watermark'.format(sql)
+    client = fake_bq_client({filtered: pd.DataFrame({'id': [3]})})
+    data = dataObject(
+        sql, bq_client=client, watermark_column='id', watermark_store=store)
+    assert data.query_parameters[0].value == '2'
+    data.commit_watermark()
+    assert store.get(data.watermark_id)['value'] == '3'
+
+
+def test_watermark_per_params(tmp_path, fake_bq_client):
+    # Ensure runs with different params keep separate watermarks
+    store = watermarkStore(str(tmp_path / 'watermarks.json'))
+    sql = 'SELECT id FROM t WHERE region = "{region}"'
+    ids = []
+    for region in ('us', 'eu'):
+        query = sql.replace('{region}', region)
+        client = fake_bq_client({query: pd.DataFrame({'id': [1]})})
+        data = dataObject(
+            sql, params={'region': region}, bq_client=client,
+            watermark_column='id', watermark_store=store)
+        ids.append(data.watermark_id)
+    assert ids[0] != ids[1]
+
+
+def test_date_watermark(tmp_path, fake_bq_client):
+    # Ensure DATE watermark columns are stored and bound as DATE
+    store = watermarkStore(str(tmp_path / 'watermarks.json'))
+    sql = 'SELECT d FROM t'
+    df = pa.table({
+        'd': pa.array([datetime.date(2021, 1, 1), datetime.date(2021, 1, 2)]),
+    }).to_pandas(types_mapper=pd.ArrowDtype)
+    data = dataObject(
+        sql, bq_client=fake_bq_client({sql: df}),
+        watermark_column='d', watermark_store=store)
+    data.commit_watermark()
+    assert store.get(data.watermark_id)['type'] == 'DATE'
+
+    filtered = 'SELECT * FROM (\n{}\n) WHERE `d` > @algom_watermark'.format(sql)
+    data = dataObject(
+        sql, bq_client=fake_bq_client({filtered: df.iloc[:0]}),
+        watermark_column='d', watermark_store=store)
+    assert data.query_parameters[0].type_ == 'DATE'
+    assert data.query_parameters[0].value == '2021-01-02'
+
+
+def test_query_cache_key_ignores_destination(fake_bq_client):
+    # Ensure the cache key keeps the query project after to_db sets a destination
+    sql = 'SELECT a FROM t'
+    data = dataObject(sql, bq_client=fake_bq_client({sql: pd.DataFrame({'a': [1]})}))
+    cache_key = data._get_query_cache_key()
+    data._set_destination('other_project.dataset.table')
+    assert data.project_id == 'other_project'
+    assert data._get_query_cache_key() == cache_key
+
+
+class fakeGcsFile(io.BytesIO):
+    """In-memory GCS object that is saved to its bucket when closed."""
+    def __init__(self, objects, name, mode):
+        super().__init__(objects.get(name, b'') if 'r' in mode else b'')
+        self.objects = objects
+        self.name = name
+        self.mode = mode
+
+    def close(self):
+        if 'w' in self.mode:
+            self.objects[self.name] = self.getvalue()
+        super().close()
+
+
+def test_gcs_paths(monkeypatch):
+    # Ensure gs:// files are read and written through file objects
+    objects = {}
+
+    def fake_open(self, bucket_name, filepath, mode='rb', **kwargs):
+        f = fakeGcsFile(objects, bucket_name + '/' + filepath, mode)
+        return io.TextIOWrapper(f) if 'b' not in mode else f
+
+    monkeypatch.setattr(storageObject, '__init__', lambda self, client=None: None)
+    monkeypatch.setattr(storageObject, 'open', fake_open)
+    data = dataObject(pd.DataFrame({'a': range(5)}))
+    data.to_csv('gs://bucket/data.csv', index=False)
+    data.to_parquet('gs://bucket/data.parquet')
+    assert sorted(objects) == ['bucket/data.csv', 'bucket/data.parquet']
+    assert list(dataObject('gs://bucket/data.csv').df['a']) == list(range(5))
+    parquet_data = dataObject('gs://bucket/data.parquet', filters=[('a', '>', 2)])
+    assert list(parquet_data.df['a']) == [3, 4]
+    batches = dataObject('gs://bucket/data.csv', stream=True).iter_batches(batch_size=2)
+    assert [len(b) for b in batches] == [2, 2, 1]
+
+
+def test_glob_gcs_paths(monkeypatch):
+    # Ensure gs:// wildcards only cross directories with **
+    names = ['data/a.csv', 'data/sub/b.csv', 'data/c.json']
+    monkeypatch.setattr(storageObject, '__init__', lambda self, client=None: None)
+    monkeypatch.setattr(
+        storageObject, 'get_blob_list',
+        lambda self, bucket_name, prefix='': [n for n in names if n.startswith(prefix)])
+    assert glob_paths('gs://bucket/data/*.csv') == ['gs://bucket/data/a.csv']
+    assert glob_paths('gs://bucket/data/**.csv') == [
+        'gs://bucket/data/a.csv', 'gs://bucket/data/sub/b.csv']
+    assert glob_paths('gs://bucket/data/[ac].*') == [
+        'gs://bucket/data/a.csv', 'gs://bucket/data/c.json']
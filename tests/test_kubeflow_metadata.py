@@ -0,0 +1,51 @@
+from algom.kubeflow.metadata import kubeflowMetadata
+from types import SimpleNamespace
+
+
+def test_metadata_pagination(fake_kfp_client, kfp_job):
+    # Ensure listings follow next_page_token and are only fetched once
+    jobs = [kfp_job(str(i), 'job_{}'.format(i % 3)) for i in range(7)]
+    client = fake_kfp_client(jobs=jobs)
+    metadata = kubeflowMetadata(client, page_size=2)
+    assert [j.id for j in metadata.get_jobs('job_0')] == ['0', '3', '6']
+    assert [j.id for j in metadata.get_jobs('job_1')] == ['1', '4']
+    assert metadata.get_jobs('missing') == []
+    assert client.calls == ['jobs'] * 4
+
+
+def test_metadata_lookups(fake_kfp_client):
+    # Ensure experiments, pipelines and latest versions are indexed
+    client = fake_kfp_client(
+        experiments=[SimpleNamespace(id='e1', name='Default')],
+        pipelines=[SimpleNamespace(id='p1', name='scores')],
+        versions={'p1': [
+            SimpleNamespace(id='v1', created_at=1),
+            SimpleNamespace(id='v3', created_at=3),
+            SimpleNamespace(id='v2', created_at=2),
+        ]},
+    )
+    metadata = kubeflowMetadata(client)
+    assert metadata.get_experiment('Default').id == 'e1'
+    assert metadata.get_pipeline('scores').id == 'p1'
+    assert metadata.get_pipeline('missing') is None
+    assert metadata.get_latest_version('p1').id == 'v3'
+    assert metadata.get_latest_version('p1').id == 'v3'
+    assert metadata.get_latest_version('p2') is None
+    assert client.calls.count('versions') == 2
+
+
+def test_metadata_writes(fake_kfp_client, kfp_job):
+    # Ensure writes update the index in place and invalidate re-lists
+    client = fake_kfp_client(jobs=[kfp_job('1', 'daily'), kfp_job('2', 'daily')])
+    metadata = kubeflowMetadata(client)
+    assert len(metadata.get_jobs('daily')) == 2
+    metadata.set_job_enabled('1', False)
+    assert [j.enabled for j in metadata.get_jobs('daily')] == [False, True]
+    metadata.remove_job('2')
+    metadata.add_job(kfp_job('3', 'hourly'))
+    assert [j.id for j in metadata.get_jobs('daily')] == ['1']
+    assert [j.id for j in metadata.get_jobs('hourly')] == ['3']
+    assert client.calls == ['jobs']
+    metadata.invalidate('jobs')
+    assert [j.id for j in metadata.get_jobs('daily')] == ['1', '2']
+    assert client.calls == ['jobs', 'jobs']
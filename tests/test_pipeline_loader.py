@@ -0,0 +1,84 @@
+import pytest
+import sys
+from types import SimpleNamespace
+
+kfp = pytest.importorskip('kfp')
+from algom.kubeflow.pipeline_loader import (
+    get_source_hash, get_version_hash, find_pipeline_functions)
+
+
+def component_a():
+    return 'a'
+
+
+def pipeline_a():
+    component_a()
+
+
+def pipeline_b():
+    component_a()
+    return None
+
+
+ops = SimpleNamespace(train_op=SimpleNamespace(component_spec={'image': 'v1'}))
+
+
+def build_steps():
+    ops.train_op()
+
+
+def pipeline_c():
+    build_steps()
+
+
+def test_source_hash():
+    # Ensure the hash is stable and changes with the pipeline source
+    assert get_source_hash(pipeline_a) == get_source_hash(pipeline_a)
+    assert get_source_hash(pipeline_a) != get_source_hash(pipeline_b)
+
+
+def test_source_hash_follows_references(monkeypatch):
+    # Ensure component specs reached through attributes and helpers are hashed
+    source_hash = get_source_hash(pipeline_c)
+    monkeypatch.setattr(ops.train_op, 'component_spec', {'image': 'v2'})
+    assert get_source_hash(pipeline_c) != source_hash
+
+
+def test_version_hash():
+    # Ensure hashes are read from version or first-version pipeline descriptions
+    source_hash = 'a' * 64
+    pipeline = SimpleNamespace(
+        name='scores', description='Scores.\nalgom-hash: {}'.format(source_hash))
+    first_version = SimpleNamespace(name='scores', description=None)
+    version = SimpleNamespace(
+        name='scores_version_at_2021', description='algom-hash: {}'.format('b' * 64))
+    assert get_version_hash(pipeline, first_version) == source_hash
+    assert get_version_hash(pipeline, version) == 'b' * 64
+    assert get_version_hash(pipeline, None) is None
+
+
+def test_find_pipeline_functions(tmp_path, monkeypatch, capsys):
+    # Ensure pipeline functions are found once, with or without decorator arguments
+    package = tmp_path / 'test_pipelines'
+    package.mkdir()
+    (package / '__init__.py').write_text('')
+    (package / 'scores.py').write_text(
+        'def scores_pipeline():\n    pass\n'
+        'scores_pipeline._component_human_name = "scores"\n'
+        'def helper():\n    pass\n'
+        'def pipeline(func):\n    return func\n'
+        '@pipeline\n'
+        'def unnamed_pipeline():\n    pass\n'
+        'def draft_pipeline():\n    pass\n')
+    (package / 'reports.py').write_text(
+        'from test_pipelines.scores import scores_pipeline\n'
+        'def reports_pipeline():\n    pass\n'
+        'reports_pipeline._component_human_name = "reports"\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    functions = find_pipeline_functions('test_pipelines')
+    for name in list(sys.modules):
+        if name.startswith('test_pipelines'):
+            monkeypatch.delitem(sys.modules, name)
+    assert sorted(f.__name__ for f in functions) == [
+        'reports_pipeline', 'scores_pipeline', 'unnamed_pipeline']
+    assert 'Skipping test_pipelines.scores.draft_pipeline' in capsys.readouterr().out
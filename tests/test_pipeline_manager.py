@@ -0,0 +1,98 @@
+from algom.kubeflow import pipeline_manager
+from algom.kubeflow.pipeline_manager import pipelineYaml
+from types import SimpleNamespace
+from datetime import datetime, timezone
+import yaml
+
+
+def write_yaml(tmp_path, entries):
+    path = tmp_path / 'pipelines.yaml'
+    path.write_text(yaml.safe_dump([
+        dict({'job_name': job_name, 'pipeline_name': 'scores', 'status': status}, **kwargs)
+        for job_name, status, kwargs in entries
+    ]))
+    return str(path)
+
+
+def test_yaml_deploy(tmp_path, monkeypatch, fake_deploy_client, kfp_job):
+    # Ensure entries deploy concurrently with retries and ordered job names
+    monkeypatch.setattr(pipeline_manager, 'KFP_RETRY_BACKOFF', 0)
+    client = fake_deploy_client(
+        jobs=[kfp_job('1', 'daily')], fail_jobs={'hourly': 1, 'weekly': 5})
+    loader = pipelineYaml(
+        write_yaml(tmp_path, [
+            ('daily', 'enabled', {}),
+            ('hourly', 'enabled', {}),
+            ('weekly', 'enabled', {}),
+            ('weekly', 'delete', {}),
+            ('daily', 'delete', {}),
+            ('invalid', 'enabled', {}),
+        ]),
+        max_workers=3,
+        retries=2,
+        client=client,
+    )
+    results = loader.results
+    assert [r['action'] for r in results] == [
+        'enabled', 'created', 'failed', 'skipped', 'deleted', 'failed']
+    assert [r['attempts'] for r in results] == [1, 2, 3, 0, 1, 1]
+    assert client.writes.index(('enable', '1')) < client.writes.index(('delete', '1'))
+    assert ('create', 'hourly') in client.writes
+    assert client.calls.count('experiments') == 1
+    assert client.calls.count('pipelines') == 1
+
+
+def get_api_job(
+        job_id, name, enabled=True, params=None, cron='0 0 * * *', start_time=None):
+    return SimpleNamespace(
+        id=job_id,
+        name=name,
+        description=None,
+        enabled=enabled,
+        max_concurrency='1',
+        no_catchup=True,
+        trigger=SimpleNamespace(
+            cron_schedule=SimpleNamespace(
+                cron=cron, start_time=start_time, end_time=None),
+            periodic_schedule=None),
+        pipeline_spec=SimpleNamespace(parameters=[
+            SimpleNamespace(name=k, value=v) for k, v in (params or {}).items()
+        ]),
+        resource_references=[
+            SimpleNamespace(key=SimpleNamespace(type='EXPERIMENT', id='e1')),
+            SimpleNamespace(key=SimpleNamespace(type='PIPELINE_VERSION', id='v1')),
+        ],
+    )
+
+
+def test_yaml_plan(tmp_path, fake_deploy_client):
+    # Ensure diff mode only makes the calls needed for changed entries
+    jobs = [
+        get_api_job('1', 'daily', params={'days': '7'}),
+        get_api_job('2', 'hourly'),
+        get_api_job('3', 'weekly', params={'days': '7'}),
+        get_api_job('4', 'old'),
+        get_api_job('5', 'backfill', start_time=datetime(2021, 1, 1, tzinfo=timezone.utc)),
+        get_api_job('6', 'nightly', start_time=datetime(2021, 1, 1, tzinfo=timezone.utc)),
+    ]
+    path = write_yaml(tmp_path, [
+        ('daily', 'enabled', {'params': {'days': 7}, 'cron_expression': '0 0 * * *'}),
+        ('hourly', 'disabled', {'cron_expression': '0 0 * * *'}),
+        ('weekly', 'enabled', {'params': {'days': 14}, 'cron_expression': '0 0 * * *'}),
+        ('monthly', 'disabled', {'cron_expression': '0 0 1 * *'}),
+        ('old', 'delete', {}),
+        ('backfill', 'enabled', {'start_time': '2021-01-01T00:00:00Z', 'no_catchup': False}),
+        ('nightly', 'enabled', {'start_time': '2021-01-01T00:00:00Z'}),
+    ])
+    client = fake_deploy_client(jobs=jobs)
+    plan = pipelineYaml(path, client=client, dry_run=True).results
+    assert [r['action'] for r in plan] == [
+        'unchanged', 'disabled', 'updated', 'created', 'deleted', 'updated',
+        'unchanged']
+    assert client.writes == []
+
+    client = fake_deploy_client(jobs=jobs)
+    pipelineYaml(path, client=client, diff=True)
+    assert sorted(client.writes) == [
+        ('create', 'backfill'), ('create', 'monthly'), ('create', 'weekly'),
+        ('delete', '3'), ('delete', '4'), ('delete', '5'), ('disable', '2')]
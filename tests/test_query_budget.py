@@ -0,0 +1,74 @@
+from algom.utils.query_budget import (
+    queryBudget, QueryBudgetError, estimate_query, clear_estimate_cache)
+from algom.utils import data_object
+from algom.utils.data_object import dataObject
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import pandas as pd
+import pytest
+
+
+def test_estimate_query_cache(fake_bq_client):
+    # Ensure estimates are cached per query hash
+    clear_estimate_cache()
+    client = fake_bq_client(total_bytes=1024 ** 4)
+    estimate = estimate_query(client, 'SELECT 1', 'key', price_per_tib=5)
+    estimate_query(client, 'SELECT 1', 'key')
+    assert len(client.submitted) == 1
+    assert estimate['estimated_cost'] == 5
+    assert estimate['referenced_tables'] == ['p.d.t']
+
+
+def test_query_budget():
+    # Ensure per-query and per-run byte budgets are enforced
+    budget = queryBudget(maximum_bytes_billed=100, run_bytes_budget=150)
+    reserved = budget.reserve({'total_bytes_processed': 80})
+    with pytest.raises(QueryBudgetError):
+        budget.reserve({'total_bytes_processed': 120})
+    with pytest.raises(QueryBudgetError):
+        budget.reserve({'total_bytes_processed': 80})
+    budget.release(reserved, 10)
+    assert budget.bytes_used == 10
+    budget.reset()
+    budget.reserve({'total_bytes_processed': 80})
+
+
+def test_query_budget_concurrent_reserve():
+    # Ensure concurrent queries can't all pass against the same remaining budget
+    budget = queryBudget(run_bytes_budget=100)
+    barrier = threading.Barrier(8)
+
+    def _reserve(i):
+        barrier.wait()
+        try:
+            return budget.reserve({'total_bytes_processed': 30})
+        except QueryBudgetError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        reserved = [r for r in executor.map(_reserve, range(8)) if r is not None]
+    assert len(reserved) == 3
+    assert budget.bytes_used == 90
+    for r in reserved:
+        budget.release(r)
+    assert budget.bytes_used == 0
+
+
+def test_budget_error_propagates(fake_bq_client):
+    # Ensure over-budget SQL inputs raise instead of loading an empty df
+    clear_estimate_cache()
+    client = fake_bq_client(total_bytes=10 ** 12)
+    with pytest.raises(QueryBudgetError):
+        dataObject('SELECT * FROM big_table', bq_client=client, maximum_bytes_billed=100)
+
+
+def test_budget_settles_to_billed_bytes(monkeypatch, fake_bq_client):
+    # Ensure reservations are replaced by billed bytes once a query finishes
+    clear_estimate_cache()
+    budget = queryBudget(run_bytes_budget=1000)
+    monkeypatch.setattr(data_object, 'RUN_BUDGET', budget)
+    sql = 'SELECT a FROM t'
+    client = fake_bq_client({sql: pd.DataFrame({'a': [1]})}, total_bytes=500)
+    data = dataObject(sql, bq_client=client)
+    assert len(data.df) == 1
+    assert budget.bytes_used == 50
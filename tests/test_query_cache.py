@@ -0,0 +1,42 @@
+from algom.utils.query_cache import queryCache
+import pandas as pd
+import os
+import time
+
+
+def get_df():
+    return pd.DataFrame({'a': [1, 2, 3], 'b': ['x', 'y', 'z']})
+
+
+def test_cache_round_trip(tmp_path):
+    # Ensure cached results are returned unchanged
+    cache = queryCache(directory=str(tmp_path))
+    assert cache.get('key') is None
+    cache.put('key', get_df(), query='SELECT 1')
+    df = cache.get('key')
+    assert df.equals(get_df())
+    assert sorted(os.listdir(str(tmp_path))) == ['key.json', 'key.parquet']
+
+
+def test_cache_ttl(tmp_path):
+    # Ensure expired results are treated as misses
+    cache = queryCache(directory=str(tmp_path), ttl=0)
+    cache.put('key', get_df())
+    time.sleep(0.01)
+    assert cache.get('key') is None
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_cache_lru_eviction(tmp_path):
+    # Ensure least recently used results are evicted first
+    cache = queryCache(directory=str(tmp_path), max_bytes=None)
+    for key in ['a', 'b', 'c']:
+        cache.put(key, get_df())
+        os.utime(os.path.join(str(tmp_path), key + '.parquet'), (0, 0))
+    cache.get('a')
+    entry_size = os.path.getsize(os.path.join(str(tmp_path), 'a.parquet'))
+    cache.max_bytes = entry_size * 2
+    cache.evict()
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
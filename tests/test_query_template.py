@@ -0,0 +1,73 @@
+from algom.utils.query_template import (
+    compile_template, parse_params, to_query_parameter)
+from datetime import date, datetime
+import pytest
+
+
+def test_render():
+    # Ensure params and YYYYMMDD are rendered in a single pass
+    template = compile_template(
+        'SELECT * FROM t_YYYYMMDD WHERE id = {id} AND x = {missing}')
+    query = template.render({'id': 5, 'unused': 1}, partition='20210101')
+    assert query == 'SELECT * FROM t_20210101 WHERE id = 5 AND x = {missing}'
+
+
+def test_render_baseline_keys():
+    # Ensure any brace key is substituted and YYYYMMDD is expanded in values
+    template = compile_template('SELECT * FROM {a.b} WHERE d >= {start-date}')
+    query = template.render(
+        {'a.b': 'd.t_YYYYMMDD', 'start-date': '2021-01-01'}, partition='20210101')
+    assert query == 'SELECT * FROM d.t_20210101 WHERE d >= 2021-01-01'
+    assert compile_template('SELECT {1}').render({1: 'x'}) == 'SELECT x'
+
+
+def test_render_date_token_forms():
+    # Ensure {YYYYMMDD} is a date and bare YYYYMMDD only matches as a token
+    template = compile_template(
+        "SELECT * FROM t_{YYYYMMDD} JOIN u_YYYYMMDD USING (id) "
+        "WHERE s = 'YYYYMMDD' AND code = 'ABCYYYYMMDD' AND YYYYMMDDx = {YYYYMMDD}")
+    assert template.param_names == set()
+    assert template.render(partition='20210101') == (
+        "SELECT * FROM t_20210101 JOIN u_20210101 USING (id) "
+        "WHERE s = '20210101' AND code = 'ABCYYYYMMDD' AND YYYYMMDDx = 20210101")
+
+
+def test_render_default_partition():
+    # Ensure YYYYMMDD defaults to today's date
+    query = compile_template('t_YYYYMMDD').render()
+    assert query == 't_' + datetime.now().strftime('%Y%m%d')
+
+
+def test_native_params():
+    # Ensure native params are rendered as @name and bound with types
+    template = compile_template(
+        'SELECT * FROM {table} WHERE d = {day} AND id IN UNNEST({ids})')
+    params = {'table': 'd.t', 'day': date(2021, 1, 1), 'ids': [1, 2]}
+    query = template.render(params, native_params=['day', 'ids'])
+    assert query == 'SELECT * FROM d.t WHERE d = @day AND id IN UNNEST(@ids)'
+    parameters = template.get_query_parameters(params, ['day', 'ids'])
+    assert [p.name for p in parameters] == ['day', 'ids']
+    assert parameters[0].type_ == 'DATE'
+    assert parameters[1].array_type == 'INT64'
+
+
+def test_query_parameter_types():
+    # Ensure Python values map to BigQuery parameter types
+    assert to_query_parameter('a', True).type_ == 'BOOL'
+    assert to_query_parameter('a', 1.5).type_ == 'FLOAT64'
+    assert to_query_parameter('a', 'x').type_ == 'STRING'
+    assert to_query_parameter('a', datetime(2021, 1, 1)).type_ == 'DATETIME'
+
+
+def test_parse_params():
+    # Ensure string params are parsed as literals, never evaluated as code
+    assert parse_params("{'a': 1}") == {'a': 1}
+    assert parse_params('{"a": true}') == {'a': True}
+    assert parse_params({'a': 1}) == {'a': 1}
+    with pytest.raises(ValueError):
+        parse_params("__import__('os').getcwd()")
+
+
+def test_compile_cache():
+    # Ensure templates are compiled once per query text
+    assert compile_template('SELECT {a}') is compile_template('SELECT {a}')
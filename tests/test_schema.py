@@ -0,0 +1,99 @@
+from algom.utils.schema import infer_schema
+from algom.utils.data_object import load_schema
+from algom.utils import bq_writer
+import pandas as pd
+import pytest
+import pyarrow as pa
+import pyarrow.parquet as pq
+import datetime
+import decimal
+
+
+def get_types(schema):
+    return {f['name']: (f['type'], f['mode']) for f in schema}
+
+
+def test_infer_schema_types():
+    # Ensure types are inferred from the whole column, not the first row
+    df = pd.DataFrame({
+        'int_col': [1, 2, 3],
+        'str_col': [None, '1', '2'],
+        'numeric_col': [decimal.Decimal('1.10')] * 3,
+        'date_col': [datetime.date(2021, 1, 1)] * 3,
+        'datetime_col': pd.to_datetime(['2021-01-01'] * 3),
+        'timestamp_col': pd.to_datetime(['2021-01-01'] * 3).tz_localize('UTC'),
+        'list_col': [[1, 2], None, [3]],
+        'category_col': pd.Series(['a', 'b', 'a']).astype('category'),
+    })
+    types = get_types(load_schema(df))
+    assert types['int_col'] == ('INT64', 'NULLABLE')
+    assert types['str_col'] == ('STRING', 'NULLABLE')
+    assert types['numeric_col'] == ('NUMERIC', 'NULLABLE')
+    assert types['date_col'] == ('DATE', 'NULLABLE')
+    assert types['datetime_col'] == ('DATETIME', 'NULLABLE')
+    assert types['timestamp_col'] == ('TIMESTAMP', 'NULLABLE')
+    assert types['list_col'] == ('INT64', 'REPEATED')
+    assert types['category_col'] == ('STRING', 'NULLABLE')
+
+
+def test_infer_schema_nullability():
+    # Ensure columns without nulls can be marked REQUIRED
+    df = pd.DataFrame({'a': [1, 2], 'b': ['x', None]})
+    types = get_types(infer_schema(df, infer_required=True))
+    assert types['a'] == ('INT64', 'REQUIRED')
+    assert types['b'] == ('STRING', 'NULLABLE')
+
+
+def test_infer_schema_record():
+    # Ensure dict columns are inferred as RECORD fields
+    df = pd.DataFrame({'r': [{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'y'}]})
+    field = infer_schema(df)[0]
+    assert field['type'] == 'RECORD'
+    assert get_types(field['fields']) == {
+        'a': ('INT64', 'NULLABLE'), 'b': ('STRING', 'NULLABLE')}
+
+
+def test_infer_schema_object_values():
+    # Ensure object columns are typed from their values on every load
+    schema = infer_schema(pd.DataFrame({'a': ['x']}))
+    assert schema[0]['type'] == 'STRING'
+    schema = infer_schema(pd.DataFrame({'a': [datetime.date(2021, 1, 1)]}))
+    assert schema[0]['type'] == 'DATE'
+
+
+def test_infer_schema_arrow_dtypes():
+    # Ensure pd.ArrowDtype columns, including lists and dates, are typed
+    df = pa.table({
+        'date_col': pa.array([datetime.date(2021, 1, 1)], pa.date32()),
+        'time_col': pa.array([datetime.time(1, 2)], pa.time64('us')),
+        'list_col': pa.array([[1, 2]], pa.list_(pa.int64())),
+        'ts_col': pa.array([datetime.datetime(2021, 1, 1)], pa.timestamp('us', 'UTC')),
+    }).to_pandas(types_mapper=pd.ArrowDtype)
+    types = get_types(infer_schema(df))
+    assert types['date_col'] == ('DATE', 'NULLABLE')
+    assert types['time_col'] == ('TIME', 'NULLABLE')
+    assert types['list_col'] == ('INT64', 'REPEATED')
+    assert types['ts_col'] == ('TIMESTAMP', 'NULLABLE')
+
+
+def test_date_round_trip(tmp_path):
+    # Ensure a DATE query result is loaded back as DATE, matching its Parquet type
+    df = pa.table({
+        'd': pa.array([datetime.date(2021, 1, 1), None], pa.date32()),
+    }).to_pandas(types_mapper=pd.ArrowDtype)
+    path = str(tmp_path / 'data.parquet')
+    bq_writer.write_parquet([df], path)
+    assert get_types(infer_schema(df))['d'] == ('DATE', 'NULLABLE')
+    assert pa.types.is_date32(pq.read_schema(path).field('d').type)
+
+
+def test_infer_schema_db_dtypes():
+    # Ensure db-dtypes DATE and TIME columns from to_dataframe are typed
+    db_dtypes = pytest.importorskip('db_dtypes')
+    df = pd.DataFrame({
+        'date_col': pd.Series([datetime.date(2021, 1, 1)], dtype=db_dtypes.DateDtype()),
+        'time_col': pd.Series([datetime.time(1, 2)], dtype=db_dtypes.TimeDtype()),
+    })
+    types = get_types(infer_schema(df))
+    assert types['date_col'] == ('DATE', 'NULLABLE')
+    assert types['time_col'] == ('TIME', 'NULLABLE')
@@ -0,0 +1,92 @@
+from algom.utils.storage_object import storageObject
+from algom.utils.blob_index import blobIndex
+import os
+
+
+def write_files(directory, files):
+    for path, text in files.items():
+        os.makedirs(os.path.dirname(os.path.join(directory, path)), exist_ok=True)
+        with open(os.path.join(directory, path), 'w') as f:
+            f.write(text)
+
+
+def test_sync(tmp_path, fake_bucket):
+    # Ensure only new or changed files are transferred in both directions
+    client = fake_bucket()
+    storage = storageObject(client=client)
+    local_dir = str(tmp_path / 'local')
+    write_files(local_dir, {'model.pkl': 'a', 'sub/config.json': 'b'})
+    summary = storage.sync(local_dir, 'bucket', prefix='models/x')
+    assert sorted(client.objects) == ['models/x/model.pkl', 'models/x/sub/config.json']
+    assert summary['bytes'] == 2
+
+    write_files(local_dir, {'model.pkl': 'aa'})
+    client.objects['models/x/stale.pkl'] = b'c'
+    plan = storage.sync(local_dir, 'bucket', prefix='models/x', delete=True, dry_run=True)
+    assert plan['skipped'] == 1
+    assert 'models/x/stale.pkl' in client.objects
+    summary = storage.sync(local_dir, 'bucket', prefix='models/x', delete=True)
+    assert summary['transferred'] == ['model.pkl']
+    assert summary['deleted'] == ['stale.pkl']
+
+    copy_dir = str(tmp_path / 'copy')
+    storage.sync(copy_dir, 'bucket', prefix='models/x', direction='download')
+    summary = storage.sync(copy_dir, 'bucket', prefix='models/x', direction='download')
+    assert len(client.downloads) == 2
+    assert summary['skipped'] == 2
+    with open(os.path.join(copy_dir, 'sub', 'config.json')) as f:
+        assert f.read() == 'b'
+
+
+def test_iter_blobs(fake_bucket):
+    # Ensure listings request only the projected fields, page by page
+    client = fake_bucket()
+    client.list_blobs = lambda bucket_name, **kwargs: iter([kwargs])
+    kwargs = next(storageObject(client=client).iter_blobs(
+        'bucket', prefix='models/', delimiter='/', fields=('size', 'md5_hash')))
+    assert kwargs['prefix'] == 'models/'
+    assert kwargs['fields'] == 'items(name,size,md5Hash),prefixes,nextPageToken'
+
+
+def test_blob_index(tmp_path, fake_bucket):
+    # Ensure the index serves listings locally and refreshes incrementally
+    client = fake_bucket()
+    client.objects = {'a/1': b'x', 'a/2': b'yy', 'b/1': b'z'}
+    index = blobIndex(
+        str(tmp_path / 'index.sqlite'), storage=storageObject(client=client))
+    assert [b['name'] for b in index.iter_blobs('bucket', prefix='a/')] == ['a/1', 'a/2']
+    assert index.get('bucket', 'a/2')['size'] == 2
+    assert not index.is_stale('bucket', 'a/sub/')
+
+    del client.objects['a/1']
+    assert len(list(index.iter_blobs('bucket', prefix='a/'))) == 2
+    assert [b['name'] for b in index.iter_blobs('bucket', 'a/', refresh=True)] == ['a/2']
+
+
+def test_sync_index(tmp_path, fake_bucket):
+    # Ensure indexed syncs skip listings and keep the index up to date
+    client = fake_bucket()
+    storage = storageObject(client=client)
+    index = blobIndex(str(tmp_path / 'index.sqlite'), storage=storage)
+    local_dir = str(tmp_path / 'local')
+    write_files(local_dir, {'model.pkl': 'a', 'old.pkl': 'b', 'sub/config.json': 'c'})
+    storage.sync(local_dir, 'bucket', prefix='models/x', index=index)
+
+    listings = []
+    list_blobs = client.list_blobs
+    client.list_blobs = lambda *args, **kwargs: listings.append(kwargs) or list_blobs(
+        *args, **kwargs)
+    write_files(local_dir, {'model.pkl': 'aa'})
+    os.remove(os.path.join(local_dir, 'old.pkl'))
+    summary = storage.sync(
+        local_dir, 'bucket', prefix='models/x', delete=True, index=index)
+    assert summary['transferred'] == ['model.pkl']
+    assert summary['deleted'] == ['old.pkl']
+    summary = storage.sync(local_dir, 'bucket', prefix='models/x', index=index)
+    assert summary['skipped'] == 2
+    assert [b.name for b in storage.iter_blobs('bucket', 'models/x/', index=index)] == [
+        'models/x/model.pkl', 'models/x/sub/config.json']
+    assert [b.name for b in storage.iter_blobs(
+        'bucket', 'models/x/', '/', index=index)] == ['models/x/model.pkl']
+    assert storage.list_prefixes('bucket', 'models/x/', index=index) == ['models/x/sub/']
+    assert listings == []
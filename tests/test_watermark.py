@@ -0,0 +1,52 @@
+from algom.utils.watermark import (
+    watermarkStore, add_watermark_filter, get_max_value)
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import os
+
+
+def test_watermark_store(tmp_path):
+    # Ensure watermarks are persisted per source and can be deleted
+    filepath = str(tmp_path / 'state' / 'watermarks.json')
+    watermarkStore(filepath).set('source', 10, 'INT64')
+    store = watermarkStore(filepath)
+    assert store.get('source')['value'] == '10'
+    assert store.get('source')['type'] == 'INT64'
+    assert store.get('other') is None
+    store.delete('source')
+    assert store.get('source') is None
+
+
+def test_watermark_store_concurrent_writes(tmp_path):
+    # Ensure separate stores on one file never lose each other's updates
+    filepath = str(tmp_path / 'watermarks.json')
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(
+            lambda i: watermarkStore(filepath).set('source_{}'.format(i), i, 'INT64'),
+            range(40)))
+    store = watermarkStore(filepath)
+    assert all(store.get('source_{}'.format(i))['value'] == str(i) for i in range(40))
+    assert not [f for f in os.listdir(str(tmp_path)) if f.endswith('.tmp')]
+
+
+def test_add_watermark_filter():
+    # Ensure queries are filtered with a typed watermark parameter
+    query, parameter = add_watermark_filter(
+        'SELECT * FROM t;', 'updated_at',
+        {'value': '2021-01-01 00:00:00+00:00', 'type': 'TIMESTAMP'})
+    assert query.endswith('WHERE `updated_at` > @algom_watermark')
+    assert ';' not in query
+    assert parameter.type_ == 'TIMESTAMP'
+
+
+def test_get_max_value():
+    # Ensure maximum values and types are read from pandas and Arrow data
+    df = pd.DataFrame({
+        'id': [3, 1, 2],
+        't': pd.to_datetime(['2021-01-02', None, '2021-01-01'], utc=True),
+    })
+    assert get_max_value(df, 'id') == (3, 'INT64')
+    assert get_max_value(pa.Table.from_pandas(df), 't') == (
+        pd.Timestamp('2021-01-02', tz='UTC'), 'TIMESTAMP')
+    assert get_max_value(df[df['id'] > 5], 'id') == (None, None)